@@ -0,0 +1,154 @@
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+import torch
+from src.config import artifact_path, artifact_cache_size, inference_mode, feature_columns, scaler_update
+from src.create_sequences import create_sequences
+from src.export_model import load_inference_model, resolve_model_file
+from src.features import build_features, bundle_path_for, feature_timestamps, load_model_features, load_model_scaler, target_index
+from src.scaling_data import scale_data, inverse_transform_column
+
+class ArtifactCache:
+    """
+    Cache dùng chung trong một lần chạy cho các bước tốn kém của phần dự báo: ma trận đặc trưng đã chuẩn hóa
+    và scaler, tensor chuỗi, mô hình đã nạp và dự báo trên toàn bộ lịch sử.
+    Khoá gồm ticker, mã băm nội dung ma trận đặc trưng (kèm tên các cột), sequence_length và file mô hình thực sự dùng để suy luận
+    (artifact đã xuất nếu có, xem export_model.resolve_model_file; gồm đường dẫn, mtime, kích thước).
+    Dự báo toàn bộ lịch sử được lưu thêm xuống đĩa để lần chạy sau trên dữ liệu không đổi bỏ qua suy luận.
+    Trong bộ nhớ chỉ giữ tối đa capacity mục theo LRU (như ModelRegistry), nên tiến trình chạy lâu không giữ mãi
+    kết quả của dữ liệu và mô hình cũ sau mỗi lần train lại.
+    Args:
+        cache_dir (str): Thư mục lưu dự báo trên đĩa.
+        persist (bool): Lưu/đọc dự báo từ đĩa.
+        mode (str): Chế độ suy luận 'eager', 'script' hoặc 'int8', mặc định theo config.inference_mode.
+        capacity (int): Số mục tối đa giữ trong bộ nhớ.
+    """
+    def __init__(self, cache_dir=artifact_path, persist=True, mode=inference_mode, capacity=artifact_cache_size):
+        self.cache_dir = cache_dir
+        self.persist = persist
+        self.mode = mode
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _lookup(self, key):
+        """Trả về (có trong cache, giá trị) và đánh dấu mục vừa dùng."""
+        if key not in self.memory:
+            return False, None
+        self.stats["hits"] += 1
+        self.memory.move_to_end(key)
+        return True, self.memory[key]
+
+    def _store(self, key, value):
+        self.memory[key] = value
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+        return value
+
+    def _memoize(self, key, compute):
+        found, value = self._lookup(key)
+        if found:
+            return value
+        self.stats["misses"] += 1
+        return self._store(key, compute())
+
+    @staticmethod
+    def content_hash(array):
+        """Mã băm SHA-1 của nội dung mảng, dùng làm khoá thay cho toàn bộ dữ liệu."""
+        array = np.ascontiguousarray(array)
+        return hashlib.sha1(str((array.dtype, array.shape)).encode() + array.tobytes()).hexdigest()
+
+    @staticmethod
+    def model_key(model_file):
+        stat = os.stat(model_file)
+        return os.path.abspath(model_file), stat.st_mtime_ns, stat.st_size
+
+    def features(self, data, ticker, columns=feature_columns, model_file=None):
+        """
+        Tạo và chuẩn hóa (từng cột) ma trận đặc trưng một lần cho mỗi (ticker, nội dung dữ liệu, danh sách cột, bundle).
+        Với model_file có bundle, dùng scaler đã lưu khi huấn luyện (cập nhật theo nến mới nếu config.scaler_update),
+        nếu không thì fit scaler trên dữ liệu.
+        Returns:
+            dict: 'features', 'scaled', 'scaler', 'target' (chỉ số cột 'Close') và 'digest' (mã băm nội dung).
+        """
+        features = build_features(data, columns)
+        scaler = load_model_scaler(model_file) if model_file else None
+        timestamps = feature_timestamps(data, features) if scaler is not None else None
+        # Với scaler đã lưu, dòng nào là nến mới được xác định theo thời điểm nên thời điểm cũng thuộc khoá
+        bundle = repr(self.model_key(bundle_path_for(model_file))) + self.content_hash(timestamps) if scaler is not None else ""
+        digest = hashlib.sha1((repr(list(columns)) + bundle + self.content_hash(features)).encode()).hexdigest()
+
+        def compute():
+            scaled, fitted = scale_data(features, scaler, update=scaler_update, timestamps=timestamps)
+            return {"features": features, "scaled": scaled, "scaler": fitted,
+                    "target": target_index(columns), "digest": digest}
+
+        return self._memoize(("features", ticker, digest), compute)
+
+    def sequences(self, data, ticker, seq_length, columns=feature_columns, model_file=None):
+        """Tensor float32 của toàn bộ cửa sổ đầu vào, tạo một lần cho mỗi (ticker, dữ liệu, bundle, seq_length)."""
+        prepared = self.features(data, ticker, columns, model_file)
+        return self._memoize(("sequences", ticker, prepared["digest"], seq_length),
+                             lambda: torch.tensor(create_sequences(prepared["scaled"], seq_length)[0], dtype=torch.float32))
+
+    def model(self, model_file):
+        """Mô hình đã nạp (artifact đã xuất nếu có, ngược lại RNN_LSTMModel eager), nạp lại khi file thay đổi."""
+        resolved = resolve_model_file(model_file, self.mode)
+        return self._memoize(("model",) + self.model_key(resolved),
+                             lambda: load_inference_model(model_file, self.mode))
+
+    def _prediction_file(self, ticker, digest, seq_length, model_file):
+        key = "|".join(map(str, (ticker, digest, seq_length) + self.model_key(model_file)))
+        return f"{self.cache_dir}/{ticker}_{hashlib.sha1(key.encode()).hexdigest()}.npy"
+
+    def predictions(self, data, ticker, model_file, seq_length, last_only=False):
+        """
+        Giá dự báo (đã đưa về thang giá gốc) cho mọi cửa sổ của lịch sử, theo đúng thứ tự của create_sequences.
+        Ma trận đặc trưng được tạo và chuẩn hóa theo bundle của mô hình (danh sách cột và scaler lúc huấn luyện).
+        Args:
+            data (pd.DataFrame): Dữ liệu giá với cột 'Close'.
+            ticker (str): Mã chứng khoán.
+            model_file (str): Đường dẫn file .pth.
+            seq_length (int): Chiều dài chuỗi.
+            last_only (bool): Chỉ dự báo phiên kế tiếp từ cửa sổ kết thúc ở nến cuối cùng (như inference_service
+                và bước đầu của forecast), suy luận đúng một cửa sổ.
+        Returns:
+            np.ndarray: Mảng 1 chiều các giá dự báo (1 phần tử nếu last_only).
+        """
+        columns = load_model_features(model_file)
+        prepared = self.features(data, ticker, columns, model_file)
+        resolved = resolve_model_file(model_file, self.mode)
+        if last_only:
+            def compute_next():
+                window = torch.tensor(prepared["scaled"][-seq_length:][None], dtype=torch.float32)
+                with torch.inference_mode():
+                    predicted_scaled = self.model(model_file)(window).numpy()
+                return inverse_transform_column(prepared["scaler"], predicted_scaled[:, 0], prepared["target"])
+
+            return self._memoize(("next", ticker, prepared["digest"], seq_length) + self.model_key(resolved), compute_next)
+
+        key = ("predictions", ticker, prepared["digest"], seq_length) + self.model_key(resolved)
+        found, predicted = self._lookup(key)
+        if found:
+            return predicted
+
+        prediction_file = self._prediction_file(ticker, prepared["digest"], seq_length, resolved)
+        if self.persist and os.path.exists(prediction_file):
+            self.stats["disk_hits"] += 1
+            return self._store(key, np.load(prediction_file))
+
+        model = self.model(model_file)
+        self.stats["misses"] += 1
+        X = self.sequences(data, ticker, seq_length, columns, model_file)
+        with torch.inference_mode():
+            predicted_scaled = model(X).numpy()
+        predicted = self._store(key, inverse_transform_column(prepared["scaler"], predicted_scaled[:, 0], prepared["target"]))
+        if self.persist:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(prediction_file, predicted)
+        return predicted
+
+# Cache mặc định dùng chung cho cả lần chạy (predict_future, plot_stock_price_lstm, ...)
+artifact_cache = ArtifactCache()
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from src.config import commission, slippage, periods_per_year, rank_metric, grid_memory_mb, backtest_block_mb
+from src.strategy import sma_grid_positions
+
+# Các chỉ số dùng để xếp hạng: True nếu càng lớn càng tốt (max_drawdown là số âm, càng gần 0 càng tốt)
+RANK_METRICS = {
+    "final_return": True,
+    "net_return": True,
+    "cagr": True,
+    "sharpe": True,
+    "max_drawdown": True,
+    "turnover": False,
+}
+METRIC_COLUMNS = ["final_return", "net_return", "cagr", "sharpe", "max_drawdown", "turnover", "exposure"]
+
+def _chunk_metrics(close, pairs, cost, periods_per_year):
+    """
+    Các chỉ số của một khối cặp tham số, tính trên cùng mảng vị thế của sma_grid_positions.
+    Returns:
+        list[tuple], dict[str, np.ndarray]: Các cặp hợp lệ và mỗi chỉ số một mảng theo cặp.
+    """
+    pairs, position, market_return = sma_grid_positions(close, None, None, pairs)
+    n = len(close)
+    # Số phiên có lợi nhuận chiến lược (từ phiên thứ hai sau khi SMA dài có giá trị, như apply_sma_strategy);
+    # trước đó vị thế luôn bằng 0 nên lợi nhuận chỉ cần chép ở những phiên đang giữ vị thế
+    periods = np.maximum(n - np.array([l for _, l in pairs]), 0)
+    returns = np.zeros(position.shape)
+    np.copyto(returns, market_return, where=position)
+
+    # Mỗi lần vị thế đổi (vào/ra thị trường) chịu phí giao dịch và trượt giá trên giá trị giao dịch
+    changes = position[:, 1:] != position[:, :-1]
+    equity = np.add(returns, 1)
+    # Lợi nhuận gộp: cùng hệ số (1 + lợi nhuận) và cùng thứ tự nhân với grid_search_sma_vectorized
+    if cost:
+        final_return = np.multiply.reduce(equity, axis=1)
+        np.subtract(returns[:, 1:], cost, out=returns[:, 1:], where=changes)
+        np.add(returns, 1, out=equity)
+    np.cumprod(equity, axis=1, out=equity)
+    net_return = equity[:, -1].copy()
+    if not cost:
+        final_return = net_return
+
+    # Sụt giảm lớn nhất của đường vốn sau phí
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.divide(equity, peak, out=peak)
+    max_drawdown = peak.min(axis=1) - 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total = returns.sum(axis=1)
+        variance = (np.einsum("ij,ij->i", returns, returns) - total * total / periods) / (periods - 1)
+        sharpe = np.where(variance > 0, total / periods / np.sqrt(variance), np.nan) * np.sqrt(periods_per_year)
+        years = periods / periods_per_year
+        metrics = {
+            "final_return": final_return,
+            "net_return": net_return,
+            "cagr": net_return ** (1 / years) - 1,
+            "sharpe": sharpe,
+            "max_drawdown": max_drawdown,
+            "turnover": np.count_nonzero(changes, axis=1) / years,
+            "exposure": np.count_nonzero(position, axis=1) / periods,
+        }
+    invalid = periods < 2
+    for values in metrics.values():
+        values[invalid] = np.nan
+    return pairs, metrics
+
+def grid_backtest(data, short_range, long_range, commission=commission, slippage=slippage,
+                  periods_per_year=periods_per_year, rank_by=rank_metric, max_mem_mb=grid_memory_mb):
+    """
+    Backtest toàn bộ lưới tham số SMA có tính chi phí giao dịch, tính mọi chỉ số trong một lượt trên cùng
+    mảng vị thế mà grid search dùng (theo khối trong giới hạn bộ nhớ).
+    Chỉ số của mỗi cặp (short, long):
+        - 'final_return': hiệu suất tích luỹ chưa trừ phí (giống grid_search_sma).
+        - 'net_return': hiệu suất tích luỹ sau phí; 'cagr': tăng trưởng kép hằng năm sau phí.
+        - 'sharpe': Sharpe hằng năm của lợi nhuận từng phiên sau phí (lãi suất phi rủi ro bằng 0).
+        - 'max_drawdown': sụt giảm lớn nhất của đường vốn sau phí (số âm).
+        - 'turnover': tổng thay đổi vị thế mỗi năm (mỗi lần vào hoặc ra thị trường tính là 1).
+        - 'exposure': tỷ lệ phiên đang giữ vị thế.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        commission (float): Phí giao dịch theo tỷ lệ giá trị giao dịch (0.0005 = 5 bps) mỗi lần đổi vị thế.
+        slippage (float): Trượt giá theo tỷ lệ giá trị giao dịch mỗi lần đổi vị thế.
+        periods_per_year (int): Số phiên mỗi năm (252 cho cổ phiếu, 365 cho crypto).
+        rank_by (str): Chỉ số xếp hạng, một trong RANK_METRICS.
+        max_mem_mb (float): Giới hạn bộ nhớ làm việc (MB) cho mỗi khối cặp tham số.
+    Returns:
+        pd.DataFrame: Các cột 'short_window', 'long_window' và các chỉ số, sắp xếp theo rank_by.
+    """
+    if rank_by not in RANK_METRICS:
+        raise ValueError(f"Chỉ số xếp hạng không hợp lệ: {rank_by}. Chỉ hỗ trợ {', '.join(RANK_METRICS)}.")
+    close = data['Close'].to_numpy(dtype=float)
+    pairs = [(s, l) for s in short_range for l in long_range if s < l]
+    # Mỗi cặp giữ lợi nhuận, đường vốn, đỉnh (float64), vị thế, thay đổi vị thế (bool) và dòng SMA riêng;
+    # khối nhỏ vừa bộ nhớ đệm CPU nhanh hơn một khối lớn dùng hết max_mem_mb
+    chunk_mb = min(max_mem_mb, backtest_block_mb)
+    chunk_size = max(int(chunk_mb * 2**20 // (4.25 * 8 * max(len(close), 1))), 1)
+
+    results = {column: [] for column in METRIC_COLUMNS}
+    for start in range(0, len(pairs), chunk_size):
+        _, metrics = _chunk_metrics(close, pairs[start:start + chunk_size], commission + slippage, periods_per_year)
+        for column in METRIC_COLUMNS:
+            results[column].append(metrics[column])
+
+    table = pd.DataFrame(pairs, columns=["short_window", "long_window"])
+    for column in METRIC_COLUMNS:
+        table[column] = np.concatenate(results[column]) if pairs else np.empty(0)
+    return table.sort_values(by=rank_by, ascending=not RANK_METRICS[rank_by], na_position="last")
+
+def backtest_metrics(data, short_window, long_window, **kwargs):
+    """Các chỉ số của grid_backtest cho một cặp tham số SMA."""
+    return grid_backtest(data, [short_window], [long_window], **kwargs).iloc[0].to_dict()
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import src.config as config
+    from src.batch_backtest import resolve_tickers
+    from src.data_loader import load_data
+    from src.strategy import grid_search_sma
+
+    parser = argparse.ArgumentParser(description="Cost-aware SMA Grid Backtest")
+    parser.add_argument('--tickers', '--ticker', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--pattern', type=str, default=None, help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--commission', type=float, default=config.commission, help='Phí giao dịch (tỷ lệ, 0.0005 = 5 bps)')
+    parser.add_argument('--slippage', type=float, default=config.slippage, help='Trượt giá (tỷ lệ)')
+    parser.add_argument('--periods_per_year', type=int, default=config.periods_per_year, help='Số phiên mỗi năm')
+    parser.add_argument('--rank_by', type=str, choices=list(RANK_METRICS), default=config.rank_metric, help='Chỉ số xếp hạng')
+    parser.add_argument('--top', type=int, default=5, help='Số cặp tham số in ra mỗi ticker')
+    parser.add_argument('--benchmark', action='store_true', help='So sánh thời gian với grid search chỉ tính final_return')
+    args = parser.parse_args()
+
+    for ticker in resolve_tickers(args.tickers, args.pattern) or [config.ticker]:
+        data = load_data(ticker, 'https://stooq.com' if args.data_source == 'Y' else 'local')
+        start = time.perf_counter()
+        table = grid_backtest(data, config.short_range, config.long_range, commission=args.commission,
+                              slippage=args.slippage, periods_per_year=args.periods_per_year, rank_by=args.rank_by)
+        elapsed = time.perf_counter() - start
+        print(f"{ticker} ({len(table)} cặp, {elapsed * 1000:.1f} ms), xếp hạng theo {args.rank_by}:")
+        print(table.head(args.top).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        if args.benchmark:
+            start = time.perf_counter()
+            grid_search_sma(data, config.short_range, config.long_range, method="vectorized")
+            print(f"grid_search_sma (chỉ final_return): {(time.perf_counter() - start) * 1000:.1f} ms")
\ No newline at end of file
@@ -0,0 +1,108 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.data_loader import load_data
+from src.strategy import grid_search_sma
+
+def ticker_from_path(file_path):
+    """Suy ra mã chứng khoán từ tên file dữ liệu cục bộ (ví dụ: data/aapl_us.csv -> AAPL)."""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if name.lower().endswith("_us"):
+        name = name[:-3]
+    return name.upper()
+
+def resolve_tickers(tickers=None, pattern=None):
+    """
+    Gộp danh sách ticker truyền vào và các ticker suy ra từ glob trên thư mục data/.
+    Args:
+        tickers (list[str]): Danh sách mã chứng khoán.
+        pattern (str): Mẫu glob, ví dụ 'data/*.csv'.
+    Returns:
+        list[str]: Danh sách ticker không trùng lặp, giữ nguyên thứ tự.
+    """
+    resolved = list(tickers or [])
+    if pattern:
+        resolved += [ticker_from_path(path) for path in sorted(glob.glob(pattern))]
+    return list(dict.fromkeys(resolved))
+
+def _search_worker(ticker, data_source, short_range, long_range, method):
+    """
+    Tải dữ liệu và chạy grid search trong tiến trình con, nên việc đọc file / tải từ Stooq của các ticker
+    cũng chạy song song và không có DataFrame nào phải pickle qua lại giữa các tiến trình.
+    """
+    close = load_data(ticker, data_source)['Close'].to_numpy(dtype=np.float64)
+    results = grid_search_sma(pd.DataFrame({'Close': close}), short_range, long_range, method=method)
+    # Chuỗi ngắn hơn mọi kỳ hạn dài cho toàn NaN
+    results = results.dropna(subset=["final_return"])
+    if results.empty:
+        return {"ticker": ticker, "rows": len(close),
+                "error": f"Không đủ dữ liệu ({len(close)} phiên) cho lưới tham số SMA"}
+    best = results.iloc[0]
+    return {
+        "ticker": ticker,
+        "rows": len(close),
+        "short_window": int(best['short_window']),
+        "long_window": int(best['long_window']),
+        "final_return": float(best['final_return']),
+    }
+
+def batch_grid_search(tickers, data_source, short_range, long_range, workers=None, method="vectorized"):
+    """
+    Chạy grid search SMA cho nhiều ticker song song bằng process pool; mỗi tiến trình con tự tải dữ liệu
+    của ticker mình (load_data) rồi chạy grid search.
+    Args:
+        tickers (list[str]): Danh sách mã chứng khoán.
+        data_source (str): 'https://stooq.com' hoặc 'local'.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        workers (int): Số tiến trình, mặc định bằng số CPU.
+        method (str): Phương thức grid search truyền cho grid_search_sma.
+    Returns:
+        pd.DataFrame: Bảng tổng hợp bộ tham số tốt nhất và lợi nhuận cuối cùng của từng ticker; ticker lỗi
+            (không tải được dữ liệu, không đủ dữ liệu) có cột 'error' và được xếp cuối.
+    """
+    columns = ["ticker", "rows", "short_window", "long_window", "final_return"]
+    if not tickers:
+        return pd.DataFrame(columns=columns)
+
+    summary = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_search_worker, ticker, data_source, short_range, long_range, method) for ticker in tickers]
+        for ticker, future in zip(tickers, futures):
+            try:
+                summary.append(future.result())
+            except Exception as e:
+                summary.append({"ticker": ticker, "error": str(e)})
+
+    summary = pd.DataFrame(summary).reindex(columns=columns + (["error"] if any("error" in r for r in summary) else []))
+    return summary.sort_values(by="final_return", ascending=False, na_position="last").reset_index(drop=True)
+
+if __name__ == "__main__":
+    import argparse
+    import src.config as config
+
+    parser = argparse.ArgumentParser(description="Batch SMA Grid Search")
+    parser.add_argument('--tickers', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--pattern', type=str, default=None, help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--workers', type=int, default=config.batch_workers, help='Số tiến trình chạy song song')
+    parser.add_argument('--output', type=str, default=None, help='Đường dẫn file CSV lưu bảng tổng hợp')
+    args = parser.parse_args()
+
+    tickers = resolve_tickers(args.tickers, args.pattern)
+    if not tickers:
+        tickers = resolve_tickers(pattern="data/*.csv")
+    data_source = 'https://stooq.com' if args.data_source == 'Y' else 'local'
+
+    print(f"Đang chạy grid search cho {len(tickers)} ticker: {', '.join(tickers)}")
+    summary = batch_grid_search(tickers, data_source, config.short_range, config.long_range,
+                                workers=args.workers, method=config.grid_search_method)
+    print(summary.to_string(index=False))
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        summary.to_csv(args.output, index=False)
+        print(f"Đã lưu bảng tổng hợp tại {args.output}")
@@ -0,0 +1,293 @@
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import torch
+from src.config import benchmark_path, short_range, long_range, sequence_length, regression_threshold
+from src.create_sequences import create_sequences
+from src.profiling import _max_rss_mb
+from src.scaling_data import scale_data
+from src.strategy import apply_sma_strategy, grid_search_sma
+
+# Lưới tham số SMA theo kích thước, 'full' là lưới mặc định trong config
+GRIDS = {
+    "small": (range(10, 60, 10), range(50, 300, 50)),
+    "full": (short_range, long_range),
+    "dense": (range(5, 200), range(20, 400)),
+}
+
+def synthetic_prices(n_bars, seed=0, start_price=100.0, drift=0.0, volatility=0.001, freq="min"):
+    """
+    Sinh dữ liệu OHLCV giả lập theo bước ngẫu nhiên hình học (random walk của log giá), tạo hoàn toàn bằng NumPy.
+    Dùng nến phút để 10^7 phiên vẫn nằm trong khoảng ngày pandas hỗ trợ.
+    Args:
+        n_bars (int): Số phiên.
+        seed (int): Hạt giống ngẫu nhiên.
+        start_price (float): Giá khởi điểm.
+        drift (float): Kỳ vọng log lợi nhuận mỗi phiên.
+        volatility (float): Độ lệch chuẩn log lợi nhuận mỗi phiên.
+        freq (str): Tần suất của chỉ mục thời gian.
+    Returns:
+        pd.DataFrame: Dữ liệu với chỉ mục 'Date' và các cột 'Open', 'High', 'Low', 'Close', 'Volume'.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(drift, volatility, n_bars)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    wick = np.abs(rng.normal(0, volatility / 2, (2, n_bars)))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + wick[0]),
+        "Low": np.minimum(open_, close) * (1 - wick[1]),
+        "Close": close,
+        "Volume": rng.integers(10**5, 10**7, n_bars),
+    }, index=pd.date_range("2000-01-01", periods=n_bars, freq=freq, name="Date"))
+
+def measure(func, repeats=3, setup=None):
+    """
+    Đo một hàm: thời gian thực và CPU nhỏ nhất qua repeats lần chạy, rồi chạy thêm một lần dưới tracemalloc
+    để lấy bộ nhớ đỉnh cấp phát thêm trong lần chạy (tách riêng để chi phí theo dõi cấp phát không làm sai lệch thời gian).
+    Args:
+        func (callable): Hàm cần đo, nhận các giá trị do setup trả về.
+        repeats (int): Số lần đo thời gian.
+        setup (callable): Nếu có, được gọi (không tính giờ) trước mỗi lần chạy và trả về tuple tham số cho func,
+            ví dụ để mỗi lần đo huấn luyện bắt đầu từ một mô hình mới.
+    Returns:
+        dict: 'wall_s', 'cpu_s', 'peak_mem_mb', 'max_rss_mb'.
+    """
+    wall, cpu = [], []
+    for _ in range(repeats):
+        args = setup() if setup else ()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func(*args)
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    args = setup() if setup else ()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    if not tracing:
+        tracemalloc.stop()
+    return {"wall_s": min(wall), "cpu_s": min(cpu), "peak_mem_mb": max(peak, 0) / 2**20, "max_rss_mb": _max_rss_mb()}
+
+def _windows_tensors(data, seq_length, limit):
+    """Tensor (X, y) của limit cửa sổ cuối cùng, dùng cho benchmark huấn luyện."""
+    scaled, _ = scale_data(data[['Close']].values[-(limit + seq_length):])
+    X, y = create_sequences(scaled, seq_length)
+    return torch.tensor(X, dtype=torch.float32), torch.tensor(y, dtype=torch.float32)
+
+def run_benchmarks(datasets, grids=("small", "full"), methods=("vectorized",), seq_lengths=(sequence_length,),
+                   batch_sizes=(None, 256), repeats=3, train_windows=20000, infer_windows=100000, max_mem_mb=2048,
+                   log=print):
+    """
+    Chạy bộ benchmark trên các tập dữ liệu.
+    Args:
+        datasets (dict): Tên tập dữ liệu -> DataFrame (cột 'Close', và chỉ mục ngày).
+        grids (list[str]): Các kích thước lưới SMA trong GRIDS.
+        methods (list[str]): Phương thức grid search ('vectorized', 'chunked', 'loop').
+        seq_lengths (list[int]): Các giá trị sequence_length.
+        batch_sizes (list[int]): Các kích thước mini-batch khi huấn luyện (None = full-batch).
+        repeats (int): Số lần lặp mỗi phép đo.
+        train_windows (int): Số cửa sổ (cuối chuỗi) dùng cho một epoch huấn luyện.
+        infer_windows (int): Số cửa sổ (cuối chuỗi) dùng cho suy luận toàn lịch sử.
+        max_mem_mb (int): Bỏ qua phép đo nếu ước lượng bộ nhớ làm việc của nó (các ma trận grid search vector hoá,
+            bản sao các cửa sổ) vượt ngưỡng này (MB).
+        log (callable): Hàm in tiến độ.
+    Returns:
+        list[dict]: Mỗi phép đo một dòng gồm 'name', 'dataset', 'params', 'rows' và số đo của measure (hoặc 'skipped').
+    """
+    from src.artifact_cache import ArtifactCache
+    from src.model import RNN_LSTMModel
+    from src.train import train_model
+
+    results = []
+
+    def record(name, dataset, params, rows, func, setup=None):
+        entry = {"name": name, "dataset": dataset, "params": params, "rows": rows}
+        try:
+            entry.update(measure(func, repeats, setup))
+        except MemoryError as e:
+            entry["skipped"] = f"MemoryError: {e}"
+        results.append(entry)
+        log(f"{name:<22}{dataset:<20}{json.dumps(params):<45}" +
+            (f"{entry['wall_s']:>10.4f}s{entry['peak_mem_mb']:>10.1f}MB" if "wall_s" in entry else f"  bỏ qua ({entry['skipped']})"))
+
+    def skip_if_large(name, dataset, params, rows, nbytes):
+        if nbytes / 2**20 <= max_mem_mb:
+            return False
+        results.append({"name": name, "dataset": dataset, "params": params, "rows": rows,
+                        "skipped": f"cần {nbytes / 2**20:.0f} MB, vượt {max_mem_mb} MB"})
+        log(f"{name:<22}{dataset:<20}{json.dumps(params):<45}  bỏ qua ({results[-1]['skipped']})")
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dataset, data in datasets.items():
+            n = len(data)
+            for grid in grids:
+                short, long = GRIDS[grid]
+                pairs = sum(1 for s in short for l in long if s < l)
+                for method in methods:
+                    params = {"grid": grid, "pairs": pairs, "method": method}
+                    # Bản vector hoá giữ cùng lúc khoảng 3 ma trận (số cặp x số phiên): vị thế, hệ số và cumprod
+                    if method == "vectorized" and skip_if_large("grid_search_sma", dataset, params, n, 3 * pairs * n * 8):
+                        continue
+                    record("grid_search_sma", dataset, params, n,
+                           lambda: grid_search_sma(data, short, long, method=method))
+
+            record("apply_sma_strategy", dataset, {"short_window": 20, "long_window": 100}, n,
+                   lambda: apply_sma_strategy(data, 20, 100))
+            features = data[['Close']].values
+            record("scale_data", dataset, {}, n, lambda: scale_data(features))
+            scaled, _ = scale_data(features)
+
+            for seq_length in seq_lengths:
+                # create_sequences trả về view; np.ascontiguousarray đo cả chi phí khi cần bản sao liền mạch
+                record("create_sequences", dataset, {"seq_length": seq_length}, n,
+                       lambda: create_sequences(scaled, seq_length))
+                if not skip_if_large("create_sequences_copy", dataset, {"seq_length": seq_length}, n, n * seq_length * 8):
+                    record("create_sequences_copy", dataset, {"seq_length": seq_length}, n,
+                           lambda: np.ascontiguousarray(create_sequences(scaled, seq_length)[0]))
+
+                X, y = _windows_tensors(data, seq_length, train_windows)
+                def fresh_model():
+                    # Mỗi lần đo huấn luyện một mô hình mới cùng khởi tạo, không tiếp tục mô hình đã huấn luyện một phần
+                    torch.manual_seed(0)
+                    return (RNN_LSTMModel(),)
+
+                for batch_size in batch_sizes:
+                    record("train_model_epoch", dataset, {"seq_length": seq_length, "batch_size": batch_size}, len(X),
+                           lambda model: train_model(model, X, y, num_epochs=1, batch_size=batch_size, verbose=False),
+                           setup=fresh_model)
+
+                # Suy luận toàn lịch sử qua ArtifactCache (không dùng cache đĩa) với mô hình khởi tạo ngẫu nhiên
+                torch.manual_seed(0)
+                model_file = f"{tmp}/model_bench_{seq_length}.pth"
+                torch.save(RNN_LSTMModel().state_dict(), model_file)
+                tail = data.iloc[-(infer_windows + seq_length):]
+                record("predict_history", dataset, {"seq_length": seq_length}, len(tail) - seq_length,
+                       lambda: ArtifactCache(persist=False).predictions(tail, "bench", model_file, seq_length))
+                record("predict_next", dataset, {"seq_length": seq_length}, 1,
+                       lambda: ArtifactCache(persist=False).predictions(tail, "bench", model_file, seq_length, last_only=True))
+    return results
+
+def save_results(results, output_file, params=None):
+    """Ghi kết quả benchmark ra JSON kèm thông tin máy và phiên bản thư viện."""
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                        "numpy": np.__version__, "pandas": pd.__version__, "torch": torch.__version__},
+            "params": params or {},
+            "results": results,
+        }, f, indent=2, default=str)
+    return output_file
+
+def _key(entry):
+    return entry["name"], entry["dataset"], json.dumps(entry["params"], sort_keys=True)
+
+def compare_results(baseline, current, threshold=regression_threshold, min_seconds=0.005):
+    """
+    So sánh hai file kết quả benchmark.
+    Args:
+        baseline (dict): Nội dung JSON của lần chạy mốc.
+        current (dict): Nội dung JSON của lần chạy hiện tại.
+        threshold (float): Tỷ lệ chậm hơn (hoặc tốn bộ nhớ hơn) được coi là suy giảm, ví dụ 0.15 = 15%.
+        min_seconds (float): Bỏ qua suy giảm thời gian của các phép đo ngắn hơn ngưỡng này (nhiễu đo).
+    Returns:
+        pd.DataFrame: Mỗi phép đo một dòng với thời gian, bộ nhớ, tỷ lệ và trạng thái
+            ('ok', 'faster', 'REGRESSION', 'new', 'missing', 'skipped').
+    """
+    base = {_key(e): e for e in baseline["results"]}
+    rows = []
+    for entry in current["results"]:
+        old = base.pop(_key(entry), None)
+        row = {"name": entry["name"], "dataset": entry["dataset"], "params": json.dumps(entry["params"], sort_keys=True)}
+        if old is None or "wall_s" not in old or "wall_s" not in entry:
+            row["status"] = "new" if old is None else "skipped"
+            rows.append(row)
+            continue
+        time_ratio = entry["wall_s"] / max(old["wall_s"], 1e-12)
+        mem_ratio = (entry["peak_mem_mb"] + 1) / (old["peak_mem_mb"] + 1)
+        slower = time_ratio > 1 + threshold and max(entry["wall_s"], old["wall_s"]) >= min_seconds
+        row.update({"baseline_s": old["wall_s"], "current_s": entry["wall_s"], "time_ratio": time_ratio,
+                    "baseline_mb": old["peak_mem_mb"], "current_mb": entry["peak_mem_mb"], "mem_ratio": mem_ratio})
+        if slower or mem_ratio > 1 + threshold:
+            row["status"] = "REGRESSION"
+        elif time_ratio < 1 - threshold:
+            row["status"] = "faster"
+        else:
+            row["status"] = "ok"
+        rows.append(row)
+    for entry in base.values():
+        rows.append({"name": entry["name"], "dataset": entry["dataset"],
+                     "params": json.dumps(entry["params"], sort_keys=True), "status": "missing"})
+    return pd.DataFrame(rows)
+
+def _parse_size(value):
+    """Cho phép viết số phiên dạng 1e6."""
+    return int(float(value))
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import sys
+    from src.batch_backtest import ticker_from_path
+    from src.data_loader import load_data
+
+    parser = argparse.ArgumentParser(description="Benchmark Suite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Chạy benchmark và lưu kết quả JSON")
+    run_parser.add_argument('--pattern', type=str, default="data/*.csv", help="Mẫu glob dữ liệu đi kèm, '' để bỏ qua")
+    run_parser.add_argument('--sizes', type=_parse_size, nargs='*', default=[10**6], help='Số phiên của dữ liệu giả lập, ví dụ 1e6 1e7')
+    run_parser.add_argument('--grids', type=str, nargs='+', choices=list(GRIDS), default=['small', 'full'], help='Kích thước lưới SMA (dense: lưới bước 1 cho chunked)')
+    run_parser.add_argument('--methods', type=str, nargs='+', choices=['vectorized', 'chunked', 'loop'], default=['vectorized'], help='Phương thức grid search')
+    run_parser.add_argument('--seq_lengths', type=int, nargs='+', default=[sequence_length], help='Các giá trị sequence_length')
+    run_parser.add_argument('--batch_sizes', type=int, nargs='+', default=[0, 256], help='Kích thước mini-batch (0 = full-batch)')
+    run_parser.add_argument('--repeats', type=int, default=3, help='Số lần lặp mỗi phép đo')
+    run_parser.add_argument('--train_windows', type=int, default=20000, help='Số cửa sổ cho một epoch huấn luyện')
+    run_parser.add_argument('--infer_windows', type=int, default=100000, help='Số cửa sổ cho suy luận toàn lịch sử')
+    run_parser.add_argument('--max_mem_mb', type=int, default=2048, help='Giới hạn bộ nhớ làm việc (MB) ước lượng cho mỗi phép đo')
+    run_parser.add_argument('--output', type=str, default=None, help='File JSON kết quả (mặc định benchmarks/<thời gian>.json)')
+    run_parser.add_argument('--save_baseline', action='store_true', help='Ghi thêm kết quả làm mốc so sánh (benchmarks/baseline.json)')
+
+    compare_parser = subparsers.add_parser("compare", help="So sánh kết quả với mốc và báo suy giảm")
+    compare_parser.add_argument('current', type=str, help='File JSON kết quả cần kiểm tra')
+    compare_parser.add_argument('--baseline', type=str, default=f"{benchmark_path}/baseline.json", help='File JSON mốc')
+    compare_parser.add_argument('--threshold', type=float, default=regression_threshold, help='Ngưỡng suy giảm (0.15 = chậm hơn 15%%)')
+    args = parser.parse_args()
+
+    if args.command == "run":
+        datasets = {}
+        for path in sorted(glob.glob(args.pattern)) if args.pattern else []:
+            ticker = ticker_from_path(path)
+            datasets[ticker] = load_data(ticker, 'local')
+        for size in args.sizes:
+            datasets[f"synthetic_{size:.0e}".replace("+0", "")] = synthetic_prices(size)
+        params = {k: v for k, v in vars(args).items() if k not in ("command", "output", "save_baseline")}
+        results = run_benchmarks(datasets, args.grids, args.methods, args.seq_lengths,
+                                 [b or None for b in args.batch_sizes], args.repeats, args.train_windows,
+                                 args.infer_windows, args.max_mem_mb)
+        output = args.output or f"{benchmark_path}/{time.strftime('%Y%m%d-%H%M%S')}.json"
+        print(f"Đã lưu kết quả tại {save_results(results, output, params)}")
+        if args.save_baseline:
+            print(f"Đã lưu mốc so sánh tại {save_results(results, f'{benchmark_path}/baseline.json', params)}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        report = compare_results(baseline, current, args.threshold)
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        regressions = report[report["status"] == "REGRESSION"]
+        print(f"{len(regressions)} phép đo suy giảm quá {args.threshold:.0%}")
+        sys.exit(1 if len(regressions) else 0)
\ No newline at end of file
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import src.config as config
+
+# Module mỗi lệnh cần; chỉ được import bên trong hàm xử lý lệnh để lệnh nào trả phí import của lệnh đó
+STAGE_MODULES = {
+    "backtest": ("src.batch_backtest", "src.data_loader", "src.strategy", "src.backtest"),
+    "train": ("src.batch_backtest", "src.train_farm"),
+    "predict": ("src.batch_backtest", "src.data_loader", "src.predict"),
+    "plot": ("src.batch_backtest", "src.data_loader", "src.strategy", "src.visualization"),
+}
+
+# Thư viện nặng được theo dõi khi đo thời gian khởi động
+HEAVY_MODULES = ("torch", "matplotlib", "sklearn", "requests", "tqdm")
+
+# Thư viện mà mỗi lệnh không được phép nạp (kiểm tra bằng lệnh startup --check)
+IMPORT_BUDGET = {
+    "backtest": ("torch", "matplotlib", "sklearn"),
+}
+
+def data_source_url(flag):
+    """Đổi cờ Y/N của dòng lệnh thành data_source cho load_data."""
+    return 'https://stooq.com' if flag.upper() == 'Y' else 'local'
+
+def run_backtest(args):
+    """Grid search SMA: một ticker in bảng kết quả tốt nhất, nhiều ticker chạy song song qua batch_grid_search."""
+    from src.batch_backtest import batch_grid_search, resolve_tickers
+    from src.data_loader import load_data
+    from src.strategy import apply_sma_strategy, grid_search_sma
+
+    tickers = resolve_tickers(args.tickers, args.pattern) or [config.ticker]
+    data_source = data_source_url(args.data_source)
+    if args.rank_by:
+        import pandas as pd
+        from src.backtest import grid_backtest
+        tables = []
+        for ticker in tickers:
+            table = grid_backtest(load_data(ticker, data_source), config.short_range, config.long_range,
+                                  commission=args.commission, slippage=args.slippage, rank_by=args.rank_by)
+            print(f"{ticker}:\n" + table.head().to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+            tables.append(table.head(1).assign(ticker=ticker))
+        summary = pd.concat(tables, ignore_index=True)
+    elif len(tickers) > 1:
+        summary = batch_grid_search(tickers, data_source, config.short_range, config.long_range,
+                                    workers=args.workers, method=config.grid_search_method)
+    else:
+        data = load_data(tickers[0], data_source)
+        results = grid_search_sma(data, config.short_range, config.long_range, method=config.grid_search_method)
+        print(results.head().to_string(index=False))
+        best = results.iloc[0]
+        market, strategy = apply_sma_strategy(data, int(best['short_window']), int(best['long_window']))
+        print(f"{tickers[0]}: SMA {int(best['short_window'])}/{int(best['long_window'])}, "
+              f"thị trường x{market.iloc[-1]:.3f}, chiến lược x{strategy.iloc[-1]:.3f}")
+        summary = results.head(1).assign(ticker=tickers[0])
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        summary.to_csv(args.output, index=False)
+        print(f"Đã lưu kết quả tại {args.output}")
+    elif len(tickers) > 1 and not args.rank_by:
+        print(summary.to_string(index=False))
+
+def run_train(args):
+    """Huấn luyện song song các ticker qua train_farm (checkpoint, dừng sớm, manifest)."""
+    from src.batch_backtest import resolve_tickers
+    from src.train_farm import train_universe
+
+    tickers = resolve_tickers(args.tickers, args.pattern) or resolve_tickers(pattern="data/*.csv")
+    print(f"Đang huấn luyện {len(tickers)} ticker: {', '.join(tickers)}")
+    manifest = train_universe(tickers, workers=args.workers, manifest_path=args.manifest,
+                              data_source=data_source_url(args.data_source), num_epochs=args.epochs,
+                              batch_size=args.batch_size, val_fraction=args.val_fraction, patience=args.patience,
+                              checkpoint_every=args.checkpoint_every, columns=args.features, compact=args.compact)
+    failed = [entry["ticker"] for entry in manifest if "error" in entry]
+    print(f"Đã huấn luyện {len(manifest) - len(failed)}/{len(manifest)} ticker" + (f", lỗi: {', '.join(failed)}" if failed else ""))
+    return 1 if failed else 0
+
+def run_predict(args):
+    """Dự báo giá đóng cửa tiếp theo cho từng ticker bằng mô hình đã lưu."""
+    from src.batch_backtest import resolve_tickers
+    from src.data_loader import load_data
+    from src.predict import predict_future
+
+    for ticker in resolve_tickers(args.tickers, args.pattern) or [config.ticker]:
+        print(f"{ticker}:")
+        predict_future(ticker=ticker, data=load_data(ticker, data_source_url(args.data_source)))
+
+def run_plot(args):
+    """Vẽ các biểu đồ SMA (và dự báo nếu ticker có mô hình) song song, bỏ qua biểu đồ không đổi."""
+    from src.batch_backtest import resolve_tickers
+    from src.data_loader import load_data
+    from src.strategy import grid_search_sma
+    from src.visualization import render_charts, ticker_chart_specs
+
+    specs = []
+    for ticker in resolve_tickers(args.tickers, args.pattern) or [config.ticker]:
+        data = load_data(ticker, data_source_url(args.data_source))
+        short_window, long_window = args.short_window, args.long_window
+        if short_window is None or long_window is None:
+            best = grid_search_sma(data, config.short_range, config.long_range, method=config.grid_search_method).iloc[0]
+            short_window = short_window or int(best['short_window'])
+            long_window = long_window or int(best['long_window'])
+        specs += ticker_chart_specs(data, ticker, short_window, long_window)
+    counts = render_charts(specs, workers=args.workers, force=args.force)
+    print(f"Đã vẽ {counts['rendered']}, bỏ qua {counts['skipped']} (không đổi) biểu đồ tại {config.pic_path}/")
+
+def _probe(code):
+    """
+    Chạy đoạn mã trong một trình thông dịch mới và đo thời gian.
+    Returns:
+        dict: 'process_ms' (cả khởi động Python), 'import_ms' (riêng đoạn mã) và 'loaded' (thư viện nặng đã nạp).
+    """
+    script = (
+        "import json, sys, time\n"
+        "_start = time.perf_counter()\n"
+        f"{code}\n"
+        "_elapsed = time.perf_counter() - _start\n"
+        f"print(json.dumps({{'import_ms': _elapsed * 1000, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env)
+    process_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "lỗi không rõ")
+    return {"process_ms": process_ms, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+def startup_benchmark(stages=tuple(STAGE_MODULES), repeats=3):
+    """
+    Đo thời gian khởi động của từng lệnh: mỗi lần đo là một tiến trình Python mới import src.cli
+    rồi các module của lệnh đó (không chạy tính toán). Lấy lần nhanh nhất trong repeats lần.
+    Returns:
+        list[dict]: Mỗi lệnh một dòng với 'stage', 'process_ms', 'import_ms' và 'loaded'.
+    """
+    rows = [{"stage": "cli", **min((_probe("import src.cli") for _ in range(repeats)), key=lambda r: r["import_ms"])}]
+    for stage in stages:
+        code = "import importlib, src.cli\n" + "\n".join(f"importlib.import_module({m!r})" for m in STAGE_MODULES[stage])
+        rows.append({"stage": stage, **min((_probe(code) for _ in range(repeats)), key=lambda r: r["import_ms"])})
+    return rows
+
+def check_import_budget(stage="backtest", argv=None):
+    """
+    Chạy thật một lệnh trong tiến trình mới và liệt kê các thư viện bị cấm trong IMPORT_BUDGET đã bị nạp.
+    Args:
+        stage (str): Lệnh cần kiểm tra.
+        argv (list[str]): Tham số của lệnh, mặc định chạy trên dữ liệu cục bộ của ticker mặc định.
+    Returns:
+        list[str]: Thư viện vi phạm (rỗng nếu đạt).
+    """
+    argv = argv or [stage, "--tickers", config.ticker, "--data_source", "N"]
+    result = _probe("import runpy\n"
+                    f"sys.argv = ['src.cli'] + {argv!r}\n"
+                    "try:\n"
+                    "    runpy.run_module('src.cli', run_name='__main__', alter_sys=True)\n"
+                    "except SystemExit:\n"
+                    "    pass")
+    return [m for m in IMPORT_BUDGET.get(stage, ()) if m in result["loaded"]]
+
+def run_startup(args):
+    """In bảng thời gian khởi động; với --check, thoát mã 1 nếu có lệnh vượt ngân sách import."""
+    for row in startup_benchmark(repeats=args.repeats):
+        print(f"{row['stage']:<10} tiến trình {row['process_ms']:8.1f} ms   import {row['import_ms']:8.1f} ms   "
+              f"nạp: {', '.join(row['loaded']) or '-'}")
+    if not args.check:
+        return 0
+    status = 0
+    for stage in IMPORT_BUDGET:
+        violations = check_import_budget(stage)
+        print(f"Ngân sách import '{stage}': " + (f"VI PHẠM ({', '.join(violations)})" if violations else "đạt"))
+        status = status or int(bool(violations))
+    return status
+
+def build_parser():
+    """Parser dòng lệnh với các lệnh con backtest, train, predict, plot và startup."""
+    # src.backtest chỉ cần numpy/pandas nên import ở đây không phá ngân sách import của lệnh nào
+    from src.backtest import RANK_METRICS
+
+    parser = argparse.ArgumentParser(description="Stock Prediction CLI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command):
+        command.add_argument('--tickers', '--ticker', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+        command.add_argument('--pattern', type=str, default=None, help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+        command.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                             help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+
+    backtest = commands.add_parser('backtest', help='Grid search chiến lược SMA (không nạp PyTorch/matplotlib)')
+    add_common(backtest)
+    backtest.add_argument('--workers', type=int, default=config.batch_workers, help='Số tiến trình khi có nhiều ticker')
+    backtest.add_argument('--output', type=str, default=None, help='Đường dẫn file CSV lưu kết quả')
+    backtest.add_argument('--rank_by', type=str, default=None,
+                          choices=list(RANK_METRICS),
+                          help='Backtest có phí và xếp hạng theo chỉ số này (mặc định: grid search theo final_return)')
+    backtest.add_argument('--commission', type=float, default=config.commission, help='Phí giao dịch khi dùng --rank_by')
+    backtest.add_argument('--slippage', type=float, default=config.slippage, help='Trượt giá khi dùng --rank_by')
+    backtest.set_defaults(handler=run_backtest)
+
+    train = commands.add_parser('train', help='Huấn luyện mô hình RNN + LSTM song song nhiều ticker')
+    add_common(train)
+    train.add_argument('--workers', type=int, default=config.farm_workers, help='Số tiến trình huấn luyện song song')
+    train.add_argument('--epochs', type=int, default=100, help='Số epoch tối đa')
+    train.add_argument('--batch_size', type=int, default=config.batch_size, help='Kích thước mini-batch')
+    train.add_argument('--val_fraction', type=float, default=config.val_fraction, help='Tỷ lệ dữ liệu cuối dùng để kiểm định')
+    train.add_argument('--patience', type=int, default=config.patience, help='Số epoch chờ trước khi dừng sớm')
+    train.add_argument('--checkpoint_every', type=int, default=config.checkpoint_every, help='Chu kỳ lưu checkpoint (epoch)')
+    train.add_argument('--features', type=str, nargs='+', default=config.feature_columns, help='Danh sách đặc trưng đầu vào')
+    train.add_argument('--manifest', type=str, default=None, help='Đường dẫn file manifest JSON')
+    train.add_argument('--compact', action='store_true', help='Nạp dữ liệu dạng gọn (float32) cho lịch sử nến phút dài')
+    train.set_defaults(handler=run_train)
+
+    predict = commands.add_parser('predict', help='Dự báo giá tiếp theo bằng mô hình đã lưu')
+    add_common(predict)
+    predict.set_defaults(handler=run_predict)
+
+    plot = commands.add_parser('plot', help='Vẽ biểu đồ SMA và dự báo')
+    add_common(plot)
+    plot.add_argument('--short_window', type=int, default=None, help='SMA short window (mặc định: tốt nhất theo grid search)')
+    plot.add_argument('--long_window', type=int, default=None, help='SMA long window (mặc định: tốt nhất theo grid search)')
+    plot.add_argument('--workers', type=int, default=config.chart_workers, help='Số tiến trình vẽ song song')
+    plot.add_argument('--force', action='store_true', help='Vẽ lại kể cả khi dữ liệu không đổi')
+    plot.set_defaults(handler=run_plot)
+
+    startup = commands.add_parser('startup', help='Đo thời gian khởi động từng lệnh và kiểm tra ngân sách import')
+    startup.add_argument('--repeats', type=int, default=3, help='Số lần đo mỗi lệnh (lấy lần nhanh nhất)')
+    startup.add_argument('--check', action='store_true', help="Thoát mã 1 nếu lệnh 'backtest' nạp PyTorch, matplotlib hoặc sklearn")
+    startup.set_defaults(handler=run_startup)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
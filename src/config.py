@@ -6,4 +6,56 @@ long_range = range(50, 300, 10) # Khoảng tìm kiếm bộ tham số SMA dài
 sequence_length = 60 # Chiều dài chuỗi đầu vào cho mô hình LSTM
 model_path = "../stock-prediction/model"  # Đường dẫn đến mô hình LSTM
 pic_path = "../stock-prediction/pic"  # Thư mục lưu ảnh biểu đồ
-data_source = "https://stooq.com"  # Nguồn dữ liệu, có thể là 'https://stooq.com' hoặc 'local'
\ No newline at end of file
+data_source = "https://stooq.com"  # Nguồn dữ liệu, có thể là 'https://stooq.com' hoặc 'local'
+grid_search_method = "vectorized"  # Cách chạy grid search SMA: "vectorized" (NumPy), "chunked" (theo khối, giữ top-K) hoặc "loop" (DataFrame từng cặp)
+batch_workers = None  # Số tiến trình cho batch backtest, None = số CPU của máy
+cache_path = "../stock-prediction/cache"  # Thư mục cache dữ liệu tải từ Stooq
+cache_max_age_hours = 12  # Tuổi tối đa (giờ) của cache trước khi kiểm tra dữ liệu mới
+batch_size = None  # Kích thước mini-batch khi huấn luyện, None = full-batch
+num_workers = 0  # Số tiến trình DataLoader khi huấn luyện mini-batch
+num_threads = None  # Số luồng intra-op của PyTorch, None = mặc định của PyTorch
+num_interop_threads = None  # Số luồng inter-op của PyTorch, None = mặc định của PyTorch
+model_cache_size = 16  # Số mô hình tối đa giữ trong cache của dịch vụ dự báo
+download_concurrency = 8  # Số kết nối tải song song tới Stooq
+download_timeout = 30  # Timeout (giây) cho mỗi yêu cầu tải dữ liệu
+download_retries = 3  # Số lần thử lại khi tải dữ liệu gặp lỗi tạm thời
+download_backoff = 0.5  # Thời gian chờ (giây) trước lần thử lại đầu tiên, tăng gấp đôi sau mỗi lần
+profile_path = "../stock-prediction/profile"  # Thư mục lưu báo cáo profiling
+artifact_path = "../stock-prediction/cache/artifacts"  # Thư mục lưu dự báo đã tính để dùng lại giữa các lần chạy
+artifact_cache_size = 64  # Số mục (đặc trưng, tensor chuỗi, mô hình, dự báo) tối đa ArtifactCache giữ trong bộ nhớ (LRU)
+walk_forward_train_size = 1000  # Số phiên của cửa sổ huấn luyện trong walk-forward
+walk_forward_test_size = 250  # Số phiên kiểm tra của mỗi fold walk-forward
+checkpoint_path = "../stock-prediction/cache/checkpoints"  # Thư mục lưu checkpoint huấn luyện để tiếp tục khi bị gián đoạn
+checkpoint_every = 10  # Lưu checkpoint sau mỗi bao nhiêu epoch
+val_fraction = 0.1  # Tỷ lệ dữ liệu cuối (theo thời gian) dùng để kiểm định
+patience = 10  # Số epoch val_loss không cải thiện trước khi dừng sớm
+farm_workers = None  # Số tiến trình huấn luyện song song (None = min(số ticker, số core))
+chart_dpi = 100  # Độ phân giải biểu đồ (điểm ảnh mỗi inch), quyết định số điểm giữ lại khi giảm mẫu
+chart_workers = None  # Số tiến trình vẽ biểu đồ song song (None = số CPU)
+inference_mode = "script"  # Artifact suy luận ưu tiên khi có: "eager" (.pth), "script" (TorchScript) hoặc "int8" (lượng tử hoá động)
+feature_columns = ["Close"]  # Đặc trưng đầu vào của mô hình: Open, High, Low, Close, Volume, Return, Volatility, SMA_Spread
+volatility_window = 20  # Số phiên tính độ biến động (Volatility)
+sma_spread_windows = (20, 100)  # Kỳ hạn (ngắn, dài) của SMA cho đặc trưng SMA_Spread
+forecast_horizon = 10  # Số phiên dự báo nhiều bước
+forecast_paths = 1  # Số đường mô phỏng Monte Carlo mỗi ticker (1 = dự báo tất định)
+benchmark_path = "../stock-prediction/benchmarks"  # Thư mục lưu kết quả benchmark và mốc so sánh
+regression_threshold = 0.15  # Tỷ lệ chậm hơn (hoặc tốn bộ nhớ hơn) so với mốc được coi là suy giảm
+grid_top_k = 10  # Số bộ tham số SMA tốt nhất giữ lại khi grid search theo khối (chunked)
+grid_memory_mb = 256  # Giới hạn bộ nhớ làm việc (MB) cho mỗi khối cặp tham số khi grid search theo khối
+grid_refine_step = 1  # Bước quét mịn quanh các ô tốt nhất của lưới thô (None = chỉ chạy lưới thô)
+full_batch_max_windows = 20000  # Số cửa sổ tối đa khi huấn luyện full-batch (~1.5 GB activation mỗi 10000 cửa sổ), vượt quá thì tự chuyển sang mini-batch
+large_batch_size = 1024  # Kích thước mini-batch dùng khi số cửa sổ vượt full_batch_max_windows (lịch sử nến phút)
+commission = 0.0005  # Phí giao dịch theo tỷ lệ giá trị giao dịch mỗi lần đổi vị thế (0.0005 = 5 bps)
+slippage = 0.0005  # Trượt giá theo tỷ lệ giá trị giao dịch mỗi lần đổi vị thế
+periods_per_year = 252  # Số phiên mỗi năm để quy đổi Sharpe, CAGR, turnover (365 cho crypto)
+rank_metric = "sharpe"  # Chỉ số xếp hạng của backtest có phí: final_return, net_return, cagr, sharpe, max_drawdown, turnover
+backtest_block_mb = 4  # Kích thước khối cặp tham số (MB) khi backtest nhiều chỉ số, vừa bộ nhớ đệm CPU
+scaler_update = True  # Khi dự báo, cập nhật min/max của scaler đã lưu bằng các nến mới sau dữ liệu huấn luyện
+
+def model_file_for(ticker, model_dir=None):
+    """
+    File mô hình của ticker (model_{ticker chữ thường}.pth trong model_dir, mặc định model_path), dùng chung cho mọi
+    nơi ghi (train, train_farm) và đọc (predict, forecast, export_model, inference_service, biểu đồ).
+    Bundle, checkpoint TorchScript/int8 được đặt cạnh file này (features.bundle_path_for, export_model.export_path_for).
+    """
+    return f"{model_dir or model_path}/model_{ticker.lower()}.pth"
\ No newline at end of file
@@ -1,23 +1,26 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 def create_sequences(data, seq_length):
     """
     Tạo các chuỗi dữ liệu từ dữ liệu đầu vào.
+    X và y là view (chỉ đọc) trên mảng gốc dựng bằng sliding_window_view, nên không sao chép
+    từng cửa sổ; gọi np.ascontiguousarray nếu cần một bản sao liền mạch.
     Args:
         data (np.ndarray): Dữ liệu đầu vào.
         seq_length (int): Chiều dài của chuỗi.
     Returns:
         np.ndarray, np.ndarray: Mảng các chuỗi dữ liệu và nhãn tương ứng.
     """
-    xs, ys = [], []
+    data = np.asarray(data)
+    if len(data) <= seq_length:
+        return np.empty((0, seq_length) + data.shape[1:], dtype=data.dtype), np.empty((0,) + data.shape[1:], dtype=data.dtype)
 
-    for i in range(len(data) - seq_length):
-        x = data[i:i+seq_length]
-        y = data[i+seq_length]
-        xs.append(x)
-        ys.append(y)
-
-    return np.array(xs), np.array(ys)
+    windows = sliding_window_view(data, seq_length, axis=0)[:-1]
+    if data.ndim > 1:
+        # sliding_window_view đặt trục cửa sổ ở cuối: (N, features, seq) -> (N, seq, features)
+        windows = np.moveaxis(windows, -1, 1)
+    return windows, data[seq_length:]
 
 # Example usage:
 if __name__ == "__main__":
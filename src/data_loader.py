@@ -1,7 +1,17 @@
+import os
+import time
+import warnings
 import pandas as pd
-import requests
-from io import StringIO
-from src.config import data_source
+from src.config import data_source, cache_path, cache_max_age_hours
+from src.config import download_concurrency, download_timeout, download_retries, download_backoff
+from src.intraday import index_by_date, to_compact
+from src.price_store import columnar_path_for, is_columnar_current, load_columnar
+
+# Bộ đếm truy cập cache: hits (dùng lại), refreshes (chỉ tải phần mới), misses (tải toàn bộ),
+# stale (làm mới thất bại, dùng cache cũ)
+cache_stats = {"hits": 0, "refreshes": 0, "misses": 0, "stale": 0}
+
+_session = None
 
 def format_ticker(ticker, data_source="https://stooq.com"):
     """Định dạng mã chứng khoán theo chuẩn của data_source."""
@@ -18,35 +28,157 @@ def format_ticker(ticker, data_source="https://stooq.com"):
     else:
         return ticker.lower()  # Mặc định trả về mã chứng khoán ở dạng chữ thường
 
-def load_realtime_data(ticker, data_source="https://stooq.com", interval='d'):
-    """Tải dữ liệu từ data_source (Stooq) theo thời gian thực."""
-    ticker = format_ticker(ticker)
+def last_trading_day(ticker, now=None):
+    """Ngày giao dịch gần nhất đã có nến đóng cửa (crypto giao dịch mọi ngày, cổ phiếu chỉ ngày làm việc)."""
+    today = pd.Timestamp(now if now is not None else pd.Timestamp.now()).normalize()
+    if ticker.lower().endswith("-usd"):
+        return today - pd.Timedelta(days=1)
+    return today - pd.offsets.BDay(1)
+
+def is_cache_fresh(file_path, last_date, ticker, now=None):
+    """Cache còn hiệu lực nếu chưa quá cache_max_age_hours hoặc đã có đủ dữ liệu tới ngày giao dịch gần nhất."""
+    now = now if now is not None else time.time()
+    age_hours = (now - os.path.getmtime(file_path)) / 3600
+    if age_hours < cache_max_age_hours:
+        return True
+    return pd.Timestamp(last_date) >= last_trading_day(ticker, pd.Timestamp.fromtimestamp(now))
+
+def retryable_errors():
+    """Lỗi tạm thời (mạng, timeout, 429/5xx, luồng dữ liệu bị ngắt giữa chừng) sẽ được thử lại."""
+    import requests
+    import urllib3
+    return (requests.ConnectionError, requests.Timeout, requests.HTTPError,
+            requests.exceptions.ChunkedEncodingError, urllib3.exceptions.HTTPError)
+
+def get_session():
+    """Session HTTP dùng chung với connection pool đủ cho download_concurrency kết nối song song."""
+    global _session
+    if _session is None:
+        # requests chỉ được nạp khi thực sự tải dữ liệu, các lệnh chỉ đọc file cục bộ không tốn thời gian import
+        import requests
+        from requests.adapters import HTTPAdapter
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=download_concurrency, pool_maxsize=download_concurrency)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+def with_retries(func, retries=download_retries, backoff=download_backoff):
+    """Gọi func, thử lại tối đa retries lần với thời gian chờ tăng gấp đôi khi gặp lỗi tạm thời."""
+    errors = retryable_errors()
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except errors:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def fetch_stooq(ticker, data_source="https://stooq.com", interval='d', start=None):
+    """
+    Tải dữ liệu CSV từ Stooq qua session dùng chung, có timeout và thử lại.
+    CSV được parse trực tiếp từ luồng phản hồi thay vì chờ tải xong toàn bộ nội dung.
+    Args:
+        ticker (str): Mã chứng khoán đã định dạng.
+        data_source (str): Địa chỉ gốc của Stooq.
+        interval (str): Khung thời gian ('d', 'w', 'm').
+        start (pd.Timestamp): Nếu có, chỉ tải các dòng từ ngày này trở đi.
+    Returns:
+        pd.DataFrame hoặc None: Dữ liệu tải về, None nếu Stooq không trả về dòng nào.
+    """
     url = f"{data_source}/q/d/l/?s={ticker}&i={interval}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception("Lỗi tải dữ liệu từ Stooq")
+    if start is not None:
+        url += f"&d1={start:%Y%m%d}&d2={pd.Timestamp.now():%Y%m%d}"
+
+    def fetch():
+        import requests
+        with get_session().get(url, timeout=download_timeout, stream=True) as response:
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"Stooq trả về mã lỗi {response.status_code}", response=response)
+            if response.status_code != 200:
+                raise Exception("Lỗi tải dữ liệu từ Stooq")
+            response.raw.decode_content = True
+            try:
+                data = pd.read_csv(response.raw)
+            except pd.errors.EmptyDataError:
+                return None
+        return data if "Date" in data.columns else None  # Stooq trả về "No data" khi không có dòng nào
+
+    return with_retries(fetch)
+
+def load_realtime_data(ticker, data_source="https://stooq.com", interval='d', use_cache=True):
+    """
+    Tải dữ liệu từ data_source (Stooq) theo thời gian thực.
+    Khi use_cache=True, lịch sử giá được lưu tại cache_path; lần gọi sau chỉ tải thêm các dòng mới hơn
+    ngày cuối cùng trong cache, hoặc dùng lại cache nếu cache còn hiệu lực. Với dữ liệu trong ngày (có cột 'Time'),
+    phần tải thêm bắt đầu từ chính ngày cuối cùng để không mất các nến sau đó trong ngày, và nến trùng (Date, Time)
+    lấy bản mới tải. Nếu việc làm mới vẫn gặp lỗi tạm thời sau khi đã thử lại, trả về cache cũ kèm cảnh báo.
+    """
+    ticker = format_ticker(ticker)
+    cache_file = f"{cache_path}/{ticker}_{interval}.csv"
+
+    if use_cache and os.path.exists(cache_file):
+        data = pd.read_csv(cache_file)
+        last_date = data["Date"].iloc[-1]
+        if is_cache_fresh(cache_file, last_date, ticker):
+            cache_stats["hits"] += 1
+            return data
+
+        cache_stats["refreshes"] += 1
+        intraday = "Time" in data.columns
+        try:
+            new_rows = fetch_stooq(ticker, data_source, interval,
+                                   start=pd.Timestamp(last_date) + pd.Timedelta(days=0 if intraday else 1))
+        except retryable_errors() as e:
+            cache_stats["stale"] += 1
+            warnings.warn(f"Không làm mới được dữ liệu {ticker} ({e}), dùng cache cũ đến {last_date}.", stacklevel=2)
+            return data
+        if new_rows is not None and intraday:
+            data = pd.concat([data, new_rows.astype({"Date": str, "Time": str})], ignore_index=True)
+            data.drop_duplicates(subset=["Date", "Time"], keep="last", inplace=True, ignore_index=True)
+        elif new_rows is not None:
+            new_rows = new_rows[new_rows["Date"] > last_date]
+            data = pd.concat([data, new_rows], ignore_index=True)
+    else:
+        data = fetch_stooq(ticker, data_source, interval)
+        if data is None:
+            raise Exception(f"Stooq không có dữ liệu cho ticker {ticker}")
+        if use_cache:
+            cache_stats["misses"] += 1
 
-    data = pd.read_csv(StringIO(response.text))
     data.rename(columns={"Date": "Date", "Close": "Close", "Open": "Open", "High": "High", "Low": "Low", "Volume": "Volume"}, inplace=True)
-    data.sort_values(by="Date", inplace=True)
+    # Dữ liệu trong ngày (interval phút/giờ) của Stooq có thêm cột 'Time'
+    data.sort_values(by=[c for c in ("Date", "Time") if c in data.columns], inplace=True)
+    if use_cache:
+        os.makedirs(cache_path, exist_ok=True)
+        data.to_csv(cache_file, index=False)
     return data
 
-def load_data(ticker, data_source):
-    """ Tải dữ liệu chứng khoán từ nguồn dữ liệu đã chỉ định."""
-    ticker = format_ticker(ticker, data_source)
+def load_data(ticker, data_source, use_cache=True, compact=False, interval='d'):
+    """
+    Tải dữ liệu chứng khoán từ nguồn dữ liệu đã chỉ định.
+    interval là khung thời gian của Stooq ('d', 'w', 'm' hoặc khung trong ngày); file cục bộ đã có sẵn khung của nó.
+    CSV cục bộ có cột 'Time' (nến trong ngày) được ghép Date và Time thành DatetimeIndex.
+    Với compact=True trả về khung dạng gọn của intraday.to_compact (giá float32, 'Timestamp' epoch int64,
+    'Ticker' categorical), phù hợp với lịch sử nến phút hàng triệu dòng.
+    """
+    name, ticker = ticker.upper(), format_ticker(ticker, data_source)
     if data_source == "https://stooq.com":
-        return load_realtime_data(ticker, data_source)
+        data = load_realtime_data(ticker, data_source, interval=interval, use_cache=use_cache)
     elif data_source == "local":
         file_path = f"data/{ticker}.csv"
-        try:
-            data = pd.read_csv(file_path)
-            data['Date'] = pd.to_datetime(data['Date'])
-            data.set_index('Date', inplace=True)
-            return data
-        except FileNotFoundError:
-            raise Exception(f"Không tìm thấy dữ liệu cục bộ cho ticker {ticker}")
+        # Ưu tiên bản lưu dạng cột (memory-mapped) nếu có và không cũ hơn CSV
+        columnar_path = columnar_path_for(file_path)
+        if is_columnar_current(columnar_path, file_path):
+            data = load_columnar(columnar_path)
+        else:
+            try:
+                data = index_by_date(pd.read_csv(file_path))
+            except FileNotFoundError:
+                raise Exception(f"Không tìm thấy dữ liệu cục bộ cho ticker {ticker}")
     else:
         raise ValueError("Nguồn dữ liệu không hợp lệ. Chỉ hỗ trợ 'https://stooq.com' hoặc 'local'.")
+    return to_compact(data, name) if compact else data
 
 if __name__ == "__main__":
     # Ví dụ sử dụng
@@ -0,0 +1,81 @@
+import os
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.config import download_concurrency
+from src.data_loader import fetch_stooq, format_ticker
+from src.price_store import columnar_path_for, convert_csv
+
+def download_to_store(ticker, data_source="https://stooq.com", interval='d', data_dir="data"):
+    """
+    Tải toàn bộ lịch sử một ticker từ Stooq và ghi vào kho dữ liệu cục bộ mà load_data(..., 'local') đọc.
+    Nếu ticker đã có bản lưu dạng cột, bản đó cũng được ghi lại để không bị cũ hơn CSV.
+    Args:
+        ticker (str): Mã chứng khoán.
+        data_source (str): Địa chỉ gốc của Stooq.
+        interval (str): Khung thời gian ('d', 'w', 'm').
+        data_dir (str): Thư mục dữ liệu cục bộ.
+    Returns:
+        dict: Ticker, số dòng, đường dẫn file và thời gian tải (giây).
+    """
+    start = time.perf_counter()
+    data = fetch_stooq(format_ticker(ticker), data_source, interval)
+    if data is None:
+        raise Exception(f"Stooq không có dữ liệu cho ticker {ticker}")
+    # Nến trong ngày (interval khác 'd', 'w', 'm') có thêm cột 'Time', sắp xếp theo (Date, Time) như load_realtime_data
+    data.sort_values(by=[c for c in ("Date", "Time") if c in data.columns], inplace=True)
+
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = f"{data_dir}/{format_ticker(ticker, 'local')}.csv"
+    # Ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải file ghi dở
+    tmp_path = f"{file_path}.tmp"
+    data.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+    if os.path.exists(columnar_path_for(file_path)):
+        convert_csv(file_path)
+
+    return {"ticker": ticker, "rows": len(data), "path": file_path, "seconds": time.perf_counter() - start}
+
+def download_tickers(tickers, data_source="https://stooq.com", interval='d', data_dir="data",
+                     concurrency=download_concurrency):
+    """
+    Tải song song nhiều ticker, tối đa concurrency yêu cầu cùng lúc qua session dùng chung.
+    Lỗi của một ticker không làm dừng các ticker khác.
+    Args:
+        tickers (list[str]): Danh sách mã chứng khoán.
+        data_source (str): Địa chỉ gốc của Stooq.
+        interval (str): Khung thời gian ('d', 'w', 'm').
+        data_dir (str): Thư mục dữ liệu cục bộ.
+        concurrency (int): Số yêu cầu tải đồng thời tối đa.
+    Returns:
+        pd.DataFrame: Kết quả từng ticker với các cột 'ticker', 'rows', 'path', 'seconds', 'error'.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(download_to_store, ticker, data_source, interval, data_dir): ticker
+                   for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                results.append({**future.result(), "error": None})
+            except Exception as e:
+                results.append({"ticker": futures[future], "rows": 0, "path": None, "seconds": None, "error": str(e)})
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    return pd.DataFrame(results, columns=["ticker", "rows", "path", "seconds", "error"]) \
+        .sort_values(by="ticker", key=lambda col: col.map(order)).reset_index(drop=True)
+
+if __name__ == "__main__":
+    import argparse
+    import src.config as config
+
+    parser = argparse.ArgumentParser(description="Bulk Stooq Downloader")
+    parser.add_argument('--tickers', type=str, nargs='+', default=config.suggested_tickers, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--interval', type=str, default='d', help="Khung thời gian: 'd', 'w' hoặc 'm'")
+    parser.add_argument('--data_dir', type=str, default="data", help='Thư mục dữ liệu cục bộ')
+    parser.add_argument('--concurrency', type=int, default=config.download_concurrency, help='Số yêu cầu tải đồng thời')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = download_tickers(args.tickers, interval=args.interval, data_dir=args.data_dir,
+                               concurrency=args.concurrency)
+    print(summary.to_string(index=False))
+    print(f"Đã tải {int((summary['error'].isna()).sum())}/{len(summary)} ticker trong {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,171 @@
+import os
+import time
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+from src.config import model_path, inference_mode, scaler_update, model_file_for
+from src.model import RNN_LSTMModel
+
+EXPORT_MODES = ("script", "int8")
+
+def export_path_for(model_file, mode):
+    """Đường dẫn artifact suy luận nằm cạnh file .pth, ví dụ model_aapl.pth -> model_aapl.int8.pt."""
+    return f"{os.path.splitext(model_file)[0]}.{mode}.pt"
+
+def _ignore_deprecation_warnings():
+    """Chỉ bỏ qua đúng các cảnh báo deprecated đã biết của torch.jit và lượng tử hoá; gọi bên trong warnings.catch_warnings()."""
+    warnings.filterwarnings("ignore", message=r"`torch\.jit\.(script|save|load)` is deprecated", category=FutureWarning)
+    warnings.filterwarnings("ignore", message=r"torch\.ao\.quantization is deprecated", category=DeprecationWarning)
+    warnings.filterwarnings("ignore", message=r"torch\.quantize_per_tensor, torch\.quantize_per_channel .* are deprecated", category=UserWarning)
+
+def load_eager_model(model_file):
+    """Nạp RNN_LSTMModel float32 từ file trọng số .pth ở chế độ eval; số đặc trưng đầu vào lấy theo trọng số đã lưu."""
+    state = torch.load(model_file)
+    model = RNN_LSTMModel(input_size=state["rnn.weight_ih_l0"].shape[1])
+    model.load_state_dict(state)
+    model.eval()
+    return model
+
+def export_model(model_file, mode="int8"):
+    """
+    Xuất mô hình thành artifact TorchScript để suy luận nhanh, lưu cạnh file .pth.
+    Args:
+        model_file (str): Đường dẫn file trọng số .pth.
+        mode (str): 'script' (TorchScript float32) hoặc 'int8' (lượng tử hoá động int8 cho LSTM và Linear, rồi TorchScript).
+    Returns:
+        str: Đường dẫn artifact đã lưu.
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"Chế độ xuất không hợp lệ: {mode}. Chỉ hỗ trợ {', '.join(EXPORT_MODES)}.")
+    model = load_eager_model(model_file)
+    export_file = export_path_for(model_file, mode)
+    tmp_file = f"{export_file}.tmp"
+    # PyTorch đánh dấu torch.ao.quantization và TorchScript là deprecated, nhưng đây vẫn là cách duy nhất
+    # lưu được mô hình lượng tử hoá động thành một file chạy độc lập
+    with warnings.catch_warnings():
+        _ignore_deprecation_warnings()
+        if mode == "int8":
+            model = quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        torch.jit.save(torch.jit.script(model), tmp_file)
+    os.replace(tmp_file, export_file)
+    return export_file
+
+def resolve_model_file(model_file, mode=inference_mode):
+    """
+    File thực sự dùng để suy luận: artifact của chế độ mode nếu có và không cũ hơn file .pth, ngược lại là chính file .pth.
+    Args:
+        model_file (str): Đường dẫn file trọng số .pth.
+        mode (str): 'eager', 'script' hoặc 'int8'.
+    Returns:
+        str: Đường dẫn artifact hoặc file .pth.
+    """
+    if mode == "eager":
+        return model_file
+    export_file = export_path_for(model_file, mode)
+    if os.path.exists(export_file) and os.path.getmtime(export_file) >= os.path.getmtime(model_file):
+        return export_file
+    return model_file
+
+def load_inference_model(model_file, mode=inference_mode):
+    """
+    Nạp mô hình để suy luận, ưu tiên artifact đã xuất (xem resolve_model_file).
+    Returns:
+        torch.nn.Module: Mô hình ở chế độ eval (eager hoặc TorchScript), cùng giao diện model(X).
+    """
+    resolved = resolve_model_file(model_file, mode)
+    if resolved == model_file:
+        return load_eager_model(model_file)
+    with warnings.catch_warnings():
+        _ignore_deprecation_warnings()
+        model = torch.jit.load(resolved)
+    model.eval()
+    return model
+
+def benchmark_model(model_file, data, seq_length, repeats=50):
+    """
+    So sánh mô hình eager với các artifact đã xuất trên cùng dữ liệu.
+    Args:
+        model_file (str): Đường dẫn file trọng số .pth.
+        data (pd.DataFrame): Dữ liệu giá với cột 'Close'.
+        seq_length (int): Chiều dài chuỗi.
+        repeats (int): Số lần đo độ trễ một cửa sổ.
+    Returns:
+        list[dict]: Mỗi chế độ một dòng: độ trễ p50/p99 (ms) cho một cửa sổ, thông lượng (cửa sổ/giây) trên toàn lịch sử,
+            sai lệch tuyệt đối lớn nhất/trung bình của giá dự báo so với eager.
+    """
+    from src.create_sequences import create_sequences
+    from src.features import build_features, feature_timestamps, load_model_features, load_model_scaler, target_index
+    from src.scaling_data import scale_data, inverse_transform_column
+
+    columns = load_model_features(model_file)
+    features = build_features(data, columns)
+    scaled, scaler = scale_data(features, load_model_scaler(model_file), update=scaler_update,
+                                timestamps=feature_timestamps(data, features))
+    X = torch.tensor(create_sequences(scaled, seq_length)[0], dtype=torch.float32)
+    window = X[-1:]
+
+    models = {"eager": load_eager_model(model_file)}
+    for mode in EXPORT_MODES:
+        if resolve_model_file(model_file, mode) != model_file:
+            models[mode] = load_inference_model(model_file, mode)
+
+    rows, reference = [], None
+    with torch.inference_mode():
+        for mode, model in models.items():
+            model(window)  # Khởi động (TorchScript tối ưu đồ thị ở vài lần gọi đầu)
+            latencies = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                model(window)
+                latencies.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            predicted = inverse_transform_column(scaler, model(X).numpy()[:, 0], target_index(columns))
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = predicted
+            drift = np.abs(predicted - reference)
+            rows.append({
+                "mode": mode,
+                "latency_p50_ms": float(np.percentile(latencies, 50)),
+                "latency_p99_ms": float(np.percentile(latencies, 99)),
+                "windows_per_sec": len(X) / elapsed,
+                "max_abs_drift": float(drift.max()),
+                "mean_abs_drift": float(drift.mean()),
+                "file_kb": os.path.getsize(resolve_model_file(model_file, mode)) / 1024,
+            })
+    return rows
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import pandas as pd
+    from src.data_loader import load_data
+    from src.features import load_model_sequence_length
+
+    parser = argparse.ArgumentParser(description="Export Optimized Inference Models")
+    parser.add_argument('--tickers', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu (mặc định: mọi mô hình trong thư mục model)')
+    parser.add_argument('--mode', type=str, choices=['script', 'int8', 'all'], default='all', help='Loại artifact cần xuất')
+    parser.add_argument('--benchmark', action='store_true', help='So sánh độ trễ, thông lượng và sai lệch với mô hình eager')
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu (dùng cho benchmark)')
+    args = parser.parse_args()
+
+    if args.tickers:
+        model_files = {ticker: model_file_for(ticker, model_path) for ticker in args.tickers}
+    else:
+        model_files = {os.path.basename(path)[len("model_"):-len(".pth")]: path
+                       for path in sorted(glob.glob(f"{model_path}/model_*.pth"))}
+
+    modes = EXPORT_MODES if args.mode == 'all' else (args.mode,)
+    results = []
+    for ticker, model_file in model_files.items():
+        for mode in modes:
+            print(f"Đã xuất {export_model(model_file, mode)}")
+        if args.benchmark:
+            data = load_data(ticker, 'https://stooq.com' if args.data_source == 'Y' else 'local')
+            results += [{"ticker": ticker, **row} for row in benchmark_model(model_file, data, load_model_sequence_length(model_file))]
+
+    if results:
+        print(pd.DataFrame(results).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
\ No newline at end of file
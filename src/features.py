@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+from src.config import feature_columns, volatility_window, sma_spread_windows, sequence_length
+from src.strategy import rolling_means
+from src.intraday import epoch_seconds
+from src.scaling_data import MinMaxState
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+DERIVED_COLUMNS = ["Return", "Volatility", "SMA_Spread"]
+TARGET_COLUMN = "Close"
+BUNDLE_VERSION = 1  # Phiên bản định dạng bundle mô hình, tăng khi đổi cấu trúc
+
+def target_index(columns=feature_columns):
+    """Vị trí cột 'Close' (mục tiêu dự báo) trong danh sách đặc trưng."""
+    if TARGET_COLUMN not in columns:
+        raise ValueError(f"Danh sách đặc trưng phải có cột '{TARGET_COLUMN}' để làm mục tiêu dự báo.")
+    return list(columns).index(TARGET_COLUMN)
+
+def build_features(data, columns=feature_columns, volatility_window=volatility_window, sma_windows=sma_spread_windows,
+                   dtype=np.float64):
+    """
+    Tạo ma trận đặc trưng từ dữ liệu OHLCV trong một lượt tính trên mảng NumPy.
+    Các đặc trưng dẫn xuất:
+        - 'Return': tỷ suất sinh lời so với phiên trước.
+        - 'Volatility': độ lệch chuẩn (ddof=1) của 'Return' trong volatility_window phiên.
+        - 'SMA_Spread': (SMA ngắn - SMA dài) / giá đóng cửa, cùng cách tính SMA với strategy.py.
+    Các phiên đầu chưa đủ dữ liệu cho đặc trưng dẫn xuất bị bỏ đi, nên ma trận luôn thẳng hàng với
+    các phiên cuối của data (dòng cuối của ma trận là phiên cuối của data).
+    Args:
+        data (pd.DataFrame): Dữ liệu giá với các cột OHLCV cần dùng.
+        columns (list[str]): Danh sách đặc trưng theo thứ tự cột của ma trận.
+        volatility_window (int): Số phiên tính độ biến động.
+        sma_windows (tuple): Kỳ hạn (ngắn, dài) của SMA cho 'SMA_Spread'.
+        dtype: Kiểu của ma trận; np.float32 giảm một nửa bộ nhớ với lịch sử nến phút (phép tính vẫn ở float64).
+    Returns:
+        np.ndarray: Ma trận kích thước (số phiên hợp lệ, len(columns)).
+    """
+    unknown = [c for c in columns if c not in PRICE_COLUMNS + DERIVED_COLUMNS]
+    if unknown:
+        raise ValueError(f"Đặc trưng không hợp lệ: {', '.join(unknown)}. Chỉ hỗ trợ {', '.join(PRICE_COLUMNS + DERIVED_COLUMNS)}.")
+
+    close = data['Close'].to_numpy(dtype=np.float64)
+    n = len(close)
+    derived = {}
+    if "Return" in columns or "Volatility" in columns:
+        returns = np.full(n, np.nan)
+        returns[1:] = close[1:] / close[:-1] - 1
+        derived["Return"] = returns
+    if "Volatility" in columns:
+        # Phương sai trượt từ tổng tích luỹ của r và r^2 (bỏ phiên đầu chưa có lợi nhuận)
+        w = volatility_window
+        volatility = np.full(n, np.nan)
+        if n > w:
+            r = returns[1:]
+            s1 = np.concatenate(([0.0], np.cumsum(r)))
+            s2 = np.concatenate(([0.0], np.cumsum(r * r)))
+            window_sum, window_sq = s1[w:] - s1[:-w], s2[w:] - s2[:-w]
+            variance = np.maximum((window_sq - window_sum * window_sum / w) / (w - 1), 0.0)
+            volatility[w:] = np.sqrt(variance)
+        derived["Volatility"] = volatility
+    if "SMA_Spread" in columns:
+        sma_short, sma_long = rolling_means(close, sma_windows)
+        derived["SMA_Spread"] = (sma_short - sma_long) / close
+
+    matrix = np.empty((n, len(columns)), dtype=dtype)
+    for k, column in enumerate(columns):
+        matrix[:, k] = derived[column] if column in derived else data[column].to_numpy(dtype=np.float64)
+
+    valid = np.isfinite(matrix).all(axis=1)
+    start = int(valid.argmax()) if valid.any() else n
+    return matrix[start:]
+
+def feature_timestamps(data, features):
+    """Thời điểm (epoch giây) của từng dòng đặc trưng; build_features bỏ các dòng đầu thiếu giá trị nên lấy phần cuối."""
+    return epoch_seconds(data)[len(data) - len(features):]
+
+def features_path_for(model_file):
+    """File đặc trưng cũ (trước bundle), nằm cạnh file .pth (model_aapl.pth -> model_aapl.features.json)."""
+    return f"{os.path.splitext(model_file)[0]}.features.json"
+
+def bundle_path_for(model_file):
+    """File bundle của mô hình, nằm cạnh file .pth (model_aapl.pth -> model_aapl.bundle.json)."""
+    return f"{os.path.splitext(model_file)[0]}.bundle.json"
+
+def save_model_bundle(model_file, columns, scaler=None, **metadata):
+    """
+    Ghi bundle tiền xử lý của mô hình: danh sách đặc trưng, trạng thái scaler đã fit khi huấn luyện
+    và thông tin thêm (ví dụ sequence_length), để lúc dự báo dùng đúng tham số chuẩn hóa của lúc huấn luyện.
+    Args:
+        model_file (str): Đường dẫn file .pth.
+        columns (list[str]): Danh sách đặc trưng đầu vào.
+        scaler (MinMaxState): Bộ chuẩn hóa đã fit trên dữ liệu huấn luyện.
+        **metadata: Các trường ghi thêm vào bundle.
+    """
+    bundle = {"version": BUNDLE_VERSION, "features": list(columns),
+              "scaler": scaler.to_dict() if scaler is not None else None, **metadata}
+    with open(bundle_path_for(model_file), "w") as f:
+        json.dump(bundle, f)
+
+# Bundle đã đọc trong tiến trình, theo (đường dẫn, mtime): mỗi file chỉ được đọc lại khi bị ghi đè
+_loaded_bundles = {}
+
+def load_model_bundle(model_file):
+    """
+    Bundle của mô hình, đọc một lần cho mỗi tiến trình. Mô hình cũ chỉ có file đặc trưng (hoặc không có gì)
+    nhận bundle không có scaler (scaler fit lại trên dữ liệu như trước) với đặc trưng mặc định 'Close'.
+    Returns:
+        dict: 'version', 'features', 'scaler' (MinMaxState hoặc None) và các trường thêm khi lưu.
+    """
+    path = bundle_path_for(model_file)
+    if not os.path.exists(path):
+        legacy = features_path_for(model_file)
+        columns = [TARGET_COLUMN]
+        if os.path.exists(legacy):
+            with open(legacy) as f:
+                columns = json.load(f)["features"]
+        return {"version": 0, "features": columns, "scaler": None}
+
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _loaded_bundles:
+        with open(path) as f:
+            bundle = json.load(f)
+        if bundle["version"] > BUNDLE_VERSION:
+            raise ValueError(f"Bundle {path} có phiên bản {bundle['version']}, mới hơn phiên bản hỗ trợ {BUNDLE_VERSION}.")
+        if bundle["scaler"] is not None:
+            bundle["scaler"] = MinMaxState.from_dict(bundle["scaler"])
+        _loaded_bundles[key] = bundle
+    return _loaded_bundles[key]
+
+def load_model_features(model_file):
+    """Danh sách đặc trưng của mô hình (từ bundle); các mô hình cũ không có file đặc trưng chỉ dùng cột 'Close'."""
+    return load_model_bundle(model_file)["features"]
+
+def load_model_sequence_length(model_file):
+    """Chiều dài chuỗi lúc huấn luyện (từ bundle); mô hình cũ chưa có bundle dùng config.sequence_length."""
+    return load_model_bundle(model_file).get("sequence_length") or sequence_length
+
+def load_model_scaler(model_file):
+    """Scaler đã fit khi huấn luyện (dùng chung trong tiến trình), None với mô hình cũ chưa có bundle."""
+    return load_model_bundle(model_file)["scaler"]
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from src.batch_backtest import resolve_tickers
+    from src.data_loader import load_data
+
+    parser = argparse.ArgumentParser(description="Feature Matrix Builder")
+    parser.add_argument('--tickers', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--pattern', type=str, default="data/*.csv", help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+    parser.add_argument('--features', type=str, nargs='+', default=PRICE_COLUMNS + DERIVED_COLUMNS, help='Danh sách đặc trưng')
+    args = parser.parse_args()
+
+    total_rows, elapsed = 0, 0.0
+    for ticker in resolve_tickers(args.tickers, args.pattern):
+        data = load_data(ticker, 'local')
+        start = time.perf_counter()
+        matrix = build_features(data, args.features)
+        elapsed += time.perf_counter() - start
+        total_rows += len(matrix)
+        print(f"{ticker}: {matrix.shape[0]} phiên x {matrix.shape[1]} đặc trưng")
+    print(f"Tổng {total_rows} phiên trong {elapsed * 1000:.1f} ms ({total_rows / max(elapsed, 1e-9):,.0f} phiên/giây)")
\ No newline at end of file
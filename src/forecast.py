@@ -0,0 +1,224 @@
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+import torch
+from src.config import model_path, volatility_window, sma_spread_windows, forecast_horizon, forecast_paths, scaler_update
+from src.config import model_file_for
+from src.data_loader import load_data
+from src.export_model import load_eager_model
+from src.features import build_features, feature_timestamps, load_model_features, load_model_scaler
+from src.features import load_model_sequence_length, target_index
+from src.scaling_data import scale_data
+
+# Đặc trưng tính lại được chỉ từ chuỗi giá đóng cửa dự báo
+RECURSIVE_COLUMNS = ["Close", "Return", "Volatility", "SMA_Spread"]
+
+def next_feature_rows(closes, columns):
+    """
+    Dòng đặc trưng (chưa chuẩn hóa) của phiên cuối cùng cho một batch chuỗi giá, cùng công thức với build_features.
+    Args:
+        closes (np.ndarray): Giá đóng cửa gần nhất, kích thước (batch, số phiên lịch sử).
+        columns (list[str]): Danh sách đặc trưng.
+    Returns:
+        np.ndarray: Ma trận (batch, len(columns)).
+    """
+    rows = np.empty((len(closes), len(columns)))
+    for k, column in enumerate(columns):
+        if column == "Close":
+            rows[:, k] = closes[:, -1]
+        elif column == "Return":
+            rows[:, k] = closes[:, -1] / closes[:, -2] - 1
+        elif column == "Volatility":
+            window = closes[:, -volatility_window - 1:]
+            rows[:, k] = np.std(window[:, 1:] / window[:, :-1] - 1, axis=1, ddof=1)
+        elif column == "SMA_Spread":
+            short_window, long_window = sma_spread_windows
+            rows[:, k] = (closes[:, -short_window:].mean(axis=1) - closes[:, -long_window:].mean(axis=1)) / closes[:, -1]
+    return rows
+
+def rollout(model, windows, closes, scale, offset, columns, horizon, noise=None):
+    """
+    Dự báo đệ quy nhiều bước cho một batch chuỗi dùng chung mô hình.
+    Bước đầu chạy qua toàn bộ cửa sổ một lần; các bước sau chỉ đưa vào một phiên mới và dùng tiếp trạng thái ẩn
+    của RNN/LSTM, nên mỗi bước thêm chỉ tốn một timestep thay vì cả cửa sổ sequence_length.
+    Đây là một xấp xỉ: bước 1 trùng với rollout_sliding, nhưng từ bước 2 trạng thái ẩn mang theo cả các phiên
+    đã trượt ra khỏi cửa sổ, tức là mô hình nhìn lịch sử dài hơn sequence_length phiên mà nó được huấn luyện,
+    nên giá dự báo lệch dần so với chạy lại cửa sổ trượt (xem --benchmark để đo mức chênh lệch).
+    Args:
+        model (RNN_LSTMModel): Mô hình eager có phương thức step.
+        windows (np.ndarray): Cửa sổ đầu vào đã chuẩn hóa, (batch, sequence_length, len(columns)).
+        closes (np.ndarray): Giá đóng cửa gần nhất (chưa chuẩn hóa) để tính lại đặc trưng, (batch, số phiên).
+        scale (np.ndarray): Hệ số chuẩn hóa từng cột của từng dòng, (batch, len(columns)) (MinMaxScaler.scale_).
+        offset (np.ndarray): Độ dời chuẩn hóa, (batch, len(columns)) (MinMaxScaler.min_).
+        columns (list[str]): Danh sách đặc trưng.
+        horizon (int): Số bước dự báo.
+        noise (np.ndarray): Nhiễu tỷ suất sinh lời cộng vào mỗi bước cho mô phỏng Monte Carlo, (batch, horizon); None để dự báo tất định.
+    Returns:
+        np.ndarray: Giá dự báo (batch, horizon).
+        dict: Thời gian chạy cửa sổ đầu ('window_ms') và trung bình mỗi bước tiếp theo ('step_ms').
+    """
+    target = target_index(columns)
+    forecasts = np.empty((len(windows), horizon))
+    step_times = []
+    with torch.inference_mode():
+        start = time.perf_counter()
+        output, state = model.step(torch.tensor(windows, dtype=torch.float32))
+        window_ms = (time.perf_counter() - start) * 1000
+        for h in range(horizon):
+            price = (output.numpy()[:, 0] - offset[:, target]) / scale[:, target]
+            if noise is not None:
+                price = price * (1 + noise[:, h])
+            forecasts[:, h] = price
+            if h == horizon - 1:
+                break
+            start = time.perf_counter()
+            closes = np.concatenate((closes[:, 1:], price[:, None]), axis=1)
+            row = next_feature_rows(closes, columns) * scale + offset
+            output, state = model.step(torch.tensor(row[:, None, :], dtype=torch.float32), state)
+            step_times.append((time.perf_counter() - start) * 1000)
+    return forecasts, {"window_ms": window_ms, "step_ms": float(np.mean(step_times)) if step_times else 0.0}
+
+def forecast_tickers(tickers, horizon=forecast_horizon, paths=forecast_paths, data_source="local",
+                     model_dir=model_path, seq_length=None, seed=None):
+    """
+    Dự báo giá đóng cửa cho horizon phiên tới của nhiều ticker bằng rollout (giữ trạng thái ẩn, xấp xỉ
+    cửa sổ trượt từ bước 2). Các ticker dùng chung một file mô hình và mọi đường mô phỏng của chúng được gộp thành một batch.
+    Với paths > 1, mỗi đường được cộng nhiễu tỷ suất sinh lời chuẩn với độ lệch chuẩn bằng độ biến động
+    lịch sử của ticker (volatility_window phiên gần nhất).
+    Args:
+        tickers (list[str]): Danh sách mã chứng khoán.
+        horizon (int): Số phiên dự báo.
+        paths (int): Số đường mô phỏng Monte Carlo mỗi ticker (1 để dự báo tất định).
+        data_source (str): 'https://stooq.com' hoặc 'local'.
+        model_dir (str): Thư mục chứa các file mô hình (config.model_file_for).
+        seq_length (int): Chiều dài chuỗi, mặc định lấy từ bundle của từng mô hình (config.sequence_length với mô hình cũ).
+        seed (int): Hạt giống ngẫu nhiên cho mô phỏng.
+    Returns:
+        dict: 'forecasts' theo ticker (giá dự báo trung bình, phân vị 5/50/95 nếu có mô phỏng, hoặc 'error')
+            và 'timing' (thời gian chuẩn bị, chạy cửa sổ, trung bình mỗi bước, tổng, số chuỗi trong batch).
+    """
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    results, groups = dict.fromkeys(tickers), OrderedDict()
+    for ticker in tickers:
+        model_file = model_file_for(ticker, model_dir)
+        try:
+            if not os.path.exists(model_file):
+                raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_file}. Vui lòng train trước.")
+            columns = load_model_features(model_file)
+            unsupported = [c for c in columns if c not in RECURSIVE_COLUMNS]
+            if unsupported:
+                raise ValueError(f"Không thể dự báo đệ quy với đặc trưng {', '.join(unsupported)} (không suy ra được từ giá đóng cửa).")
+            data = load_data(ticker, data_source)
+            features = build_features(data, columns)
+            scaled, scaler = scale_data(features, load_model_scaler(model_file), update=scaler_update,
+                                        timestamps=feature_timestamps(data, features))
+            window_length = seq_length or load_model_sequence_length(model_file)
+            if len(scaled) < window_length:
+                raise ValueError(f"Dữ liệu của {ticker} ngắn hơn sequence_length={window_length}")
+        except Exception as e:
+            results[ticker] = {"error": str(e)}
+            continue
+        close = data['Close'].to_numpy(dtype=np.float64)
+        history = max(sma_spread_windows[1], volatility_window + 1, 2)
+        returns = close[-volatility_window - 1:][1:] / close[-volatility_window - 1:][:-1] - 1
+        groups.setdefault(model_file, (columns, []))[1].append({
+            "ticker": ticker, "window": scaled[-window_length:], "closes": close[-history:],
+            "scale": scaler.scale_, "offset": scaler.min_, "volatility": np.std(returns, ddof=1),
+        })
+    prepare_ms = (time.perf_counter() - start) * 1000
+
+    timing = {"prepare_ms": prepare_ms, "window_ms": 0.0, "step_ms": 0.0, "batch": 0}
+    for model_file, (columns, items) in groups.items():
+        model = load_eager_model(model_file)
+
+        def repeat(key):
+            # Mỗi ticker lặp lại paths lần liên tiếp trong batch
+            return np.repeat(np.stack([item[key] for item in items]), paths, axis=0)
+
+        noise = None
+        if paths > 1:
+            noise = rng.standard_normal((len(items) * paths, horizon)) * repeat("volatility")[:, None]
+        forecasts, stats = rollout(model, repeat("window"), repeat("closes"), repeat("scale"), repeat("offset"),
+                                   columns, horizon, noise)
+        timing["window_ms"] += stats["window_ms"]
+        timing["step_ms"] += stats["step_ms"]
+        timing["batch"] += len(forecasts)
+        for item, ticker_paths in zip(items, forecasts.reshape(len(items), paths, horizon)):
+            result = {"latest_price": float(item["closes"][-1]), "forecast": ticker_paths.mean(axis=0).tolist()}
+            if paths > 1:
+                for q in (5, 50, 95):
+                    result[f"p{q}"] = np.percentile(ticker_paths, q, axis=0).tolist()
+            results[item["ticker"]] = result
+    timing["total_ms"] = (time.perf_counter() - start) * 1000
+    return {"forecasts": results, "timing": timing}
+
+def rollout_sliding(model, windows, closes, scale, offset, columns, horizon):
+    """Dự báo đệ quy bằng cách chạy lại toàn bộ cửa sổ trượt ở mỗi bước; dùng làm mốc so sánh với rollout."""
+    target = target_index(columns)
+    forecasts = np.empty((len(windows), horizon))
+    windows = np.array(windows, dtype=np.float64)
+    with torch.inference_mode():
+        for h in range(horizon):
+            output = model(torch.tensor(windows, dtype=torch.float32)).numpy()[:, 0]
+            forecasts[:, h] = price = (output - offset[:, target]) / scale[:, target]
+            closes = np.concatenate((closes[:, 1:], price[:, None]), axis=1)
+            row = next_feature_rows(closes, columns) * scale + offset
+            windows = np.concatenate((windows[:, 1:], row[:, None, :]), axis=1)
+    return forecasts
+
+if __name__ == "__main__":
+    import argparse
+    import src.config as config
+
+    parser = argparse.ArgumentParser(description="Multi-step Stock Price Forecast")
+    parser.add_argument('--tickers', type=str, nargs='+', default=[config.ticker], help='Danh sách mã cổ phiếu')
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--horizon', type=int, default=config.forecast_horizon, help='Số phiên dự báo')
+    parser.add_argument('--paths', type=int, default=config.forecast_paths, help='Số đường mô phỏng Monte Carlo mỗi ticker')
+    parser.add_argument('--seed', type=int, default=None, help='Hạt giống ngẫu nhiên cho mô phỏng')
+    parser.add_argument('--benchmark', action='store_true', help='So sánh với cách chạy lại cửa sổ trượt ở mỗi bước')
+    args = parser.parse_args()
+
+    data_source = 'https://stooq.com' if args.data_source == 'Y' else 'local'
+    result = forecast_tickers(args.tickers, args.horizon, args.paths, data_source, seed=args.seed)
+    for ticker, forecast in result["forecasts"].items():
+        if "error" in forecast:
+            print(f"{ticker}: lỗi - {forecast['error']}")
+            continue
+        print(f"{ticker}: giá hiện tại {forecast['latest_price']:.2f}, dự báo: " + ", ".join(f"{p:.2f}" for p in forecast["forecast"]))
+        if "p5" in forecast:
+            print(f"  Khoảng 5%-95% ở bước cuối: {forecast['p5'][-1]:.2f} - {forecast['p95'][-1]:.2f}")
+    if args.horizon > 1:
+        print("Lưu ý: từ bước 2, dự báo dùng tiếp trạng thái ẩn (lịch sử dài hơn cửa sổ lúc huấn luyện) thay vì "
+              "chạy lại cửa sổ trượt; dùng --benchmark để xem chênh lệch.")
+    timing = result["timing"]
+    print(f"Chuẩn bị {timing['prepare_ms']:.1f} ms, cửa sổ đầu {timing['window_ms']:.1f} ms, "
+          f"mỗi bước tiếp theo {timing['step_ms']:.2f} ms, tổng {timing['total_ms']:.1f} ms cho {timing['batch']} chuỗi")
+
+    if args.benchmark:
+        for ticker in args.tickers:
+            model_file = model_file_for(ticker, config.model_path)
+            if not os.path.exists(model_file):
+                continue
+            columns = load_model_features(model_file)
+            data = load_data(ticker, data_source)
+            features = build_features(data, columns)
+            scaled, scaler = scale_data(features, load_model_scaler(model_file), update=config.scaler_update,
+                                        timestamps=feature_timestamps(data, features))
+            batch = max(args.paths, 1)
+            inputs = (np.repeat(scaled[None, -load_model_sequence_length(model_file):], batch, axis=0),
+                      np.repeat(data['Close'].to_numpy(dtype=np.float64)[None, -max(sma_spread_windows[1], volatility_window + 1, 2):], batch, axis=0),
+                      np.repeat(scaler.scale_[None], batch, axis=0), np.repeat(scaler.min_[None], batch, axis=0))
+            model = load_eager_model(model_file)
+            start = time.perf_counter()
+            carried, _ = rollout(model, *inputs, columns, args.horizon)
+            carried_s = time.perf_counter() - start
+            start = time.perf_counter()
+            sliding = rollout_sliding(model, *inputs, columns, args.horizon)
+            sliding_s = time.perf_counter() - start
+            print(f"{ticker}: giữ trạng thái ẩn {carried_s * 1000:.1f} ms, cửa sổ trượt {sliding_s * 1000:.1f} ms "
+                  f"({sliding_s / carried_s:.1f}x), bước 1 trùng khớp: {np.allclose(carried[:, 0], sliding[:, 0])}, "
+                  f"chênh lệch lớn nhất: {np.abs(carried - sliding).max():.4f}")
\ No newline at end of file
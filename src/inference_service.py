@@ -0,0 +1,214 @@
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+import numpy as np
+import torch
+from src.config import model_path, model_cache_size, scaler_update, model_file_for
+from src.data_loader import load_data
+from src.export_model import load_inference_model, resolve_model_file
+from src.features import build_features, bundle_path_for, feature_timestamps, load_model_features, load_model_scaler
+from src.features import load_model_sequence_length, target_index
+from src.scaling_data import scale_data, inverse_transform_column
+
+class ModelRegistry:
+    """
+    Cache LRU các mô hình đã nạp, khoá theo (file mô hình thực sự dùng để suy luận, mtime của file đó).
+    Các ticker trỏ tới cùng một file (ví dụ liên kết tới một mô hình chung) dùng chung một mô hình đã nạp.
+    Artifact đã xuất (TorchScript/int8) được ưu tiên nếu có, theo config.inference_mode.
+    Khi file mô hình được train lại (mtime thay đổi), bản cũ trong cache tự động bị thay thế.
+    Args:
+        capacity (int): Số mô hình tối đa giữ trong bộ nhớ.
+        model_dir (str): Thư mục chứa các file mô hình (config.model_file_for).
+    """
+    def __init__(self, capacity=model_cache_size, model_dir=model_path):
+        self.capacity = capacity
+        self.model_dir = model_dir
+        self.models = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def model_file(self, ticker):
+        return model_file_for(ticker, self.model_dir)
+
+    def get(self, ticker):
+        """Trả về (khoá, mô hình) cho ticker, nạp từ đĩa nếu chưa có trong cache hoặc file đã thay đổi."""
+        model_file = self.model_file(ticker)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_file}. Vui lòng train trước.")
+        resolved = os.path.realpath(resolve_model_file(model_file))
+        key = (resolved, os.path.getmtime(resolved))
+        if key in self.models:
+            self.stats["hits"] += 1
+            self.models.move_to_end(key)
+            return key, self.models[key]
+
+        self.stats["misses"] += 1
+        for stale in [k for k in self.models if k[0] == resolved]:
+            del self.models[stale]
+        model = self.models[key] = load_inference_model(model_file)
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
+            self.stats["evictions"] += 1
+        return key, model
+
+class InferenceService:
+    """
+    Dịch vụ dự báo giá tiếp theo cho nhiều ticker trong một yêu cầu.
+    Cửa sổ cuối cùng của các ticker dùng chung một mô hình được gộp thành một batch và chạy
+    một lần forward duy nhất dưới torch.inference_mode.
+    Args:
+        registry (ModelRegistry): Cache mô hình, mặc định tạo mới.
+        data_source (str): 'https://stooq.com' hoặc 'local'.
+        history (int): Số yêu cầu gần nhất dùng để tính phân vị độ trễ.
+    """
+    def __init__(self, registry=None, data_source="https://stooq.com", history=1000):
+        self.registry = registry or ModelRegistry()
+        self.data_source = data_source
+        self.latencies = deque(maxlen=history)
+        self.scalers = {}
+
+    def _scaler(self, model_file):
+        """
+        Bản sao riêng của scaler trong bundle mô hình, giữ giữa các yêu cầu và cập nhật min/max bằng
+        nến mới (chỉ các dòng chưa thấy); None với mô hình cũ chưa có bundle.
+        """
+        scaler = load_model_scaler(model_file)
+        if scaler is None:
+            return None
+        key = (model_file, os.stat(bundle_path_for(model_file)).st_mtime_ns)
+        if key not in self.scalers:
+            self.scalers[key] = scaler.copy()
+        return self.scalers[key]
+
+    def _last_window(self, ticker):
+        model_file = self.registry.model_file(ticker)
+        columns = load_model_features(model_file)
+        sequence_length = load_model_sequence_length(model_file)
+        data = load_data(ticker, self.data_source)
+        features = build_features(data, columns)
+        if len(features) < sequence_length:
+            raise ValueError(f"Dữ liệu của {ticker} ngắn hơn sequence_length={sequence_length}")
+        scaler = self._scaler(model_file)
+        if scaler is None:
+            scaled_data, scaler = scale_data(features)
+            window = scaled_data[-sequence_length:]
+        else:
+            if scaler_update:
+                scaler.update(features, feature_timestamps(data, features))
+            window = scaler.transform(features[-sequence_length:])
+        return window, scaler, target_index(columns), float(data['Close'].iloc[-1])
+
+    def predict(self, tickers):
+        """
+        Dự báo giá đóng cửa tiếp theo cho danh sách ticker.
+        Args:
+            tickers (list[str]): Danh sách mã chứng khoán.
+        Returns:
+            dict: Kết quả theo từng ticker (hoặc thông báo lỗi) và độ trễ của yêu cầu (ms).
+        """
+        start = time.perf_counter()
+        results, groups = dict.fromkeys(tickers), OrderedDict()
+        for ticker in tickers:
+            try:
+                key, model = self.registry.get(ticker)
+                window, scaler, target, latest_price = self._last_window(ticker)
+            except Exception as e:
+                results[ticker] = {"error": str(e)}
+                continue
+            # Cùng mô hình và cùng kích thước cửa sổ thì chung một batch
+            groups.setdefault((key, window.shape), (model, []))[1].append((ticker, window, scaler, target, latest_price))
+
+        with torch.inference_mode():
+            for model, items in groups.values():
+                batch = torch.tensor(np.stack([window for _, window, _, _, _ in items]), dtype=torch.float32)
+                preds = model(batch).numpy()
+                for (ticker, _, scaler, target, latest_price), pred in zip(items, preds):
+                    results[ticker] = {
+                        "latest_price": latest_price,
+                        "predicted_price": float(inverse_transform_column(scaler, pred[0], target)),
+                    }
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.latencies.append(latency_ms)
+        return {"predictions": results, "latency_ms": latency_ms}
+
+    def latency_stats(self):
+        """Phân vị độ trễ (ms) của các yêu cầu gần nhất."""
+        if not self.latencies:
+            return {"count": 0}
+        p50, p90, p99 = np.percentile(list(self.latencies), [50, 90, 99])
+        return {"count": len(self.latencies), "p50_ms": p50, "p90_ms": p90, "p99_ms": p99,
+                "max_ms": max(self.latencies), "models": dict(self.registry.stats)}
+
+def serve_stdin(service, stream=sys.stdin, out=sys.stdout):
+    """
+    Front end JSON lines: mỗi dòng vào là {"tickers": [...]} hoặc {"stats": true},
+    mỗi dòng ra là kết quả JSON tương ứng.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            response = service.latency_stats() if request.get("stats") else service.predict(request["tickers"])
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"error": f"Yêu cầu không hợp lệ: {e}"}
+        out.write(json.dumps(response, ensure_ascii=False) + "\n")
+        out.flush()
+
+def serve_http(service, host="127.0.0.1", port=8000):
+    """Front end HTTP: POST /predict với {"tickers": [...]}, GET /stats trả về phân vị độ trễ."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, service.latency_stats())
+            else:
+                self._send(404, {"error": "Không tìm thấy"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": "Không tìm thấy"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self._send(200, service.predict(request["tickers"]))
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"Yêu cầu không hợp lệ: {e}"})
+
+    server = HTTPServer((host, port), Handler)
+    print(f"Đang phục vụ dự báo tại http://{host}:{port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batched Inference Service")
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='Y',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--port', type=int, default=None, help='Chạy front end HTTP tại cổng này thay vì stdin/JSON')
+    parser.add_argument('--cache_size', type=int, default=model_cache_size, help='Số mô hình tối đa giữ trong bộ nhớ')
+    args = parser.parse_args()
+
+    service = InferenceService(registry=ModelRegistry(capacity=args.cache_size),
+                               data_source='https://stooq.com' if args.data_source == 'Y' else 'local')
+    if args.port:
+        serve_http(service, port=args.port)
+    else:
+        serve_stdin(service)
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+PRICE_DTYPE = np.float32  # Giá OHLC ở dạng gọn
+RESAMPLE_INTERVALS = ("d", "w", "m")  # Cùng mã khung thời gian với Stooq: ngày, tuần, tháng
+SECONDS_PER_DAY = 86400
+
+def epoch_seconds(data):
+    """
+    Thời điểm của từng dòng dưới dạng epoch (giây, int64), chấp nhận mọi dạng khung giá đang có trong dự án:
+    cột 'Timestamp' (dạng gọn), cột 'Date' dạng chuỗi như Stooq trả về (kèm cột 'Time' với dữ liệu trong ngày),
+    hoặc DatetimeIndex như load_data(..., 'local').
+    Returns:
+        np.ndarray: Mảng int64.
+    """
+    if "Timestamp" in data.columns:
+        return data["Timestamp"].to_numpy(dtype=np.int64)
+    dates = parse_dates(data) if "Date" in data.columns else pd.DatetimeIndex(data.index)
+    return dates.to_numpy(dtype="datetime64[s]").view(np.int64)
+
+def parse_dates(data):
+    """Thời điểm của khung giá dạng chuỗi như Stooq/CSV: cột 'Date', ghép thêm cột 'Time' với dữ liệu trong ngày."""
+    dates = data["Date"].astype(str)
+    if "Time" in data.columns:
+        dates = dates + " " + data["Time"].astype(str)
+    return pd.DatetimeIndex(pd.to_datetime(dates), name="Date")
+
+def index_by_date(data):
+    """Khung giá dạng chuỗi -> khung có DatetimeIndex tên 'Date' (Date và Time được ghép, không còn trùng thời điểm)."""
+    return data.drop(columns=[c for c in ("Date", "Time") if c in data.columns]).set_index(parse_dates(data))
+
+def to_compact(data, ticker=None):
+    """
+    Chuyển khung giá sang dạng gọn: 'Timestamp' epoch int64 (giây), 'Ticker' categorical (nếu có),
+    giá OHLC float32 và 'Volume' int64 (float64 nếu khối lượng có phần lẻ, ví dụ cổ phiếu lẻ), chỉ mục RangeIndex.
+    Các hàm chỉ đọc cột giá (strategy, features) dùng trực tiếp được khung gọn.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá (xem epoch_seconds cho các dạng thời gian được hỗ trợ).
+        ticker (str): Mã chứng khoán ghi vào cột 'Ticker'; bỏ qua nếu data đã có cột này.
+    Returns:
+        pd.DataFrame: Khung giá dạng gọn.
+    """
+    columns = {"Timestamp": epoch_seconds(data)}
+    if "Ticker" in data.columns:
+        columns["Ticker"] = data["Ticker"].astype("category").array
+    elif ticker is not None:
+        columns["Ticker"] = pd.Categorical([ticker] * len(data))
+    for column in ("Open", "High", "Low", "Close"):
+        if column in data.columns:
+            columns[column] = data[column].to_numpy(dtype=PRICE_DTYPE)
+    if "Volume" in data.columns:
+        volume = data["Volume"].to_numpy(dtype=np.float64)
+        columns["Volume"] = volume.astype(np.int64) if np.array_equal(volume, np.round(volume)) else volume
+    return pd.DataFrame(columns)
+
+def from_compact(data):
+    """Khung gọn -> khung có DatetimeIndex tên 'Date' (giá vẫn float32), dùng cho biểu đồ và các hàm cần ngày."""
+    index = pd.DatetimeIndex(data["Timestamp"].to_numpy(dtype=np.int64).astype("datetime64[s]"), name="Date")
+    return data.drop(columns="Timestamp").set_index(index)
+
+def period_start(timestamps, interval):
+    """
+    Mốc bắt đầu (epoch giây) của ngày, tuần (thứ Hai) hoặc tháng chứa từng thời điểm, tính hoàn toàn trên int64.
+    Args:
+        timestamps (np.ndarray): Epoch giây int64.
+        interval (str): 'd', 'w' hoặc 'm'.
+    Returns:
+        np.ndarray: Epoch giây int64 của đầu kỳ.
+    """
+    if interval not in RESAMPLE_INTERVALS:
+        raise ValueError(f"Khung thời gian không hợp lệ: {interval}. Chỉ hỗ trợ {', '.join(RESAMPLE_INTERVALS)}.")
+    days = timestamps // SECONDS_PER_DAY
+    if interval == "d":
+        return days * SECONDS_PER_DAY
+    if interval == "w":
+        # 1970-01-01 là thứ Năm, dịch 3 ngày để tuần bắt đầu từ thứ Hai
+        return ((days + 3) // 7 * 7 - 3) * SECONDS_PER_DAY
+    # Đổi sang tháng theo lịch chậm hơn nhiều so với phép chia, nên chỉ đổi một lần cho mỗi chuỗi dòng cùng ngày
+    runs = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1)) if len(days) else np.empty(0, dtype=np.int64)
+    months = days[runs].astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[s]").view(np.int64)
+    return np.repeat(months, np.diff(np.append(runs, len(days))))
+
+def resample_bars(data, interval="d"):
+    """
+    Gộp nến (ví dụ nến phút) thành nến ngày, tuần hoặc tháng bằng np.*.reduceat trên ranh giới kỳ,
+    không dùng groupby. Open là giá mở của nến đầu kỳ, Close là giá đóng của nến cuối kỳ, High/Low là cực trị
+    (bỏ qua NaN), Volume là tổng; nhãn thời gian là đầu kỳ. Khung nhiều ticker được gộp riêng từng ticker.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá (dạng gọn hoặc dạng bất kỳ mà to_compact nhận).
+        interval (str): 'd', 'w' hoặc 'm'.
+    Returns:
+        pd.DataFrame: Nến đã gộp ở dạng gọn.
+    """
+    data = data if "Timestamp" in data.columns else to_compact(data)
+    timestamps = data["Timestamp"].to_numpy(dtype=np.int64)
+    codes = data["Ticker"].cat.codes.to_numpy() if "Ticker" in data.columns else np.zeros(len(data), dtype=np.int8)
+    order = None
+    if len(data) > 1 and not ((np.diff(codes) > 0) | ((np.diff(codes) == 0) & (np.diff(timestamps) >= 0))).all():
+        order = np.lexsort((timestamps, codes))
+        timestamps, codes = timestamps[order], codes[order]
+
+    starts = period_start(timestamps, interval)
+    boundaries = np.flatnonzero((np.diff(starts) != 0) | (np.diff(codes) != 0)) + 1
+    first = np.concatenate(([0], boundaries)) if len(data) else np.empty(0, dtype=np.int64)
+    last = np.concatenate((boundaries - 1, [len(data) - 1])) if len(data) else np.empty(0, dtype=np.int64)
+
+    def column(name):
+        values = data[name].to_numpy()
+        return values[order] if order is not None else values
+
+    bars = {"Timestamp": starts[first]}
+    if "Ticker" in data.columns:
+        bars["Ticker"] = pd.Categorical.from_codes(codes[first], data["Ticker"].cat.categories)
+    if "Open" in data.columns:
+        bars["Open"] = column("Open")[first]
+    if len(data):
+        if "High" in data.columns:
+            bars["High"] = np.fmax.reduceat(column("High"), first)
+        if "Low" in data.columns:
+            bars["Low"] = np.fmin.reduceat(column("Low"), first)
+    bars["Close"] = column("Close")[last]
+    if "Volume" in data.columns and len(data):
+        bars["Volume"] = np.add.reduceat(column("Volume"), first)
+    return pd.DataFrame(bars)
+
+def memory_report(frames):
+    """
+    So sánh bộ nhớ (kể cả chuỗi và chỉ mục) của các khung giá.
+    Args:
+        frames (dict[str, pd.DataFrame]): Tên -> khung giá.
+    Returns:
+        pd.DataFrame: Mỗi khung một dòng: số dòng, MB, byte mỗi dòng và kiểu dữ liệu từng cột.
+    """
+    rows = []
+    for name, data in frames.items():
+        nbytes = int(data.memory_usage(index=True, deep=True).sum())
+        rows.append({"frame": name, "rows": len(data), "mb": nbytes / 2**20,
+                     "bytes_per_row": nbytes / max(len(data), 1),
+                     "dtypes": ", ".join(f"{c}:{t}" for c, t in data.dtypes.astype(str).items())})
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import time
+    from src.batch_backtest import ticker_from_path
+    from src.benchmark import synthetic_prices
+
+    parser = argparse.ArgumentParser(description="Intraday Bars and Compact Price Frames")
+    parser.add_argument('--pattern', type=str, default="data/*.csv", help="Mẫu glob các file CSV giá ngày")
+    parser.add_argument('--minutes', type=float, default=2e6, help='Số nến phút giả lập cho báo cáo bộ nhớ và resample (0 để bỏ qua)')
+    args = parser.parse_args()
+
+    # Khung hiện tại: như Stooq/CSV trả về (Date chuỗi, float64) và như load_data(..., 'local') (DatetimeIndex, float64)
+    frames, raw_panel, compact_panel = {}, [], []
+    for csv_path in sorted(glob.glob(args.pattern)):
+        ticker = ticker_from_path(csv_path)
+        raw = pd.read_csv(csv_path)
+        local = raw.assign(Date=pd.to_datetime(raw["Date"])).set_index("Date")
+        frames[f"{ticker} csv"] = raw
+        frames[f"{ticker} local"] = local
+        frames[f"{ticker} compact"] = to_compact(local)
+        raw_panel.append(raw.assign(Ticker=ticker))
+        compact_panel.append(to_compact(local, ticker))
+    if raw_panel:
+        frames["panel csv"] = pd.concat(raw_panel, ignore_index=True)
+        frames["panel compact"] = pd.concat(compact_panel, ignore_index=True)
+        frames["panel compact"]["Ticker"] = frames["panel compact"]["Ticker"].astype("category")
+
+    if args.minutes:
+        minutes = synthetic_prices(int(args.minutes), freq="min")
+        frames["minute local"] = minutes
+        frames["minute compact"] = compact = to_compact(minutes)
+        for interval, rule in (("d", "D"), ("w", "W-MON"), ("m", "MS")):
+            start = time.perf_counter()
+            bars = resample_bars(compact, interval)
+            fast = time.perf_counter() - start
+            start = time.perf_counter()
+            expected = minutes.resample(rule, label="left", closed="left").agg(
+                {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}).dropna()
+            slow = time.perf_counter() - start
+            same = np.allclose(bars[["Open", "High", "Low", "Close"]].to_numpy(), expected[["Open", "High", "Low", "Close"]].to_numpy(),
+                               rtol=1e-6) and (bars["Volume"].to_numpy() == expected["Volume"].to_numpy()).all()
+            print(f"resample '{interval}': {len(bars)} nến, reduceat {fast * 1000:.1f} ms, pandas {slow * 1000:.1f} ms, "
+                  f"khớp pandas: {same}")
+
+    report = memory_report(frames)
+    print(report.drop(columns="dtypes").to_string(index=False, float_format=lambda v: f"{v:.2f}"))
\ No newline at end of file
@@ -1,16 +1,18 @@
 import argparse
 from src.data_loader import load_data
 from src.strategy import apply_sma_strategy, grid_search_sma
-from src.predict import predict_future
-from src.visualization import *
-from src.config import default_ticker, suggested_tickers, short_range, long_range, pic_path
+from src.visualization import render_charts, ticker_chart_specs
+from src.profiling import Profiler, add_profile_arguments
+from src.config import default_ticker, suggested_tickers, short_range, long_range, pic_path, grid_search_method, chart_workers
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Stock Prediction Main Pipeline")
     parser.add_argument('--ticker', type=str, default=default_ticker, help='Mã cổ phiếu')
     parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
                         help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    profiler = Profiler("main", enabled=args.profile, cprofile_stage=args.profile_stage)
 
     ticker = args.ticker
     data_source = 'https://stooq.com' if args.data_source.upper() == 'Y' else 'local'
@@ -20,34 +22,40 @@ if __name__ == "__main__":
     print(f"Sử dụng ticker: {ticker}")
     print(f"Chọn kiểu dữ liệu: {'Thời gian thực' if data_source == 'https://stooq.com' else 'Local file'}")
 
-    data = load_data(ticker, data_source)
+    with profiler.stage("load") as record:
+        data = load_data(ticker, data_source)
+        record["rows"] = len(data)
 
     # Grid Search tìm bộ tham số SMA tối ưu
-    sma_param_results = grid_search_sma(data, short_range, long_range)
+    with profiler.stage("grid_search") as record:
+        sma_param_results = grid_search_sma(data, short_range, long_range, method=grid_search_method)
+        record["rows"] = len(data)
     print(sma_param_results.head())
 
     # Áp dụng chiến lược với bộ tham số tốt nhất
     best = sma_param_results.iloc[0]
-    apply_sma_strategy(data, short_window=int(best['short_window']), long_window=int(best['long_window']))
-
-    # Vẽ biểu đồ hiệu suất tích luỹ & tỷ suất thông thường của chiến lược SMA
-    plot_cumulative_return(data=data,
-                           short_window=int(best['short_window']),
-                           long_window=int(best['long_window']),
-                           save_path=f"{pic_path}/{ticker}/sma_cumulative_return_{ticker}.png")
-    plot_daily_return_sma(data=data,
-                           short_window=int(best['short_window']),
-                           long_window=int(best['long_window']),
-                           save_path=f"{pic_path}/{ticker}/sma_daily_return_{ticker}.png")
-
-    # Dự báo giá tiếp theo sử dụng mô hình đã lưu
-    predict_future(ticker=ticker)
-
-    # Vẽ biểu đồ giá thực tế và giá dự báo từ mô hình LSTM
-    plot_stock_price_lstm(data=data, 
-                          ticker=ticker,
-                          save_path=f"{pic_path}/{ticker}/rnn_lstm_prediction_{ticker}.png")
+    with profiler.stage("strategy") as record:
+        apply_sma_strategy(data, short_window=int(best['short_window']), long_window=int(best['long_window']))
+        record["rows"] = len(data)
+
+    # Dự báo giá tiếp theo sử dụng mô hình đã lưu (PyTorch chỉ được nạp từ bước này);
+    # ticker chưa có mô hình vẫn có biểu đồ SMA, chỉ bỏ qua dự báo và biểu đồ LSTM
+    with profiler.stage("predict"):
+        from src.predict import predict_future
+        try:
+            predict_future(ticker=ticker, profiler=profiler, data=data)
+        except FileNotFoundError as e:
+            print(f"Bỏ qua dự báo: {e}")
+
+    # Vẽ cả ba biểu đồ (hiệu suất tích luỹ, tỷ suất từng ngày, giá dự báo LSTM) từ chuỗi SMA tính một lần
+    # và dự báo toàn lịch sử trong artifact_cache; biểu đồ có dữ liệu không đổi được bỏ qua
+    with profiler.stage("plot") as record:
+        specs = ticker_chart_specs(data, ticker, int(best['short_window']), int(best['long_window']))
+        counts = render_charts(specs, workers=chart_workers)
+        record["rows"] = len(data)
+    print(f"Đã vẽ {counts['rendered']}, bỏ qua {counts['skipped']} (không đổi) biểu đồ")
 
     # Thông báo hoàn thành
     print(f"Đã hoàn thành các bước phân tích và dự báo cho ticker: {ticker}")
-    print(f"Các biểu đồ đã được lưu tại: {pic_path}/{ticker}/")
\ No newline at end of file
+    print(f"Các biểu đồ đã được lưu tại: {pic_path}/{ticker}/")
+    profiler.finish(args.profile_format)
\ No newline at end of file
@@ -11,6 +11,11 @@ class LSTMModel(nn.Module):
         out, _ = self.lstm(x)
         out = out[:, -1, :]
         return self.fc(out)
+
+    def step(self, x, state=None):
+        # Như forward nhưng nhận và trả trạng thái ẩn, để dự báo nhiều bước chỉ cần chạy tiếp từng bước mới
+        out, state = self.lstm(x, state)
+        return self.fc(out[:, -1, :]), state
     
 class RNN_LSTMModel(nn.Module):
     def __init__(self, input_size=1, rnn_hidden=32, lstm_hidden=32):
@@ -23,4 +28,11 @@ class RNN_LSTMModel(nn.Module):
         r_out, _ = self.rnn(x)
         l_out, _ = self.lstm(r_out)
         out = l_out[:, -1, :]
-        return self.fc(out)
\ No newline at end of file
+        return self.fc(out)
+
+    def step(self, x, state=None):
+        # Như forward nhưng nhận và trả trạng thái ẩn (rnn, lstm), để dự báo nhiều bước chỉ cần chạy tiếp từng bước mới
+        rnn_state, lstm_state = state if state is not None else (None, None)
+        r_out, rnn_state = self.rnn(x, rnn_state)
+        l_out, lstm_state = self.lstm(r_out, lstm_state)
+        return self.fc(l_out[:, -1, :]), (rnn_state, lstm_state)
\ No newline at end of file
@@ -1,49 +1,55 @@
-import torch
 import os
 from src.data_loader import load_realtime_data
-from src.model import LSTMModel, RNN_LSTMModel
-from src.config import default_ticker, sequence_length, model_path
-from src.scaling_data import scale_data
-from src.create_sequences import create_sequences
+from src.config import default_ticker, model_path, model_file_for
+from src.artifact_cache import artifact_cache
+from src.features import load_model_features, load_model_sequence_length
+from src.profiling import Profiler
 
-def predict_future(ticker=default_ticker):
+def predict_future(ticker=default_ticker, profiler=None, data=None, cache=None):
     """
     Dự báo giá đóng cửa tương lai dựa trên mô hình đã train.
     Args:
         ticker (str): Mã chứng khoán cần dự báo, mặc định là mã chứng khoán gợi ý.
+        profiler (Profiler): Nếu có, đo từng bước (tải dữ liệu, tiền xử lý, suy luận).
+        data (pd.DataFrame): Dữ liệu đã tải sẵn (ví dụ từ main.py); nếu None sẽ tải từ Stooq.
+        cache (ArtifactCache): Cache dùng chung với plot_stock_price_lstm, mặc định là artifact_cache.
     Returns:
-        list: Dự báo giá đóng cửa tương lai.
+        float: Dự báo giá đóng cửa tương lai.
     """
-    global model_path, sequence_length
-    model_file = f"{model_path}/model_{ticker}.pth"
+    global model_path
+    profiler = profiler or Profiler("predict")
+    cache = cache or artifact_cache
+    model_file = model_file_for(ticker, model_path)
     if not os.path.exists(model_file):
         raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_file}. Vui lòng train trước.")
 
     # Tải dữ liệu thời gian thực từ Stooq
-    data = load_realtime_data(ticker)
-    features = data[['Close']].values
-    scaled_data, scaler = scale_data(features)
-
-    X, _ = create_sequences(scaled_data, sequence_length)
-    X = torch.tensor(X).float()
-
-    model = RNN_LSTMModel()
-    model.load_state_dict(torch.load(model_file))
-    model.eval()
-
-    test_input = X[-1].unsqueeze(0)
-    pred_scaled = model(test_input).item()
-    predicted_price = scaler.inverse_transform([[pred_scaled]])[0][0]
-    latest_price = features[-1][0]
+    with profiler.stage("predict_load") as record:
+        if data is None:
+            data = load_realtime_data(ticker)
+        record["rows"] = len(data)
+
+    with profiler.stage("predict_preprocess") as record:
+        features = cache.features(data, ticker, load_model_features(model_file), model_file)["features"]
+        record["rows"] = len(features)
+
+    # Dùng lại dự báo toàn lịch sử nếu đã có trong cache, nếu không chỉ suy luận cửa sổ cuối cùng
+    with profiler.stage("predict_inference") as record:
+        predicted_price = cache.predictions(data, ticker, model_file, load_model_sequence_length(model_file), last_only=True)[-1]
+        record["rows"] = 1
+    latest_price = data['Close'].iloc[-1]
     print(f"Giá hiện tại: {latest_price:.2f}, Dự báo giá tiếp theo: {predicted_price:.2f}")
+    return predicted_price
 
 if __name__ == "__main__":
     import argparse
     import src.config as config
+    from src.profiling import add_profile_arguments
 
     # Thiết lập parser cho các tham số dòng lệnh
     parser = argparse.ArgumentParser(description="Stock Price Prediction - Predict Future")
     parser.add_argument('--ticker', type=str, default=config.ticker, help='Mã cổ phiếu')
+    add_profile_arguments(parser)
     args = parser.parse_args()
 
     # Cập nhật config bằng giá trị truyền vào
@@ -52,4 +58,6 @@ if __name__ == "__main__":
     print(f"Đang dự báo giá tiếp theo cho ticker: {config.ticker}")
 
     # Dự báo giá tiếp theo sử dụng mô hình đã lưu
-    predict_future(ticker=config.ticker)
\ No newline at end of file
+    profiler = Profiler("predict", enabled=args.profile, cprofile_stage=args.profile_stage)
+    predict_future(ticker=config.ticker, profiler=profiler)
+    profiler.finish(args.profile_format)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.intraday import index_by_date
+
+COLUMNAR_SUFFIX = ".cols"  # data/aapl_us.csv -> data/aapl_us.cols/
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+def columnar_path_for(csv_path):
+    """Đường dẫn thư mục lưu dạng cột tương ứng với một file CSV."""
+    return os.path.splitext(csv_path)[0] + COLUMNAR_SUFFIX
+
+def is_columnar_current(columnar_path, csv_path):
+    """Bản lưu dạng cột dùng được nếu tồn tại và không cũ hơn file CSV gốc (hoặc CSV không còn)."""
+    index_file = os.path.join(columnar_path, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(index_file) >= os.path.getmtime(csv_path)
+
+def save_columnar(data, columnar_path):
+    """
+    Ghi DataFrame giá (index là Date) thành các file .npy theo từng cột kèm file index.json.
+    Args:
+        data (pd.DataFrame): Dữ liệu OHLCV với DatetimeIndex.
+        columnar_path (str): Thư mục đích.
+    """
+    os.makedirs(columnar_path, exist_ok=True)
+    # Ngày lưu dưới dạng epoch int64 (giữ nguyên đơn vị thời gian) để nạp lại không cần parse chuỗi
+    dates = data.index.values
+    np.save(os.path.join(columnar_path, "Date.npy"), dates.view(np.int64))
+    columns = {}
+    for column in data.columns:
+        values = np.ascontiguousarray(data[column].to_numpy())
+        np.save(os.path.join(columnar_path, f"{column}.npy"), values)
+        columns[column] = str(values.dtype)
+
+    # index.json được ghi sau cùng nên mtime của nó đánh dấu bản lưu đã hoàn chỉnh
+    with open(os.path.join(columnar_path, INDEX_FILE), "w") as f:
+        json.dump({"version": FORMAT_VERSION, "rows": len(data), "date_dtype": str(dates.dtype),
+                   "columns": columns}, f)
+
+def convert_csv(csv_path, columnar_path=None):
+    """
+    Chuyển một file CSV giá sang định dạng cột nhị phân.
+    Args:
+        csv_path (str): Đường dẫn file CSV (cột Date[, Time], Open, High, Low, Close[, Volume]).
+        columnar_path (str): Thư mục đích, mặc định cạnh file CSV.
+    Returns:
+        str: Thư mục đã ghi.
+    """
+    columnar_path = columnar_path or columnar_path_for(csv_path)
+    data = index_by_date(pd.read_csv(csv_path))
+    save_columnar(data, columnar_path)
+    return columnar_path
+
+def load_columnar(columnar_path, mmap=True):
+    """
+    Nạp dữ liệu giá từ định dạng cột. Với mmap=True các cột được ánh xạ bộ nhớ (chỉ đọc),
+    nên việc nạp gần như không sao chép dữ liệu.
+    Args:
+        columnar_path (str): Thư mục chứa các file .npy và index.json.
+        mmap (bool): Ánh xạ bộ nhớ thay vì đọc toàn bộ vào RAM.
+    Returns:
+        pd.DataFrame: Dữ liệu với DatetimeIndex tên 'Date', giống load_data(..., 'local').
+    """
+    with open(os.path.join(columnar_path, INDEX_FILE)) as f:
+        index = json.load(f)
+    if index.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Phiên bản định dạng cột không được hỗ trợ: {index.get('version')}")
+
+    mmap_mode = "r" if mmap else None
+    dates = np.load(os.path.join(columnar_path, "Date.npy"), mmap_mode=mmap_mode)
+    columns = {column: np.load(os.path.join(columnar_path, f"{column}.npy"), mmap_mode=mmap_mode)
+               for column in index["columns"]}
+    date_index = pd.DatetimeIndex(np.asarray(dates).view(index["date_dtype"]), name="Date")
+    return pd.DataFrame(columns, index=date_index, copy=False)
+
+def _load_csv(csv_path):
+    """Nạp CSV theo cách load_data(..., 'local') đang làm, dùng làm mốc so sánh."""
+    data = pd.read_csv(csv_path)
+    data['Date'] = pd.to_datetime(data['Date'])
+    data.set_index('Date', inplace=True)
+    return data
+
+def _rss_mb():
+    """RSS hiện tại của tiến trình (MB), đọc từ /proc trên Linux."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _measure_load(loader, path):
+    """Đo thời gian và mức tăng RSS (MB) của một lần nạp; nên chạy trong tiến trình mới."""
+    import time
+
+    before = _rss_mb()
+    start = time.perf_counter()
+    data = loader(path)
+    float(data['Close'].sum())  # Chạm vào dữ liệu để tính cả chi phí đọc trang nhớ
+    elapsed = time.perf_counter() - start
+    return elapsed, _rss_mb() - before
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    from multiprocessing import get_context
+
+    parser = argparse.ArgumentParser(description="Columnar Price Storage")
+    parser.add_argument('--pattern', type=str, default="data/*.csv", help='Mẫu glob các file CSV cần chuyển đổi')
+    parser.add_argument('--benchmark', action='store_true', help='So sánh thời gian nạp và RSS giữa CSV và dạng cột')
+    args = parser.parse_args()
+
+    csv_files = sorted(glob.glob(args.pattern))
+    for csv_path in csv_files:
+        print(f"Đã chuyển {csv_path} -> {convert_csv(csv_path)}")
+
+    if args.benchmark:
+        context = get_context("spawn")
+        print(f"{'file':<22}{'csv (ms)':>10}{'csv RSS (MB)':>14}{'cols (ms)':>11}{'cols RSS (MB)':>15}")
+        for csv_path in csv_files:
+            with context.Pool(1) as pool:
+                csv_time, csv_rss = pool.apply(_measure_load, (_load_csv, csv_path))
+            with context.Pool(1) as pool:
+                cols_time, cols_rss = pool.apply(_measure_load, (load_columnar, columnar_path_for(csv_path)))
+            print(f"{os.path.basename(csv_path):<22}{csv_time * 1000:>10.2f}{csv_rss:>14.2f}"
+                  f"{cols_time * 1000:>11.2f}{cols_rss:>15.2f}")
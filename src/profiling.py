@@ -0,0 +1,134 @@
+import cProfile
+import csv
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from src.config import profile_path
+
+try:
+    import resource
+except ImportError:  # Windows không có module resource
+    resource = None
+
+FIELDS = ["stage", "wall_s", "cpu_s", "peak_mem_mb", "max_rss_mb", "rows"]
+
+def _max_rss_mb():
+    """Mức RSS cao nhất của tiến trình tính đến hiện tại (MB)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return max_rss / 2**20 if platform.system() == "Darwin" else max_rss / 1024
+
+class Profiler:
+    """
+    Đo thời gian thực (wall), thời gian CPU, bộ nhớ đỉnh cấp phát thêm trong bước (so với lúc bắt đầu bước)
+    và số dòng dữ liệu của từng bước trong pipeline.
+    Khi enabled=False, stage() không làm gì nên có thể để sẵn trong code mà không tốn chi phí.
+    Args:
+        name (str): Tên lần chạy, dùng đặt tên file báo cáo (ví dụ: 'main', 'train').
+        enabled (bool): Bật/tắt đo đạc.
+        cprofile_stage (str): Tên bước cần ghi thêm kết quả cProfile (.prof).
+        output_dir (str): Thư mục lưu báo cáo.
+    """
+    def __init__(self, name, enabled=False, cprofile_stage=None, output_dir=profile_path):
+        self.name = name
+        self.enabled = enabled
+        self.cprofile_stage = cprofile_stage
+        self.output_dir = output_dir
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.records = []
+        self._peaks = []  # Bộ nhớ đỉnh (tuyệt đối) của các bước đang chạy lồng nhau
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Đo một bước của pipeline. Đối tượng trả về là dict của bước, gán record['rows'] để ghi số dòng đã xử lý.
+        Ví dụ:
+            with profiler.stage("load") as record:
+                data = load_data(...)
+                record["rows"] = len(data)
+        """
+        record = {"stage": name, "rows": None}
+        if not self.enabled:
+            yield record
+            return
+
+        profile = cProfile.Profile() if name == self.cprofile_stage else None
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        # Bộ nhớ đã cấp phát trước bước (thư viện đã import, dữ liệu của bước trước) không tính cho bước này
+        baseline = tracemalloc.get_traced_memory()[0]
+        self._peaks.append(0)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            record["wall_s"] = time.perf_counter() - wall_start
+            record["cpu_s"] = time.process_time() - cpu_start
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            record["peak_mem_mb"] = max(peak - baseline, 0) / 2**20
+            record["max_rss_mb"] = _max_rss_mb()
+            self.records.append(record)
+            if profile:
+                os.makedirs(self.output_dir, exist_ok=True)
+                profile.dump_stats(f"{self.output_dir}/{self.name}_{name}_{self.run_id}.prof")
+
+    def summary(self):
+        """Chuỗi bảng tóm tắt các bước đã đo."""
+        lines = [f"{'stage':<20}{'wall (s)':>10}{'cpu (s)':>10}{'peak (MB)':>11}{'rows':>10}"]
+        for r in self.records:
+            rows = "" if r["rows"] is None else r["rows"]
+            lines.append(f"{r['stage']:<20}{r['wall_s']:>10.3f}{r['cpu_s']:>10.3f}{r['peak_mem_mb']:>11.1f}{rows:>10}")
+        return "\n".join(lines)
+
+    def save(self, fmt="json"):
+        """
+        Ghi báo cáo của lần chạy ra file.
+        Args:
+            fmt (str): 'json' hoặc 'csv'.
+        Returns:
+            str: Đường dẫn file báo cáo, None nếu profiler bị tắt.
+        """
+        if not self.enabled:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        report_file = f"{self.output_dir}/{self.name}_{self.run_id}.{fmt}"
+        if fmt == "json":
+            with open(report_file, "w") as f:
+                json.dump({"name": self.name, "run_id": self.run_id, "stages": self.records}, f, indent=2)
+        elif fmt == "csv":
+            with open(report_file, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            raise ValueError("Định dạng báo cáo không hợp lệ. Chỉ hỗ trợ 'json' hoặc 'csv'.")
+        return report_file
+
+    def finish(self, fmt="json"):
+        """In bảng tóm tắt và ghi báo cáo (chỉ khi profiler được bật)."""
+        if not self.enabled:
+            return None
+        print(self.summary())
+        report_file = self.save(fmt)
+        print(f"Đã lưu báo cáo profiling tại {report_file}")
+        return report_file
+
+def add_profile_arguments(parser):
+    """Thêm các tham số dòng lệnh --profile, --profile_format, --profile_stage cho một entry point."""
+    parser.add_argument('--profile', action='store_true', help='Đo thời gian, CPU và bộ nhớ của từng bước')
+    parser.add_argument('--profile_format', type=str, choices=['json', 'csv'], default='json', help='Định dạng báo cáo profiling')
+    parser.add_argument('--profile_stage', type=str, default=None, help='Tên bước cần ghi thêm kết quả cProfile (.prof)')
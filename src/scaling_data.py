@@ -1,16 +1,126 @@
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
 
-def scale_data(data):
+class MinMaxState:
     """
-    Chuẩn hóa dữ liệu bằng MinMaxScaler.
+    Bộ chuẩn hóa min-max từng cột về [0, 1], cùng công thức và thuộc tính (data_min_, data_max_, scale_, min_)
+    với sklearn MinMaxScaler, nhưng cập nhật được dần (min/max luỹ tiến) khi có nến mới và lưu được dạng JSON
+    trong bundle mô hình (xem features.save_model_bundle).
+    Args:
+        data_min (np.ndarray): Giá trị nhỏ nhất từng cột đã thấy.
+        data_max (np.ndarray): Giá trị lớn nhất từng cột đã thấy.
+        n_samples_seen (int): Số dòng đã dùng để cập nhật min/max.
+        last_timestamp (int): Thời điểm (epoch giây) của dòng cuối cùng đã thấy, None nếu không biết (bundle cũ).
+    """
+    def __init__(self, data_min=None, data_max=None, n_samples_seen=0, last_timestamp=None):
+        self.data_min_ = None if data_min is None else np.asarray(data_min)
+        self.data_max_ = None if data_max is None else np.asarray(data_max)
+        self.n_samples_seen_ = int(n_samples_seen)
+        self.last_timestamp_ = None if last_timestamp is None else int(last_timestamp)
+        if self.data_min_ is not None:
+            self._update_scale()
+
+    def _update_scale(self):
+        data_range = self.data_max_ - self.data_min_
+        # Cột hằng (khoảng gần 0) giữ hệ số 1 như sklearn
+        self.scale_ = 1 / np.where(data_range < 10 * np.finfo(data_range.dtype).eps, 1, data_range).astype(data_range.dtype)
+        self.min_ = -self.data_min_ * self.scale_
+
+    def partial_fit(self, data, timestamps=None):
+        """Cập nhật min/max bằng các dòng mới (O(số dòng mới)), bỏ qua NaN; timestamps là thời điểm của các dòng đó."""
+        data = np.asarray(data)
+        data = data.reshape(-1, 1) if data.ndim == 1 else data
+        if not len(data):
+            return self
+        if timestamps is not None:
+            self.last_timestamp_ = int(timestamps[-1])
+        data_min, data_max = np.nanmin(data, axis=0), np.nanmax(data, axis=0)
+        if self.data_min_ is not None:
+            data_min, data_max = np.minimum(self.data_min_, data_min), np.maximum(self.data_max_, data_max)
+        self.data_min_, self.data_max_ = data_min, data_max
+        self.n_samples_seen_ += len(data)
+        self._update_scale()
+        return self
+
+    def fit(self, data, timestamps=None):
+        """Tính lại min/max từ đầu trên toàn bộ data."""
+        self.data_min_, self.data_max_, self.n_samples_seen_, self.last_timestamp_ = None, None, 0, None
+        return self.partial_fit(data, timestamps)
+
+    def new_rows(self, data, timestamps=None):
+        """
+        Các dòng của data mà scaler chưa thấy: các dòng sau last_timestamp_ khi biết thời điểm của từng dòng
+        (lịch sử có thể bị cắt đầu hoặc có khoảng trống), ngược lại các dòng sau n_samples_seen_ dòng đầu
+        (bundle cũ, giả định data là cùng lịch sử đã dùng khi fit nối thêm nến mới).
+        Returns:
+            tuple: (dòng mới, thời điểm của chúng hoặc None).
+        """
+        if timestamps is not None and self.last_timestamp_ is not None:
+            after = np.asarray(timestamps) > self.last_timestamp_
+            return data[after], timestamps[after]
+        return data[self.n_samples_seen_:], None if timestamps is None else timestamps[self.n_samples_seen_:]
+
+    def update(self, data, timestamps=None):
+        """Cập nhật bằng các dòng chưa thấy của data (new_rows), không phải quét lại toàn bộ lịch sử."""
+        return self.partial_fit(*self.new_rows(data, timestamps))
+
+    def copy(self):
+        return MinMaxState(self.data_min_.copy(), self.data_max_.copy(), self.n_samples_seen_, self.last_timestamp_)
+
+    def transform(self, data):
+        data = np.asarray(data)
+        scaled = data.reshape(-1, 1) * self.scale_ + self.min_ if data.ndim == 1 else data * self.scale_ + self.min_
+        return scaled.reshape(data.shape)
+
+    def inverse_transform(self, data):
+        data = np.asarray(data)
+        return ((data.reshape(-1, 1) if data.ndim == 1 else data) - self.min_) / self.scale_
+
+    def to_dict(self):
+        """Trạng thái dạng JSON (giá trị float32 được lưu chính xác khi đổi qua float64)."""
+        return {"dtype": str(self.data_min_.dtype), "data_min": self.data_min_.tolist(),
+                "data_max": self.data_max_.tolist(), "n_samples_seen": self.n_samples_seen_,
+                "last_timestamp": self.last_timestamp_}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(np.asarray(state["data_min"], dtype=state["dtype"]), np.asarray(state["data_max"], dtype=state["dtype"]),
+                   state["n_samples_seen"], state.get("last_timestamp"))
+
+def scale_data(data, scaler=None, update=False, timestamps=None):
+    """
+    Chuẩn hóa dữ liệu min-max, mỗi cột (đặc trưng) được chuẩn hóa riêng.
 
     Args:
-        data (np.ndarray): Dữ liệu đầu vào cần chuẩn hóa.
+        data (np.ndarray): Dữ liệu đầu vào cần chuẩn hóa, 1 chiều hoặc (N, features).
+        scaler (MinMaxState): Bộ chuẩn hóa đã lưu khi huấn luyện (bundle mô hình); None để fit mới trên data.
+        update (bool): Cập nhật min/max bằng các dòng scaler chưa thấy (MinMaxState.new_rows),
+            trên một bản sao để scaler đã lưu không đổi.
+        timestamps (np.ndarray): Thời điểm (epoch giây) của từng dòng (features.feature_timestamps), để chọn
+            dòng mới theo thời gian thay vì theo số dòng và ghi thời điểm cuối khi fit mới.
 
     Returns:
         np.ndarray: Dữ liệu đã được chuẩn hóa.
-        MinMaxScaler: Bộ chuẩn hóa đã được huấn luyện.
+        MinMaxState: Bộ chuẩn hóa đã dùng.
+    """
+    if scaler is None:
+        scaler = MinMaxState().fit(data, timestamps)
+    elif update:
+        rows, row_timestamps = scaler.new_rows(data, timestamps)
+        if len(rows):
+            scaler = scaler.copy().partial_fit(rows, row_timestamps)
+    return scaler.transform(data), scaler
+
+def inverse_transform_column(scaler, values, column):
+    """
+    Đưa giá trị đã chuẩn hóa của một cột về thang gốc (ví dụ giá dự báo của cột 'Close'),
+    giống hệt scaler.inverse_transform khi dữ liệu chỉ có một cột.
+
+    Args:
+        scaler (MinMaxState): Bộ chuẩn hóa đã được huấn luyện.
+        values (np.ndarray): Giá trị đã chuẩn hóa của cột cần đổi.
+        column (int): Chỉ số cột trong dữ liệu lúc chuẩn hóa.
+
+    Returns:
+        np.ndarray: Giá trị ở thang gốc.
     """
-    scaler = MinMaxScaler()
-    data_scaled = scaler.fit_transform(data.reshape(-1, 1)).reshape(data.shape)
-    return data_scaled, scaler
\ No newline at end of file
+    return (values - scaler.min_[column]) / scaler.scale_[column]
\ No newline at end of file
@@ -0,0 +1,29 @@
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+class SequenceDataset(Dataset):
+    """
+    Dataset sinh cửa sổ (X, y) theo yêu cầu thay vì tạo sẵn toàn bộ mảng chuỗi.
+    Chuỗi gốc chỉ được lưu một lần dưới dạng tensor float32; mỗi mẫu là một view trên chuỗi đó,
+    nên bộ nhớ không tăng theo sequence_length hay độ dài lịch sử.
+    Args:
+        data (np.ndarray): Dữ liệu đã chuẩn hóa, kích thước (N, features).
+        seq_length (int): Chiều dài của chuỗi.
+        target (int): Chỉ số cột làm nhãn (ví dụ cột 'Close'); None để lấy cả dòng như trước.
+    """
+    def __init__(self, data, seq_length, target=None):
+        self.data = torch.as_tensor(np.asarray(data), dtype=torch.float32)
+        self.seq_length = seq_length
+        self.target = target
+
+    def __len__(self):
+        return max(len(self.data) - self.seq_length, 0)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        y = self.data[idx + self.seq_length]
+        if self.target is not None:
+            y = y[self.target:self.target + 1]
+        return self.data[idx:idx + self.seq_length], y
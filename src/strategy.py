@@ -1,8 +1,7 @@
+import heapq
 import numpy as np
-import matplotlib.pyplot as plt
-import os
 import pandas as pd
-from tqdm import tqdm
+from src.config import grid_top_k, grid_memory_mb, grid_refine_step
 
 def apply_sma_strategy(data, short_window=20, long_window=100):
     """    
@@ -14,7 +13,9 @@ def apply_sma_strategy(data, short_window=20, long_window=100):
     Returns:
         pd.Series, pd.Series: Hai chuỗi dữ liệu chứa hiệu suất tích luỹ của thị trường và chiến lược SMA.
     """
-    data = data.copy()
+    # Chỉ sao chép cột 'Close' (float64) thay vì cả khung, để khung nến phút nhiều cột hoặc dạng gọn float32
+    # không bị nhân bản toàn bộ và kết quả không phụ thuộc kiểu lưu trữ
+    data = pd.DataFrame({'Close': data['Close'].to_numpy(dtype=np.float64)}, index=data.index)
     data['SMA_short'] = data['Close'].rolling(short_window).mean()
     data['SMA_long'] = data['Close'].rolling(long_window).mean()
     data.dropna(inplace=True)
@@ -29,16 +30,353 @@ def apply_sma_strategy(data, short_window=20, long_window=100):
 
     return cumulative_market, cumulative_strategy
 
-def grid_search_sma(data, short_range, long_range):
+class RollingMean:
+    """
+    Trung bình trượt cập nhật O(1) mỗi bar, tái hiện đúng phép cộng/trừ có bù sai số (Kahan)
+    mà pandas rolling().mean() dùng, nên kết quả trùng khớp từng bit với pandas.
+    Args:
+        window (int): Kỳ hạn SMA.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.neg_ct = 0
+        self.same_value_count = 0
+        self.prev_value = np.nan
+
+    def add(self, val):
+        if np.isnan(val):
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if np.signbit(val):
+            self.neg_ct += 1
+        self.same_value_count = self.same_value_count + 1 if val == self.prev_value else 1
+        self.prev_value = val
+
+    def remove(self, val):
+        if np.isnan(val):
+            return
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if np.signbit(val):
+            self.neg_ct -= 1
+
+    def mean(self):
+        if self.nobs < self.window or self.nobs == 0:
+            return np.nan
+        if self.same_value_count >= self.nobs:
+            return self.prev_value
+        result = self.sum_x / self.nobs
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+class StreamingSMAStrategy:
+    """
+    Chiến lược SMA cập nhật từng bar: giữ tổng trượt của hai kỳ hạn, tín hiệu, vị thế và
+    hiệu suất tích luỹ, phát sự kiện khi SMA ngắn cắt SMA dài. Phát lại trên toàn bộ lịch sử
+    cho kết quả trùng khớp với apply_sma_strategy.
+    Args:
+        short_window (int): Kỳ hạn SMA ngắn hạn.
+        long_window (int): Kỳ hạn SMA dài hạn.
+    """
+    def __init__(self, short_window=20, long_window=100):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.buffer_size = max(short_window, long_window)
+        self.buffer = [np.nan] * self.buffer_size
+        self.count = 0
+        self.sma_short = RollingMean(short_window)
+        self.sma_long = RollingMean(long_window)
+        self.prev_close = np.nan
+        self.signal = None
+        self.bars_traded = 0
+        self.cumulative_market = np.nan
+        self.cumulative_strategy = np.nan
+
+    def update(self, close):
+        """
+        Cập nhật chiến lược với giá đóng cửa của một bar mới.
+        Args:
+            close (float): Giá đóng cửa.
+        Returns:
+            dict: SMA, tín hiệu, vị thế, hiệu suất tích luỹ và sự kiện giao cắt ('buy', 'sell' hoặc None).
+                  Trả về None khi chưa đủ long_window bar.
+        """
+        close = float(close)
+        for window, sma in ((self.short_window, self.sma_short), (self.long_window, self.sma_long)):
+            if self.count >= window:
+                sma.remove(self.buffer[(self.count - window) % self.buffer_size])
+            sma.add(close)
+        self.buffer[self.count % self.buffer_size] = close
+        self.count += 1
+
+        sma_short, sma_long = self.sma_short.mean(), self.sma_long.mean()
+        if np.isnan(sma_short) or np.isnan(sma_long):
+            return None
+
+        position = self.signal
+        signal = 1 if sma_short > sma_long else 0
+        event = None
+        if position is None:
+            # Bar đầu tiên có đủ hai SMA: chưa có lợi nhuận, giống dòng NaN đầu tiên của apply_sma_strategy
+            market_return = np.nan
+        else:
+            market_return = close / self.prev_close - 1
+            if self.bars_traded == 0:
+                self.cumulative_market, self.cumulative_strategy = 1.0, 1.0
+            self.cumulative_market *= 1 + market_return
+            self.cumulative_strategy *= 1 + float(position) * market_return
+            self.bars_traded += 1
+            if signal != position:
+                event = "buy" if signal == 1 else "sell"
+
+        self.signal = signal
+        self.prev_close = close
+        return {
+            "sma_short": sma_short,
+            "sma_long": sma_long,
+            "signal": signal,
+            "position": position,
+            "market_return": market_return,
+            "cumulative_market": self.cumulative_market,
+            "cumulative_strategy": self.cumulative_strategy,
+            "event": event,
+        }
+
+    def replay(self, data):
+        """
+        Phát lại toàn bộ lịch sử giá qua chiến lược.
+        Args:
+            data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        Returns:
+            pd.Series, pd.Series: Hiệu suất tích luỹ của thị trường và chiến lược, giống apply_sma_strategy.
+        """
+        index, market, strategy = [], [], []
+        for date, close in zip(data.index, data['Close'].to_numpy(dtype=float)):
+            state = self.update(close)
+            if state is None:
+                continue
+            index.append(date)
+            market.append(state["cumulative_market"])
+            strategy.append(state["cumulative_strategy"])
+        index = pd.Index(index, name=data.index.name, dtype=data.index.dtype)
+        return pd.Series(market, index=index), pd.Series(strategy, index=index)
+
+def rolling_means(close, windows):
+    """
+    Tính SMA cho nhiều kỳ hạn cùng lúc từ mảng tổng tích luỹ (prefix sum).
+    Args:
+        close (np.ndarray): Chuỗi giá đóng cửa 1 chiều.
+        windows (list[int]): Danh sách kỳ hạn SMA.
+    Returns:
+        np.ndarray: Mảng (len(windows), len(close)), các vị trí chưa đủ dữ liệu là NaN.
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    prefix = np.concatenate(([0.0], np.cumsum(close)))
+    sma = np.full((len(windows), n), np.nan)
+    for k, w in enumerate(windows):
+        if w <= n:
+            sma[k, w - 1:] = (prefix[w:] - prefix[:-w]) / w
+    return sma
+
+def sma_grid_positions(close, short_range, long_range, pairs=None):
+    """
+    Vị thế từng phiên (1 khi SMA ngắn > SMA dài ở phiên trước, 0 nếu không) cho toàn bộ lưới tham số SMA.
+    Mỗi kỳ hạn SMA chỉ được tính một lần; tín hiệu và vị thế của mọi cặp được tính trên mảng 2 chiều.
+    Args:
+        close (np.ndarray): Chuỗi giá đóng cửa.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        pairs (list[tuple]): Nếu có, chỉ tính đúng các cặp (short, long) này thay cho lưới short_range x long_range.
+    Returns:
+        list[tuple], np.ndarray, np.ndarray: Các cặp (short, long) hợp lệ, mảng vị thế bool (số cặp, len(close))
+            và lợi nhuận thị trường từng phiên (phiên đầu là NaN).
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    if pairs is None:
+        pairs = [(s, l) for s in short_range for l in long_range if s < l]
+    else:
+        pairs = [(s, l) for s, l in pairs if s < l]
+
+    market_return = np.full(n, np.nan)
+    market_return[1:] = close[1:] / close[:-1] - 1
+    if not pairs:
+        return pairs, np.zeros((0, n), dtype=bool), market_return
+
+    windows = sorted({w for pair in pairs for w in pair})
+    row = {w: k for k, w in enumerate(windows)}
+    sma = rolling_means(close, windows)
+    short_idx = np.array([row[s] for s, _ in pairs])
+    long_idx = np.array([row[l] for _, l in pairs])
+
+    # Tín hiệu (cặp x thời gian) và vị thế = tín hiệu của phiên trước; vị thế 0/1 lưu dạng bool (1 byte mỗi phiên)
+    signal = sma[short_idx] > sma[long_idx]
+    position = np.zeros(signal.shape, dtype=bool)
+    position[:, 1:] = signal[:, :-1]
+    return pairs, position, market_return
+
+def sma_grid_factors(close, short_range, long_range, pairs=None):
+    """
+    Tính hệ số tăng trưởng từng phiên (1 + vị thế * lợi nhuận thị trường) cho toàn bộ lưới tham số SMA,
+    từ vị thế của sma_grid_positions.
+    Args:
+        close (np.ndarray): Chuỗi giá đóng cửa.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        pairs (list[tuple]): Nếu có, chỉ tính đúng các cặp (short, long) này thay cho lưới short_range x long_range.
+    Returns:
+        list[tuple], np.ndarray: Các cặp (short, long) hợp lệ và mảng hệ số (số cặp, len(close));
+            các phiên trước khi chiến lược có lợi nhuận mang hệ số 1.0.
+    """
+    pairs, position, market_return = sma_grid_positions(close, short_range, long_range, pairs)
+    n = len(market_return)
+    if not pairs:
+        return pairs, np.ones((0, n))
+
+    long_w = np.array([l for _, l in pairs])
+    factor = 1 + position * market_return
+    # Lợi nhuận chiến lược chỉ bắt đầu từ phiên thứ hai sau khi SMA dài có giá trị
+    factor[np.arange(n)[None, :] < long_w[:, None]] = 1.0
+    return pairs, factor
+
+def grid_search_sma_vectorized(data, short_range, long_range):
+    """
+    Grid search SMA dạng vector hoá: mỗi kỳ hạn SMA chỉ được tính một lần, tín hiệu,
+    vị thế và lợi nhuận của toàn bộ lưới tham số được tính trên mảng NumPy 2 chiều.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+    Returns:
+        pd.DataFrame: Cùng định dạng với kết quả của grid_search_sma.
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    n = len(close)
+    pairs, factor = sma_grid_factors(close, short_range, long_range)
+    if not pairs:
+        return pd.DataFrame(columns=["short_window", "long_window", "final_return"])
+
+    final_return = np.cumprod(factor, axis=1)[:, -1] if n else np.full(len(pairs), np.nan)
+    final_return[np.array([l for _, l in pairs]) >= n] = np.nan
+
+    results = pd.DataFrame(pairs, columns=["short_window", "long_window"])
+    results["final_return"] = final_return
+    return results.sort_values(by="final_return", ascending=False)
+
+def _grid_step(values):
+    """Bước nhỏ nhất giữa hai giá trị liên tiếp của một dải tham số (1 nếu dải chỉ có một giá trị)."""
+    values = sorted(set(values))
+    return min((b - a for a, b in zip(values, values[1:])), default=1)
+
+def _chunk_final_returns(close, pairs):
+    """Lợi nhuận tích luỹ cuối cùng của một khối cặp tham số, trùng khớp từng bit với grid_search_sma_vectorized."""
+    pairs, factor = sma_grid_factors(close, None, None, pairs=pairs)
+    if not pairs or not len(close):
+        return pairs, np.full(len(pairs), np.nan)
+    final_return = np.cumprod(factor, axis=1, out=factor)[:, -1].copy()
+    final_return[np.array([l for _, l in pairs]) >= len(close)] = np.nan
+    return pairs, final_return
+
+def grid_search_sma_chunked(data, short_range, long_range, top_k=grid_top_k, max_mem_mb=grid_memory_mb,
+                            refine_step=grid_refine_step):
+    """
+    Grid search SMA theo từng khối cặp tham số trong giới hạn bộ nhớ, chỉ giữ top_k kết quả tốt nhất trong một heap
+    thay vì cả bảng kết quả, nên dùng được cho lưới dày và chuỗi dài.
+    Nếu refine_step nhỏ hơn bước của lưới, sau lượt thô sẽ quét mịn với bước refine_step quanh top_k ô tốt nhất
+    (trong phạm vi một bước lưới thô mỗi phía); các vùng bị lấn át (không nằm trong top_k ô thô) được bỏ qua.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        top_k (int): Số bộ tham số tốt nhất được giữ lại.
+        max_mem_mb (float): Giới hạn bộ nhớ làm việc (MB) cho mỗi khối.
+        refine_step (int): Bước quét mịn quanh các ô tốt nhất, None để chỉ chạy lưới thô.
+    Returns:
+        pd.DataFrame: Cùng định dạng với kết quả của grid_search_sma, tối đa top_k dòng.
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    n = len(close)
+    # Mỗi cặp cần tín hiệu và mặt nạ (bool), vị thế, hệ số, mảng tạm (float64) và tối đa hai dòng SMA riêng
+    chunk_size = max(int(max_mem_mb * 2**20 // (6 * 8 * max(n, 1))), 1)
+    heap = []
+
+    def evaluate(pairs):
+        for start in range(0, len(pairs), chunk_size):
+            chunk, final_return = _chunk_final_returns(close, pairs[start:start + chunk_size])
+            valid = np.flatnonzero(~np.isnan(final_return))
+            # Chỉ đưa vào heap top_k của khối, heap giữ top_k của toàn bộ các khối đã chạy
+            if len(valid) > top_k:
+                valid = valid[np.argpartition(final_return[valid], -top_k)[-top_k:]]
+            for k in valid:
+                item = (final_return[k], chunk[k])
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+    evaluate([(s, l) for s in short_range for l in long_range if s < l])
+
+    short_step, long_step = _grid_step(short_range), _grid_step(long_range)
+    if refine_step and (refine_step < short_step or refine_step < long_step):
+        def neighbours(center, step, values):
+            # Quét mịn không vượt ra ngoài biên của dải tham số ban đầu
+            if refine_step >= step:
+                return [center]
+            return range(max(center - step + refine_step, min(values)), min(center + step, max(values) + 1), refine_step)
+
+        # Các ô lân cận có thể chồng lên nhau hoặc trùng lưới thô, mỗi cặp chỉ được tính một lần
+        coarse_short, coarse_long = set(short_range), set(long_range)
+        fine = {(fs, fl) for _, (s, l) in heap
+                for fs in neighbours(s, short_step, coarse_short) for fl in neighbours(l, long_step, coarse_long)
+                if fs < fl and not (fs in coarse_short and fl in coarse_long)}
+        evaluate(sorted(fine))
+
+    ranked = sorted(heap, reverse=True)
+    return pd.DataFrame({"short_window": [s for _, (s, _) in ranked],
+                         "long_window": [l for _, (_, l) in ranked],
+                         "final_return": [r for r, _ in ranked]},
+                        columns=["short_window", "long_window", "final_return"])
+
+def grid_search_sma(data, short_range, long_range, method="vectorized"):
     """    
     Thực hiện tìm kiếm lưới (grid search) để tìm bộ tham số SMA tối ưu
     Args:
         data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
         short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
         long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        method (str): 'vectorized' dùng grid_search_sma_vectorized, 'chunked' dùng grid_search_sma_chunked (top-K theo khối,
+            quét mịn quanh các ô tốt nhất), 'loop' tính lại DataFrame cho từng cặp.
     Returns:
         pd.DataFrame: DataFrame chứa kết quả tìm kiếm lưới với các cột 'short_window', 'long_window', và 'final_return'.
     """
+    if method == "vectorized":
+        # Lưới đầy đủ giữ khoảng 3 ma trận (số cặp x số phiên); với chuỗi dài (nến phút) vượt grid_memory_mb thì
+        # tính theo khối và giữ mọi cặp, cho cùng thứ hạng mà không cần cả ma trận
+        pairs = sum(1 for s in short_range for l in long_range if s < l)
+        if 3 * 8 * pairs * len(data) > grid_memory_mb * 2**20:
+            return grid_search_sma_chunked(data, short_range, long_range, top_k=max(pairs, 1), refine_step=None)
+        return grid_search_sma_vectorized(data, short_range, long_range)
+    elif method == "chunked":
+        return grid_search_sma_chunked(data, short_range, long_range)
+    elif method != "loop":
+        raise ValueError("Phương thức grid search không hợp lệ. Chỉ hỗ trợ 'vectorized', 'chunked' hoặc 'loop'.")
+    from tqdm import tqdm
+
     results = []
     for short_w in tqdm(short_range):
         for long_w in long_range:
@@ -55,7 +393,8 @@ def grid_search_sma(data, short_range, long_range):
             df['Strategy_Return'] = df['Position'] * df['Market_Return']
             cumulative_return = (1 + df['Strategy_Return']).cumprod()
 
-            final_return = cumulative_return.iloc[-1]
+            # Chuỗi ngắn hơn kỳ hạn dài không còn dòng nào, giống NaN của grid_search_sma_vectorized
+            final_return = cumulative_return.iloc[-1] if len(cumulative_return) else np.nan
             results.append({"short_window": short_w, "long_window": long_w, "final_return": final_return})
     return pd.DataFrame(results).sort_values(by="final_return", ascending=False)
 
@@ -63,6 +402,7 @@ if __name__ == "__main__":
     import argparse
     import src.config as config
     from src.data_loader import load_data
+    from src.profiling import Profiler, add_profile_arguments
 
     # print("Danh sách ticker gợi ý:")
     # print(", ".join(suggested_tickers))
@@ -81,22 +421,32 @@ if __name__ == "__main__":
                         help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
     parser.add_argument('--short_range', type=int, nargs='+', default=config.short_range, help='Khoảng giá trị cho kỳ hạn SMA ngắn hạn')
     parser.add_argument('--long_range', type=int, nargs='+', default=config.long_range, help='Khoảng giá trị cho kỳ hạn SMA dài hạn')
+    parser.add_argument('--method', type=str, choices=['vectorized', 'chunked', 'loop'], default=config.grid_search_method,
+                        help='vectorized: tính toàn bộ lưới bằng NumPy, chunked: tính theo khối và giữ top-K, loop: tính từng cặp tham số')
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    profiler = Profiler("strategy", enabled=args.profile, cprofile_stage=args.profile_stage)
 
     # Cập nhật config bằng giá trị truyền vào
     config.ticker = args.ticker
     config.data_source = 'https://stooq.com' if args.data_source == 'Y' else 'local'
     config.short_range = args.short_range
     config.long_range = args.long_range
+    config.grid_search_method = args.method
 
     print(f"Đang chạy với ticker: {config.ticker}, Nguồn dữ liệu: {config.data_source}, Kỳ hạn SMA ngắn hạn: {config.short_range}, Kỳ hạn SMA dài hạn: {config.long_range}")
 
-    data = load_data(config.ticker, config.data_source)
+    with profiler.stage("load") as record:
+        data = load_data(config.ticker, config.data_source)
+        record["rows"] = len(data)
 
     # Grid Search tìm bộ tham số SMA tối ưu
-    sma_param_results = grid_search_sma(data, config.short_range, config.long_range)
+    with profiler.stage("grid_search") as record:
+        sma_param_results = grid_search_sma(data, config.short_range, config.long_range, method=config.grid_search_method)
+        record["rows"] = len(data)
     print(sma_param_results.head())
 
     # In ra bộ tham số tốt nhất
     best = sma_param_results.iloc[0]
-    print(f"Bộ tham số tốt nhất: SMA ngắn hạn = {best['short_window']}, SMA dài hạn = {best['long_window']}, Lợi nhuận cuối cùng = {best['final_return']:.4f}")
\ No newline at end of file
+    print(f"Bộ tham số tốt nhất: SMA ngắn hạn = {best['short_window']}, SMA dài hạn = {best['long_window']}, Lợi nhuận cuối cùng = {best['final_return']:.4f}")
+    profiler.finish(args.profile_format)
\ No newline at end of file
@@ -1,36 +1,162 @@
+import time
 import torch
 import torch.optim as optim
 import torch.nn as nn
 import os
+from torch.utils.data import DataLoader, Dataset, TensorDataset
 from tqdm import trange, tqdm
-from src.config import model_path
+from src.config import model_path, full_batch_max_windows, large_batch_size
+from src.features import save_model_bundle
 
-def train_model(model, X, y, num_epochs=100, lr=0.001):
+def configure_threads(num_threads=None, num_interop_threads=None):
+    """
+    Cấu hình số luồng CPU của PyTorch.
+    Args:
+        num_threads (int): Số luồng intra-op (song song bên trong một phép toán).
+        num_interop_threads (int): Số luồng inter-op (song song giữa các phép toán).
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            # PyTorch chỉ cho đặt inter-op một lần, trước khi có phép toán song song nào chạy
+            tqdm.write("Không thể đổi số luồng inter-op sau khi PyTorch đã khởi chạy, giữ nguyên giá trị hiện tại.")
+
+def resolve_batch_size(batch_size, num_windows, max_windows=full_batch_max_windows):
+    """
+    Kích thước mini-batch thực sự dùng. Full-batch (None) giữ activation của mọi cửa sổ cùng lúc khi lan truyền ngược,
+    nên với lịch sử dài (nến phút) vượt max_windows cửa sổ thì chuyển sang mini-batch large_batch_size.
+    """
+    if batch_size is None and num_windows > max_windows:
+        tqdm.write(f"{num_windows} cửa sổ vượt giới hạn full-batch {max_windows}, chuyển sang mini-batch {large_batch_size}.")
+        return large_batch_size
+    return batch_size
+
+def save_checkpoint(path, model, optimizer, epoch, history, best_val_loss=None, best_state=None):
+    """Lưu trạng thái huấn luyện (mô hình, optimizer, epoch, lịch sử) để có thể tiếp tục khi bị gián đoạn."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    torch.save({
+        "epoch": epoch,
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "history": history,
+        "best_val_loss": best_val_loss,
+        "best_state": best_state,
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path, model, optimizer):
+    """Nạp checkpoint vào model và optimizer. Trả về dict checkpoint (epoch đã xong, lịch sử, ...)."""
+    checkpoint = torch.load(path)
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    return checkpoint
+
+def _batches(X, y, batch_size, shuffle, num_workers):
+    """Danh sách (X, y) full-batch, hoặc DataLoader mini-batch trên tensor/Dataset."""
+    if batch_size is None:
+        if isinstance(X, Dataset):
+            raise ValueError("Huấn luyện từ Dataset cần chỉ định batch_size.")
+        return [(X, y)]
+    dataset = X if isinstance(X, Dataset) else TensorDataset(X, y)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle,
+                      num_workers=num_workers, persistent_workers=num_workers > 0)
+
+def train_model(model, X, y=None, num_epochs=100, lr=0.001, batch_size=None, shuffle=True, num_workers=0,
+                validation=None, patience=None, checkpoint_path=None, checkpoint_every=0, verbose=True):
     """    
     Huấn luyện mô hình RNN + LSTM với dữ liệu đầu vào.
     Args:
         model (torch.nn.Module): Mô hình RNN + LSTM đã được định nghĩa.
-        X (torch.Tensor): Dữ liệu đầu vào đã được tạo chuỗi.
+        X (torch.Tensor | Dataset): Dữ liệu đầu vào đã được tạo chuỗi, hoặc một Dataset trả về (X, y)
+            như SequenceDataset (chỉ dùng với batch_size).
         y (torch.Tensor): Giá trị mục tiêu tương ứng với X.
         num_epochs (int): Số lượng epoch để huấn luyện mô hình.
         lr (float): Tốc độ học của bộ tối ưu hóa.
+        batch_size (int): Kích thước mini-batch; None để huấn luyện full-batch như trước.
+        shuffle (bool): Xáo trộn mẫu mỗi epoch (chỉ với mini-batch).
+        num_workers (int): Số tiến trình DataLoader (chỉ với mini-batch).
+        validation (tuple | Dataset): Dữ liệu kiểm định (X_val, y_val) hoặc Dataset; tính val_loss mỗi epoch.
+        patience (int): Dừng sớm sau patience epoch val_loss không cải thiện, rồi khôi phục trọng số tốt nhất.
+        checkpoint_path (str): File checkpoint; nếu đã tồn tại thì tiếp tục huấn luyện từ đó.
+        checkpoint_every (int): Lưu checkpoint sau mỗi checkpoint_every epoch (0 để không lưu).
+        verbose (bool): Hiển thị thanh tiến trình và loss.
+    Returns:
+        list[dict]: Loss (và val_loss nếu có) cùng thông lượng (mẫu/giây) của từng epoch.
     """
     criterion = nn.MSELoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
 
-    for epoch in trange(num_epochs, desc="Training", unit="epoch"):
-        outputs = model(X)
-        loss = criterion(outputs, y)
+    batches = _batches(X, y, batch_size, shuffle, num_workers)
+    if validation is not None:
+        val_X, val_y = (validation, None) if isinstance(validation, Dataset) else validation
+        val_batches = _batches(val_X, val_y, batch_size, False, 0)
+
+    history, start_epoch, best_val_loss, best_state, best_epoch = [], 0, float("inf"), None, 0
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path, model, optimizer)
+        history, start_epoch = checkpoint["history"], checkpoint["epoch"]
+        if checkpoint["best_val_loss"] is not None:
+            best_val_loss, best_state = checkpoint["best_val_loss"], checkpoint["best_state"]
+            best_epoch = next(r["epoch"] for r in history if r.get("val_loss") == best_val_loss)
+        if verbose:
+            tqdm.write(f"Tiếp tục huấn luyện từ checkpoint {checkpoint_path} (epoch {start_epoch})")
+
+    progress = trange(start_epoch, num_epochs, desc="Training", unit="epoch", disable=not verbose)
+    for epoch in progress:
+        start = time.perf_counter()
+        total_loss, num_samples = 0.0, 0
+        for X_batch, y_batch in batches:
+            outputs = model(X_batch)
+            loss = criterion(outputs, y_batch)
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            total_loss += loss.item() * len(X_batch)
+            num_samples += len(X_batch)
 
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
+        epoch_loss = total_loss / max(num_samples, 1)
+        samples_per_sec = num_samples / (time.perf_counter() - start)
+        record = {"epoch": epoch + 1, "loss": epoch_loss, "samples_per_sec": samples_per_sec}
 
-        if (epoch+1) % 20 == 0  or epoch == 0 or epoch == num_epochs-1:
-            tqdm.write(f"Epoch [{epoch+1 if epoch > 0 else 0}/{num_epochs}], Loss: {loss.item():.4f}")
+        if validation is not None:
+            val_loss, val_samples = 0.0, 0
+            with torch.inference_mode():
+                for X_batch, y_batch in val_batches:
+                    val_loss += criterion(model(X_batch), y_batch).item() * len(X_batch)
+                    val_samples += len(X_batch)
+            record["val_loss"] = val_loss / max(val_samples, 1)
+            if record["val_loss"] < best_val_loss:
+                best_val_loss, best_epoch = record["val_loss"], epoch + 1
+                best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        history.append(record)
+        progress.set_postfix(loss=f"{epoch_loss:.4f}", samples_per_sec=f"{samples_per_sec:.0f}")
 
+        if verbose and ((epoch+1) % 20 == 0  or epoch == 0 or epoch == num_epochs-1):
+            tqdm.write(f"Epoch [{epoch+1 if epoch > 0 else 0}/{num_epochs}], Loss: {epoch_loss:.4f}, "
+                       f"Throughput: {samples_per_sec:.0f} samples/s")
 
-def train_and_save(model, X, y, save_path=model_path, num_epochs=100, lr=0.001):
+        if checkpoint_path and checkpoint_every and (epoch + 1) % checkpoint_every == 0:
+            save_checkpoint(checkpoint_path, model, optimizer, epoch + 1, history,
+                            best_val_loss if best_state is not None else None, best_state)
+
+        if patience and best_state is not None and epoch + 1 - best_epoch >= patience:
+            if verbose:
+                tqdm.write(f"Dừng sớm tại epoch {epoch + 1}, val_loss tốt nhất: {best_val_loss:.4f}")
+            break
+
+    if patience and best_state is not None:
+        model.load_state_dict(best_state)
+    return history
+
+
+def train_and_save(model, X, y=None, save_path=model_path, num_epochs=100, lr=0.001, columns=None, scaler=None,
+                   **train_kwargs):
     """    
     Huấn luyện mô hình RNN + LSTM và lưu mô hình đã huấn luyện vào file.
     Args:
@@ -40,24 +166,33 @@ def train_and_save(model, X, y, save_path=model_path, num_epochs=100, lr=0.001):
         save_path (str): Đường dẫn để lưu mô hình đã huấn luyện.
         num_epochs (int): Số lượng epoch để huấn luyện mô hình.
         lr (float): Tốc độ học của bộ tối ưu hóa.
+        columns (list[str]): Danh sách đặc trưng đầu vào, được ghi vào bundle cạnh file mô hình để dùng lại khi dự báo.
+        scaler (MinMaxState): Bộ chuẩn hóa đã fit trên dữ liệu huấn luyện, ghi cùng bundle.
+        **train_kwargs: Tham số mini-batch truyền cho train_model (batch_size, shuffle, num_workers).
     Returns:
         model (torch.nn.Module): Mô hình RNN + LSTM đã được huấn luyện.
     """
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    train_model(model, X, y, num_epochs=num_epochs, lr=lr)
+    train_model(model, X, y, num_epochs=num_epochs, lr=lr, **train_kwargs)
     torch.save(model.state_dict(), save_path)
+    if columns is not None:
+        save_model_bundle(save_path, columns, scaler, sequence_length=getattr(X, "seq_length", None) or X.shape[1])
 
     return model
 
 if __name__ == "__main__":
     import argparse
+    import numpy as np
     import src.config as config
     from src.data_loader import load_data
     from src.model import RNN_LSTMModel
     from src.create_sequences import create_sequences
+    from src.sequence_dataset import SequenceDataset
     from src.scaling_data import scale_data
+    from src.features import build_features, feature_timestamps, target_index
     from src.config import default_ticker, suggested_tickers, sequence_length, model_path, pic_path
     from src.visualization import plot_stock_price_lstm
+    from src.profiling import Profiler, add_profile_arguments
 
     # Thiết lập parser cho các tham số dòng lệnh
     parser = argparse.ArgumentParser(description="Stock Price Prediction Config")
@@ -66,13 +201,24 @@ if __name__ == "__main__":
     parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
                         help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
     parser.add_argument('--sequence_length', type=int, default=config.sequence_length, help='Chiều dài chuỗi LSTM')
+    parser.add_argument('--features', type=str, nargs='+', default=config.feature_columns,
+                        help='Đặc trưng đầu vào: Open High Low Close Volume Return Volatility SMA_Spread')
+    parser.add_argument('--batch_size', type=int, default=config.batch_size, help='Kích thước mini-batch, bỏ trống để huấn luyện full-batch')
+    parser.add_argument('--compact', action='store_true', help='Nạp dữ liệu dạng gọn (float32) cho lịch sử nến phút dài')
+    parser.add_argument('--no_shuffle', action='store_true', help='Không xáo trộn mẫu giữa các epoch')
+    parser.add_argument('--num_workers', type=int, default=config.num_workers, help='Số tiến trình DataLoader')
+    parser.add_argument('--threads', type=int, default=config.num_threads, help='Số luồng intra-op của PyTorch')
+    parser.add_argument('--interop_threads', type=int, default=config.num_interop_threads, help='Số luồng inter-op của PyTorch')
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
+    profiler = Profiler("train", enabled=args.profile, cprofile_stage=args.profile_stage)
 
     # Cập nhật config bằng giá trị truyền vào
     config.ticker = args.ticker
     config.data_source = 'https://stooq.com' if args.data_source == 'Y' else 'local'
     config.sequence_length = args.sequence_length
+    configure_threads(args.threads, args.interop_threads)
 
     print(f"Đang chạy với ticker: {config.ticker}, Nguồn dữ liệu: {config.data_source}, Chiều dài chuỗi: {config.sequence_length}")
 
@@ -87,21 +233,38 @@ if __name__ == "__main__":
     # ' N nếu muốn train bằng dữ liệu từ file đã lưu.')
     # data_source = input("Nhập Y hoặc N: ").strip().upper()
     # data_source = 'https://stooq.com' if data_source == 'Y' else 'local'
-    data = load_data(config.ticker, config.data_source)
-    features = data[['Close']].values
-    scaled_features, scaler = scale_data(features)
-    X, y = create_sequences(scaled_features, config.sequence_length)
-    X = torch.from_numpy(X).float()
-    y = torch.from_numpy(y).float()
+    with profiler.stage("load") as record:
+        data = load_data(config.ticker, config.data_source, compact=args.compact)
+        record["rows"] = len(data)
+
+    with profiler.stage("preprocess") as record:
+        features = build_features(data, args.features, dtype=np.float32 if args.compact else np.float64)
+        scaled_features, scaler = scale_data(features, timestamps=feature_timestamps(data, features))
+        target = target_index(args.features)
+        args.batch_size = resolve_batch_size(args.batch_size, len(features) - config.sequence_length)
+        if args.batch_size:
+            # Mini-batch: sinh cửa sổ theo yêu cầu, không tạo sẵn toàn bộ X
+            X, y = SequenceDataset(scaled_features, config.sequence_length, target=target), None
+        else:
+            X, y = create_sequences(scaled_features, config.sequence_length)
+            X = torch.tensor(X, dtype=torch.float32)
+            y = torch.tensor(y[:, target:target + 1], dtype=torch.float32)
+        record["rows"] = len(X)
 
     # Khởi tạo mô hình và huấn luyện
-    model = RNN_LSTMModel()
-    save_path = f'{config.model_path}/model_{config.ticker.lower()}.pth'
-    train_and_save(model, X, y, save_path)
+    model = RNN_LSTMModel(input_size=len(args.features))
+    save_path = config.model_file_for(config.ticker, config.model_path)
+    with profiler.stage("train") as record:
+        train_and_save(model, X, y, save_path, columns=args.features, scaler=scaler, batch_size=args.batch_size,
+                       shuffle=not args.no_shuffle, num_workers=args.num_workers)
+        record["rows"] = len(X)
 
     # Thông báo hoàn thành
     print(f"Huấn luyện mô hình hoàn tất và đã lưu tại {save_path}")
     print("Bạn có thể sử dụng mô hình này để dự báo giá trong tương lai.")
 
     # Vẽ biểu đồ giá thực tế và giá dự báo từ mô hình RNN+LSTM
-    plot_stock_price_lstm(data, config.ticker, save_path=f"{pic_path}/{config.ticker}/rnn_lstm_prediction_{config.ticker}.png")
\ No newline at end of file
+    with profiler.stage("plot_lstm") as record:
+        plot_stock_price_lstm(data, config.ticker, save_path=f"{pic_path}/{config.ticker}/rnn_lstm_prediction_{config.ticker}.png")
+        record["rows"] = len(data)
+    profiler.finish(args.profile_format)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+import numpy as np
+import torch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from torch.utils.data import Subset
+from src.config import model_path, checkpoint_path, sequence_length, feature_columns, model_file_for
+from src.batch_backtest import resolve_tickers
+from src.data_loader import load_data
+from src.features import build_features, feature_timestamps, save_model_bundle, target_index
+from src.model import RNN_LSTMModel
+from src.scaling_data import MinMaxState, scale_data
+from src.sequence_dataset import SequenceDataset
+from src.train import configure_threads, resolve_batch_size, train_model
+
+def split_cores(workers, cores=None):
+    """Chia đều danh sách core CPU cho các worker (mỗi worker ít nhất một core)."""
+    cores = sorted(cores if cores is not None else _available_cores())
+    per_worker = max(len(cores) // workers, 1)
+    return [cores[(i * per_worker) % len(cores):(i * per_worker) % len(cores) + per_worker] for i in range(workers)]
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return os.sched_getaffinity(0)
+    return range(os.cpu_count() or 1)
+
+def _init_worker(core_queue):
+    """Gắn tiến trình worker với phần core của nó và đặt số luồng PyTorch tương ứng."""
+    cores = core_queue.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    configure_threads(len(cores), 1)
+
+def train_ticker(ticker, data_source="local", num_epochs=100, lr=0.001, batch_size=None, val_fraction=0.1,
+                 patience=None, checkpoint_every=0, model_dir=model_path, checkpoint_dir=checkpoint_path,
+                 seq_length=sequence_length, columns=feature_columns, compact=False):
+    """
+    Huấn luyện mô hình RNN + LSTM cho một ticker với tập kiểm định là phần cuối (theo thời gian) của dữ liệu.
+    Checkpoint được lưu mỗi checkpoint_every epoch và bị xoá khi huấn luyện xong; nếu lần chạy trước bị
+    gián đoạn, huấn luyện tiếp tục từ checkpoint còn lại.
+    Args:
+        ticker (str): Mã chứng khoán.
+        data_source (str): 'https://stooq.com' hoặc 'local'.
+        num_epochs (int): Số epoch tối đa.
+        lr (float): Tốc độ học.
+        batch_size (int): Kích thước mini-batch, None để huấn luyện full-batch.
+        val_fraction (float): Tỷ lệ cửa sổ cuối cùng dùng để kiểm định (0 để không kiểm định).
+        patience (int): Số epoch chờ trước khi dừng sớm.
+        checkpoint_every (int): Chu kỳ lưu checkpoint (epoch).
+        model_dir (str): Thư mục lưu file mô hình (config.model_file_for).
+        checkpoint_dir (str): Thư mục lưu checkpoint.
+        seq_length (int): Chiều dài chuỗi.
+        columns (list[str]): Danh sách đặc trưng đầu vào (xem features.build_features).
+        compact (bool): Nạp dữ liệu dạng gọn và tạo đặc trưng float32 (lịch sử nến phút dài).
+    Returns:
+        dict: Một dòng manifest: thời gian, thông lượng, loss cuối và đường dẫn mô hình.
+    """
+    start = time.perf_counter()
+    data = load_data(ticker, data_source, compact=compact)
+    features = build_features(data, columns, dtype=np.float32 if compact else np.float64)
+    num_windows = max(len(features) - seq_length, 0)
+    num_val = int(num_windows * val_fraction)
+    # Scaler chỉ fit trên các phiên mà cửa sổ huấn luyện (kể cả giá mục tiêu) dùng tới, không nhìn trước tập kiểm định
+    fit_rows = num_windows - num_val + seq_length
+    scaler = MinMaxState().fit(features[:fit_rows], feature_timestamps(data, features)[:fit_rows])
+    scaled_features, _ = scale_data(features, scaler)
+    dataset = SequenceDataset(scaled_features, seq_length, target=target_index(columns))
+    batch_size = resolve_batch_size(batch_size, len(dataset))
+    train_set = Subset(dataset, range(len(dataset) - num_val))
+    val_set = Subset(dataset, range(len(dataset) - num_val, len(dataset))) if num_val else None
+    if batch_size is None:
+        # Full-batch: gom các cửa sổ thành tensor một lần
+        train_set = _stack(train_set)
+        val_set = _stack(val_set) if val_set is not None else None
+    X, y = train_set if batch_size is None else (train_set, None)
+
+    model = RNN_LSTMModel(input_size=len(columns))
+    ckpt_file = f"{checkpoint_dir}/{ticker.lower()}.ckpt"
+    history = train_model(model, X, y, num_epochs=num_epochs, lr=lr, batch_size=batch_size,
+                          validation=val_set, patience=patience, checkpoint_path=ckpt_file,
+                          checkpoint_every=checkpoint_every, verbose=False)
+
+    save_path = model_file_for(ticker, model_dir)
+    os.makedirs(model_dir, exist_ok=True)
+    torch.save(model.state_dict(), save_path)
+    save_model_bundle(save_path, columns, scaler, sequence_length=seq_length)
+    if os.path.exists(ckpt_file):
+        os.remove(ckpt_file)
+
+    train_seconds = time.perf_counter() - start
+    val_losses = [r["val_loss"] for r in history if "val_loss" in r]
+    return {
+        "ticker": ticker,
+        "rows": len(data),
+        "train_samples": len(train_set) if batch_size else len(X),
+        "val_samples": num_val,
+        "epochs_run": len(history),
+        "stopped_early": len(history) < num_epochs,
+        "final_loss": history[-1]["loss"] if history else None,
+        "best_val_loss": min(val_losses) if val_losses else None,
+        "train_seconds": train_seconds,
+        # Thông lượng trung bình của các epoch (không tính thời gian nạp dữ liệu)
+        "samples_per_sec": sum(r["samples_per_sec"] for r in history) / len(history) if history else None,
+        "model_file": save_path,
+    }
+
+def _stack(subset):
+    """Gom các mẫu (X, y) của một Subset thành hai tensor."""
+    X, y = zip(*(subset[i] for i in range(len(subset))))
+    return torch.stack(X), torch.stack(y)
+
+def train_universe(tickers, workers=None, manifest_path=None, **train_kwargs):
+    """
+    Huấn luyện song song nhiều ticker trên process pool; mỗi worker được gắn với phần core riêng
+    và đặt số luồng PyTorch bằng số core đó để các worker không tranh chấp CPU.
+    Args:
+        tickers (list[str]): Danh sách mã chứng khoán.
+        workers (int): Số tiến trình, mặc định min(số ticker, số core).
+        manifest_path (str): File JSON ghi manifest, mặc định {model_path}/manifest.json.
+        **train_kwargs: Tham số truyền cho train_ticker.
+    Returns:
+        list[dict]: Manifest theo từng ticker (có trường 'error' nếu huấn luyện thất bại).
+    """
+    workers = workers or max(min(len(tickers), len(_available_cores())), 1)
+    context = get_context("spawn")
+    core_queue = context.Queue()
+    for cores in split_cores(workers):
+        core_queue.put(cores)
+
+    manifest = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(core_queue,)) as pool:
+        futures = {pool.submit(train_ticker, ticker, **train_kwargs): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {"ticker": futures[future], "error": str(e)}
+            print(json.dumps(entry, ensure_ascii=False))
+            manifest.append(entry)
+
+    manifest_path = manifest_path or f"{train_kwargs.get('model_dir', model_path)}/manifest.json"
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "workers": workers, "models": manifest},
+                  f, indent=2, ensure_ascii=False)
+    return manifest
+
+if __name__ == "__main__":
+    import argparse
+    import src.config as config
+
+    parser = argparse.ArgumentParser(description="Parallel Model Training Farm")
+    parser.add_argument('--tickers', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--pattern', type=str, default=None, help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--workers', type=int, default=config.farm_workers, help='Số tiến trình huấn luyện song song')
+    parser.add_argument('--epochs', type=int, default=100, help='Số epoch tối đa')
+    parser.add_argument('--batch_size', type=int, default=config.batch_size, help='Kích thước mini-batch')
+    parser.add_argument('--val_fraction', type=float, default=config.val_fraction, help='Tỷ lệ dữ liệu cuối dùng để kiểm định')
+    parser.add_argument('--patience', type=int, default=config.patience, help='Số epoch chờ trước khi dừng sớm')
+    parser.add_argument('--checkpoint_every', type=int, default=config.checkpoint_every, help='Chu kỳ lưu checkpoint (epoch)')
+    parser.add_argument('--features', type=str, nargs='+', default=config.feature_columns, help='Danh sách đặc trưng đầu vào')
+    parser.add_argument('--manifest', type=str, default=None, help='Đường dẫn file manifest JSON')
+    parser.add_argument('--compact', action='store_true', help='Nạp dữ liệu dạng gọn (float32) cho lịch sử nến phút dài')
+    args = parser.parse_args()
+
+    tickers = resolve_tickers(args.tickers, args.pattern)
+    if not tickers:
+        tickers = resolve_tickers(pattern="data/*.csv")
+    print(f"Đang huấn luyện {len(tickers)} ticker: {', '.join(tickers)}")
+    manifest = train_universe(tickers, workers=args.workers, manifest_path=args.manifest,
+                              data_source='https://stooq.com' if args.data_source == 'Y' else 'local',
+                              num_epochs=args.epochs, batch_size=args.batch_size, val_fraction=args.val_fraction,
+                              patience=args.patience, checkpoint_every=args.checkpoint_every, columns=args.features,
+                              compact=args.compact)
+    failed = [entry["ticker"] for entry in manifest if "error" in entry]
+    print(f"Đã huấn luyện {len(manifest) - len(failed)}/{len(manifest)} ticker" + (f", lỗi: {', '.join(failed)}" if failed else ""))
\ No newline at end of file
@@ -1,16 +1,208 @@
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import hashlib
+import os
 import numpy as np
 import pandas as pd
-import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import pic_path, model_path, chart_dpi
+from src.config import model_file_for
+from src.features import load_model_sequence_length
+from src.intraday import epoch_seconds
+
+# Tăng khi đổi cách vẽ để các biểu đồ cũ được vẽ lại dù dữ liệu không đổi
+RENDER_VERSION = 1
+
+def chart_dates(data):
+    """
+    Trục thời gian của khung giá: cột 'Timestamp' (dạng gọn của load_data(..., compact=True)),
+    cột 'Date' (kèm 'Time' với dữ liệu trong ngày) hoặc index.
+    Returns:
+        np.ndarray: Mảng datetime64.
+    """
+    if "Timestamp" in data.columns or "Date" in data.columns:
+        return epoch_seconds(data).astype("datetime64[s]")
+    return data.index.to_numpy()
+
+def sma_chart_series(data, short_window, long_window):
+    """
+    Tính một lần các chuỗi cần cho hai biểu đồ SMA (hiệu suất tích luỹ và tỷ suất từng ngày).
+    Kết quả tích luỹ trùng với apply_sma_strategy, tỷ suất từng ngày trùng với cách tính cũ của plot_daily_return_sma.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        short_window (int): Kỳ ngắn hạn của SMA.
+        long_window (int): Kỳ dài hạn của SMA.
+    Returns:
+        dict: 'index', 'market_return', 'strategy_return', 'cumulative_market', 'cumulative_strategy' (mảng numpy).
+    """
+    close = data['Close']
+    sma_short = close.rolling(short_window).mean()
+    sma_long = close.rolling(long_window).mean()
+    valid = (sma_short.notna() & sma_long.notna()).to_numpy()
 
-import torch
-from src.config import pic_path, model_path
-from src.create_sequences import create_sequences
-from src.model import LSTMModel, RNN_LSTMModel
-from src.scaling_data import scale_data
-from src.strategy import apply_sma_strategy
-from src.config import sequence_length
+    market_return = close.pct_change().to_numpy()[valid]
+    position = np.where(sma_short.to_numpy()[valid] > sma_long.to_numpy()[valid], 1.0, 0.0)
+    position = np.concatenate(([np.nan], position[:-1]))
+    strategy_return = position * market_return
+
+    # apply_sma_strategy tính lợi nhuận sau khi bỏ các dòng NaN, nên phiên đầu tiên không có lợi nhuận
+    first_missing = market_return.copy()
+    first_missing[:1] = np.nan
+    return {
+        "index": chart_dates(data)[valid],
+        "market_return": market_return,
+        "strategy_return": strategy_return,
+        "cumulative_market": pd.Series(1 + first_missing).cumprod().to_numpy(),
+        "cumulative_strategy": pd.Series(1 + position * first_missing).cumprod().to_numpy(),
+    }
+
+def decimate(x, y, width):
+    """
+    Giảm số điểm của một chuỗi dài xuống cỡ độ rộng ảnh (pixel) mà vẫn giữ nguyên hình dạng đường:
+    mỗi nhóm điểm ứng với một cột pixel chỉ giữ điểm thấp nhất và cao nhất, cùng điểm đầu và cuối.
+    Args:
+        x (np.ndarray): Trục hoành.
+        y (np.ndarray): Giá trị.
+        width (int): Số cột pixel của vùng vẽ.
+    Returns:
+        np.ndarray, np.ndarray: x và y sau khi giảm (giữ nguyên nếu chuỗi đã đủ ngắn).
+    """
+    n = len(y)
+    if n <= 2 * width:
+        return x, y
+    size = -(-n // width)
+    m = n // size * size
+    blocks = np.asarray(y[:m], dtype=float).reshape(-1, size)
+    missing = np.isnan(blocks)
+    offsets = np.arange(0, m, size)
+    keep = np.unique(np.concatenate((
+        offsets + np.where(missing, np.inf, blocks).argmin(axis=1),
+        offsets + np.where(missing, -np.inf, blocks).argmax(axis=1),
+        np.arange(m, n), [0, n - 1],
+    )))
+    return x[keep], y[keep]
+
+def chart_spec(save_path, title, lines, figsize=(12, 6), grid=False, date_axis=False):
+    """
+    Mô tả một biểu đồ từ các chuỗi đã tính sẵn; các đường được giảm điểm theo độ rộng ảnh ngay khi tạo
+    để việc truyền sang tiến trình vẽ và việc băm kiểm tra thay đổi đều nhẹ.
+    Args:
+        save_path (str): Đường dẫn lưu biểu đồ.
+        title (str): Tiêu đề.
+        lines (list[tuple]): Các bộ (x, y, nhãn, alpha) của từng đường.
+        figsize (tuple): Kích thước hình (inch).
+        grid (bool): Hiển thị lưới.
+        date_axis (bool): Trục hoành là ngày (định dạng theo mốc 5 năm).
+    Returns:
+        dict: Mô tả biểu đồ, kèm 'digest' là mã băm của toàn bộ đầu vào.
+    """
+    width = int(figsize[0] * chart_dpi)
+    lines = [decimate(np.asarray(x), np.asarray(y), width) + (label, alpha) for x, y, label, alpha in lines]
+
+    digest = hashlib.sha1(repr((RENDER_VERSION, title, figsize, chart_dpi, grid, date_axis)).encode())
+    for x, y, label, alpha in lines:
+        digest.update(repr((label, alpha, x.dtype.str, y.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(x).tobytes())
+        digest.update(np.ascontiguousarray(y).tobytes())
+    return {"save_path": save_path, "title": title, "lines": lines, "figsize": figsize,
+            "grid": grid, "date_axis": date_axis, "digest": digest.hexdigest()}
+
+def is_chart_current(spec):
+    """True nếu file ảnh đã tồn tại và được vẽ từ đúng đầu vào này (mã băm lưu trong metadata PNG)."""
+    from PIL import Image
+    try:
+        with Image.open(spec["save_path"]) as image:
+            return image.info.get("InputDigest") == spec["digest"]
+    except OSError:
+        return False
+
+def render_chart(spec, force=False):
+    """
+    Vẽ một biểu đồ off-screen bằng Figure hướng đối tượng trên canvas Agg (không dùng trạng thái toàn cục của pyplot,
+    nên an toàn khi chạy song song). Bỏ qua nếu ảnh hiện có đã được vẽ từ cùng đầu vào.
+    Args:
+        spec (dict): Mô tả biểu đồ từ chart_spec.
+        force (bool): Vẽ lại kể cả khi đầu vào không đổi.
+    Returns:
+        bool: True nếu đã vẽ, False nếu bỏ qua.
+    """
+    if not force and is_chart_current(spec):
+        return False
+
+    # matplotlib chỉ được nạp khi thực sự vẽ, mô tả biểu đồ (chart_spec) không cần tới
+    import matplotlib.dates as mdates
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec["figsize"], dpi=chart_dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for x, y, label, alpha in spec["lines"]:
+        ax.plot(x, y, label=label, alpha=alpha)
+    ax.set_title(spec["title"])
+    if spec["date_axis"]:
+        ax.xaxis.set_major_locator(mdates.YearLocator(base=5))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%Y'))
+        ax.tick_params(axis='x', labelrotation=45)
+    ax.legend()
+    if spec["grid"]:
+        ax.grid()
+    os.makedirs(os.path.dirname(spec["save_path"]) or ".", exist_ok=True)
+    fig.savefig(spec["save_path"], metadata={"InputDigest": spec["digest"]})
+    return True
+
+def render_charts(specs, workers=None, force=False):
+    """
+    Vẽ nhiều biểu đồ song song bằng process pool; các biểu đồ có đầu vào không đổi được bỏ qua trước khi gửi đi.
+    Args:
+        specs (list[dict]): Các mô tả biểu đồ từ chart_spec.
+        workers (int): Số tiến trình, mặc định bằng số CPU; 1 để vẽ tuần tự trong tiến trình hiện tại.
+        force (bool): Vẽ lại tất cả.
+    Returns:
+        dict: Số biểu đồ đã vẽ ('rendered') và đã bỏ qua ('skipped').
+    """
+    pending = [spec for spec in specs if force or not is_chart_current(spec)]
+    if workers == 1 or len(pending) <= 1:
+        for spec in pending:
+            render_chart(spec, force=True)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_chart, pending, [True] * len(pending), chunksize=max(len(pending) // (4 * (workers or os.cpu_count() or 1)), 1)))
+    return {"rendered": len(pending), "skipped": len(specs) - len(pending)}
+
+def cumulative_return_spec(series, short_window, long_window, save_path):
+    """Mô tả biểu đồ hiệu suất tích luỹ từ chuỗi của sma_chart_series."""
+    return chart_spec(save_path, f'Hiệu suất tích luỹ (SMA {short_window}/{long_window})', [
+        (series["index"], series["cumulative_market"], 'Thị trường', None),
+        (series["index"], series["cumulative_strategy"], 'Chiến lược SMA', None),
+    ])
+
+def daily_return_spec(series, save_path):
+    """Mô tả biểu đồ tỷ suất sinh lời từng ngày từ chuỗi của sma_chart_series."""
+    return chart_spec(save_path, "So sánh tỷ suất sinh lời từng ngày (Market vs SMA)", [
+        (series["index"], series["market_return"], "Tỷ suất sinh lời thị trường", 0.5),
+        (series["index"], series["strategy_return"], "Tỷ suất sinh lời chiến lược SMA", 0.7),
+    ], grid=True)
+
+def lstm_chart_spec(data, ticker, save_path, cache=None):
+    """Mô tả biểu đồ giá thực tế và giá dự báo, dùng dự báo toàn lịch sử từ cache."""
+    if cache is None:
+        # artifact_cache kéo theo PyTorch, chỉ nạp khi cần biểu đồ dự báo
+        from src.artifact_cache import artifact_cache as cache
+
+    # Tải mô hình LSTM đã huấn luyện
+    model_file = model_file_for(ticker, model_path)
+    if not os.path.exists(model_file):
+        raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_file}. Vui lòng train trước.")
+
+    # Dự báo trên toàn bộ lịch sử (dùng lại kết quả đã cache nếu dữ liệu và mô hình không đổi)
+    predicted_all = cache.predictions(data, ticker, model_file, load_model_sequence_length(model_file))
+
+    dates = chart_dates(data)[-len(predicted_all):]
+    real_price = data['Close'].values[-len(predicted_all):]
+    return chart_spec(save_path, "So sánh giá thực tế và giá dự báo từ RNN + LSTM", [
+        (dates, real_price, "Giá thực tế", None),
+        (dates, predicted_all, "Giá dự báo RNN + LSTM", None),
+    ], figsize=(12, 8), date_axis=True)
 
 def plot_cumulative_return(data, short_window, long_window, save_path=f"{pic_path}/sma_strategy_performance.png"):
     """    
@@ -21,16 +213,8 @@ def plot_cumulative_return(data, short_window, long_window, save_path=f"{pic_pat
         long_window (int): Kỳ dài hạn của SMA.
         save_path (str): Đường dẫn lưu biểu đồ.
     """
-    cumulative_market, cumulative_strategy = apply_sma_strategy(data, short_window, long_window)
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(cumulative_market, label='Thị trường')
-    plt.plot(cumulative_strategy, label='Chiến lược SMA')
-    plt.title(f'Hiệu suất tích luỹ (SMA {short_window}/{long_window})')
-    plt.legend()
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path)
-    plt.close()
+    render_chart(cumulative_return_spec(sma_chart_series(data, short_window, long_window),
+                                        short_window, long_window, save_path))
 
 def plot_daily_return_sma(data, short_window, long_window, save_path=f"{pic_path}/sma_daily_return.png"):
     """    
@@ -41,105 +225,69 @@ def plot_daily_return_sma(data, short_window, long_window, save_path=f"{pic_path
         long_window (int): Kỳ dài hạn của SMA.
         save_path (str): Đường dẫn lưu biểu đồ.
     """
-    df = data.copy()
-    df['Market_Return'] = df['Close'].pct_change()
-    df['SMA_short'] = df['Close'].rolling(short_window).mean()
-    df['SMA_long'] = df['Close'].rolling(long_window).mean()
-    df.dropna(inplace=True)
+    render_chart(daily_return_spec(sma_chart_series(data, short_window, long_window), save_path))
 
-    df['Signal'] = np.where(df['SMA_short'] > df['SMA_long'], 1, 0)
-    df['Position'] = df['Signal'].shift(1)
-    df['Strategy_Return'] = df['Position'] * df['Market_Return']
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(df.index, df['Market_Return'], label="Tỷ suất sinh lời thị trường", alpha=0.5)
-    plt.plot(df.index, df['Strategy_Return'], label="Tỷ suất sinh lời chiến lược SMA", alpha=0.7)
-    plt.title("So sánh tỷ suất sinh lời từng ngày (Market vs SMA)")
-    plt.legend()
-    plt.grid()
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path)
-    plt.close()
-
-def plot_stock_price_lstm(data, ticker, save_path=f"{pic_path}/lstm_prediction.png"):
+def plot_stock_price_lstm(data, ticker, save_path=f"{pic_path}/lstm_prediction.png", cache=None):
     """
     Vẽ biểu đồ giá thực tế và giá dự báo từ mô hình RNN + LSTM.
     Args:
-        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Date' và 'Close'.
-        predicted_prices (list or np.array): Giá dự báo từ mô hình LSTM.
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close', thời gian theo chart_dates (kể cả dạng gọn).
+        ticker (str): Mã chứng khoán, dùng để tìm file mô hình (config.model_file_for).
         save_path (str): Đường dẫn lưu biểu đồ.
+        cache (ArtifactCache): Cache dùng chung với predict_future, mặc định là artifact_cache.
     """
-    global sequence_length, model_path
-    
-    df = data.copy().reset_index(drop=True)
-
-    # Chỉ lấy cột 'Close' để dự báo
-    features = df[['Close']].values
-    scaled_data, scaler = scale_data(features)
+    render_chart(lstm_chart_spec(data, ticker, save_path, cache))
 
-    X, _ = create_sequences(scaled_data, sequence_length)
-    X = torch.tensor(X).float()
-
-    # Tải mô hình LSTM đã huấn luyện
-    if not os.path.exists(f"{model_path}/model_{ticker}.pth"):
-        raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_path}/model_{ticker}.pth. Vui lòng train trước.")
-    
-    # Khởi tạo mô hình LSTM
-    model = RNN_LSTMModel()
-
-    # Tải trọng số mô hình đã huấn luyện
-    model.load_state_dict(torch.load(f"{model_path}/model_{ticker}.pth"))
-    model.eval()
-    predicted_all = model(X).detach().numpy()
-    predicted_all = scaler.inverse_transform(predicted_all)
-
-    dates = pd.to_datetime(df['Date']).values[-len(predicted_all):]
-    real_price = df['Close'].values[-len(predicted_all):]
-    predicted_all = np.array(predicted_all).flatten()
-
-    plt.figure(figsize=(12, 8))
-    plt.plot(dates, real_price, label="Giá thực tế")
-    plt.plot(dates, predicted_all, label="Giá dự báo RNN + LSTM")
-    plt.title("So sánh giá thực tế và giá dự báo từ RNN + LSTM")
-    plt.gca().xaxis.set_major_locator(mdates.YearLocator(base=5))
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d-%m-%Y'))
-    plt.xticks(rotation=45)
-    plt.legend()
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path)
-    plt.close()
+def ticker_chart_specs(data, ticker, short_window, long_window, cache=None):
+    """
+    Mô tả cả ba biểu đồ của một ticker theo đường dẫn chuẩn trong pic/{ticker}/.
+    Biểu đồ dự báo bị bỏ qua nếu ticker chưa có mô hình.
+    Returns:
+        list[dict]: Các mô tả biểu đồ cho render_charts.
+    """
+    series = sma_chart_series(data, short_window, long_window)
+    specs = [
+        cumulative_return_spec(series, short_window, long_window, f"{pic_path}/{ticker}/sma_cumulative_return_{ticker}.png"),
+        daily_return_spec(series, f"{pic_path}/{ticker}/sma_daily_return_{ticker}.png"),
+    ]
+    if os.path.exists(model_file_for(ticker, model_path)):
+        specs.append(lstm_chart_spec(data, ticker, f"{pic_path}/{ticker}/rnn_lstm_prediction_{ticker}.png", cache))
+    return specs
 
 if __name__ == "__main__":
     import argparse
-    from src.data_loader import load_realtime_data
-    from src.config import pic_path
+    import time
+    import src.config as config
+    from src.batch_backtest import resolve_tickers
+    from src.data_loader import load_data
+    from src.strategy import grid_search_sma
 
     parser = argparse.ArgumentParser(description="Visualization for Stock Prediction")
-    parser.add_argument('--ticker', type=str, default='AAPL', help='Mã cổ phiếu')
-    parser.add_argument('--short_window', type=int, default=20, help='SMA short window')
-    parser.add_argument('--long_window', type=int, default=100, help='SMA long window')
+    parser.add_argument('--tickers', '--ticker', type=str, nargs='+', default=None, help='Danh sách mã cổ phiếu')
+    parser.add_argument('--pattern', type=str, default=None, help="Mẫu glob trên thư mục dữ liệu, ví dụ 'data/*.csv'")
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='Y',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--short_window', type=int, default=None, help='SMA short window (mặc định: tốt nhất theo grid search)')
+    parser.add_argument('--long_window', type=int, default=None, help='SMA long window (mặc định: tốt nhất theo grid search)')
+    parser.add_argument('--workers', type=int, default=config.chart_workers, help='Số tiến trình vẽ song song')
+    parser.add_argument('--force', action='store_true', help='Vẽ lại kể cả khi dữ liệu không đổi')
     args = parser.parse_args()
 
-    ticker = args.ticker
-    short_window = args.short_window
-    long_window = args.long_window
-
-    data = load_realtime_data(ticker)
-
-    plot_cumulative_return(
-        data=data,
-        short_window=short_window,
-        long_window=long_window,
-        save_path=f"{pic_path}/{ticker}/sma_cumulative_return_{ticker}.png"
-    )
-    plot_daily_return_sma(
-        data=data,
-        short_window=short_window,
-        long_window=long_window,
-        save_path=f"{pic_path}/{ticker}/sma_daily_return_{ticker}.png"
-    )
-    plot_stock_price_lstm(
-        data=data,
-        ticker=ticker,
-        save_path=f"{pic_path}/{ticker}/rnn_lstm_prediction_{ticker}.png"
-    )
\ No newline at end of file
+    tickers = resolve_tickers(args.tickers, args.pattern) or [config.ticker]
+    data_source = 'https://stooq.com' if args.data_source == 'Y' else 'local'
+
+    start = time.perf_counter()
+    specs = []
+    for ticker in tickers:
+        data = load_data(ticker, data_source)
+        short_window, long_window = args.short_window, args.long_window
+        if short_window is None or long_window is None:
+            best = grid_search_sma(data, config.short_range, config.long_range, method=config.grid_search_method).iloc[0]
+            short_window = short_window or int(best['short_window'])
+            long_window = long_window or int(best['long_window'])
+        specs += ticker_chart_specs(data, ticker, short_window, long_window)
+    prepared = time.perf_counter() - start
+
+    counts = render_charts(specs, workers=args.workers, force=args.force)
+    print(f"Chuẩn bị {len(specs)} biểu đồ cho {len(tickers)} ticker: {prepared:.2f}s")
+    print(f"Đã vẽ {counts['rendered']}, bỏ qua {counts['skipped']} (không đổi) trong {time.perf_counter() - start - prepared:.2f}s")
\ No newline at end of file
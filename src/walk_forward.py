@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from src.strategy import sma_grid_factors
+
+def walk_forward_splits(n, train_size, test_size, expanding=False):
+    """
+    Chia chuỗi n phiên thành các fold walk-forward.
+    Args:
+        n (int): Số phiên dữ liệu.
+        train_size (int): Số phiên của cửa sổ huấn luyện (cửa sổ đầu tiên nếu expanding=True).
+        test_size (int): Số phiên kiểm tra ngay sau mỗi cửa sổ huấn luyện.
+        expanding (bool): True để cửa sổ huấn luyện luôn bắt đầu từ phiên đầu tiên, False để trượt.
+    Returns:
+        list[tuple]: Các bộ (train_start, train_end, test_end) theo chỉ số phiên, khoảng nửa mở.
+    """
+    splits = []
+    train_end = train_size
+    while train_end < n:
+        test_end = min(train_end + test_size, n)
+        splits.append((0 if expanding else train_end - train_size, train_end, test_end))
+        train_end = test_end
+    return splits
+
+def _best_index(log_returns, tol=1e-9):
+    """
+    Chỉ số cặp tham số tốt nhất. Các cặp có vị thế trùng nhau trong cửa sổ cho cùng lợi nhuận,
+    nên các giá trị chênh nhau không quá tol (sai số làm tròn) được coi là bằng nhau và chọn cặp đầu tiên.
+    """
+    return int(np.flatnonzero(log_returns >= np.nanmax(log_returns) - tol)[0])
+
+def walk_forward_sma(data, short_range, long_range, train_size, test_size, expanding=False):
+    """
+    Walk-forward cho chiến lược SMA: tối ưu tham số trên mỗi cửa sổ huấn luyện rồi kiểm tra trên đoạn kế tiếp.
+    SMA, vị thế và lợi nhuận luỹ kế (dạng log) của cả lưới chỉ được tính một lần trên toàn bộ lịch sử;
+    lợi nhuận của mọi cặp tham số trên một đoạn bất kỳ là hiệu hai giá trị luỹ kế, nên mỗi fold chỉ tốn O(số cặp).
+    SMA tại mỗi phiên chỉ dùng dữ liệu quá khứ, nên không có look-ahead; cửa sổ huấn luyện được "làm nóng"
+    bằng dữ liệu trước nó thay vì bỏ mất long_window phiên đầu như khi gọi grid_search_sma trên từng đoạn.
+    Args:
+        data (pd.DataFrame): Dữ liệu giá cổ phiếu với cột 'Close'.
+        short_range (range): Khoảng giá trị cho kỳ hạn SMA ngắn hạn.
+        long_range (range): Khoảng giá trị cho kỳ hạn SMA dài hạn.
+        train_size (int): Số phiên của cửa sổ huấn luyện.
+        test_size (int): Số phiên kiểm tra.
+        expanding (bool): Cửa sổ huấn luyện mở rộng (True) hay trượt (False).
+    Returns:
+        pd.DataFrame: Mỗi dòng là một fold với khoảng ngày, bộ tham số tốt nhất, lợi nhuận trong mẫu và ngoài mẫu.
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    dates = data['Date'].to_numpy() if 'Date' in data.columns else data.index.to_numpy()
+    pairs, factor = sma_grid_factors(close, short_range, long_range)
+
+    # log_growth[:, t] = tổng log hệ số tăng trưởng của các phiên [0, t)
+    log_growth = np.zeros((len(pairs), len(close) + 1))
+    with np.errstate(divide="ignore"):
+        np.cumsum(np.log(factor), axis=1, out=log_growth[:, 1:])
+
+    rows = []
+    for fold, (train_start, train_end, test_end) in enumerate(walk_forward_splits(len(close), train_size, test_size, expanding)):
+        in_sample = log_growth[:, train_end] - log_growth[:, train_start]
+        best = _best_index(in_sample)
+        out_of_sample = log_growth[best, test_end] - log_growth[best, train_end]
+        rows.append({
+            "fold": fold,
+            "train_start": dates[train_start],
+            "train_end": dates[train_end - 1],
+            "test_start": dates[train_end],
+            "test_end": dates[test_end - 1],
+            "short_window": pairs[best][0],
+            "long_window": pairs[best][1],
+            "in_sample_return": np.exp(in_sample[best]),
+            "out_of_sample_return": np.exp(out_of_sample),
+        })
+    return pd.DataFrame(rows)
+
+def walk_forward_sma_naive(data, short_range, long_range, train_size, test_size, expanding=False):
+    """Cùng kết quả với walk_forward_sma nhưng tính lại toàn bộ lưới cho mỗi fold; dùng làm mốc so sánh."""
+    close = data['Close'].to_numpy(dtype=float)
+    rows = []
+    for train_start, train_end, test_end in walk_forward_splits(len(close), train_size, test_size, expanding):
+        pairs, factor = sma_grid_factors(close[:test_end], short_range, long_range)
+        in_sample = np.prod(factor[:, train_start:train_end], axis=1)
+        best = _best_index(np.log(in_sample))
+        rows.append({
+            "short_window": pairs[best][0],
+            "long_window": pairs[best][1],
+            "in_sample_return": in_sample[best],
+            "out_of_sample_return": np.prod(factor[best, train_end:test_end]),
+        })
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import src.config as config
+    from src.data_loader import load_data
+    from src.strategy import grid_search_sma
+
+    parser = argparse.ArgumentParser(description="Walk-forward SMA Optimization")
+    parser.add_argument('--ticker', type=str, default=config.ticker, help='Mã cổ phiếu')
+    parser.add_argument('--data_source', type=str, choices=['Y', 'N'], default='N',
+                        help='Y: tải dữ liệu thời gian thực, N: tải dữ liệu từ file đã lưu')
+    parser.add_argument('--train_size', type=int, default=config.walk_forward_train_size, help='Số phiên của cửa sổ huấn luyện')
+    parser.add_argument('--test_size', type=int, default=config.walk_forward_test_size, help='Số phiên kiểm tra của mỗi fold')
+    parser.add_argument('--expanding', action='store_true', help='Dùng cửa sổ huấn luyện mở rộng thay vì trượt')
+    parser.add_argument('--benchmark', action='store_true', help='So sánh thời gian với cách tính lại từng fold và một lần grid search')
+    args = parser.parse_args()
+
+    data = load_data(args.ticker, 'https://stooq.com' if args.data_source == 'Y' else 'local')
+    start = time.perf_counter()
+    folds = walk_forward_sma(data, config.short_range, config.long_range, args.train_size, args.test_size, args.expanding)
+    elapsed = time.perf_counter() - start
+    print(folds.to_string(index=False))
+    print(f"Lợi nhuận ngoài mẫu luỹ kế qua {len(folds)} fold: {folds['out_of_sample_return'].prod():.4f}")
+
+    if args.benchmark:
+        start = time.perf_counter()
+        grid_search_sma(data, config.short_range, config.long_range, method="vectorized")
+        single_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive = walk_forward_sma_naive(data, config.short_range, config.long_range, args.train_size, args.test_size, args.expanding)
+        naive_elapsed = time.perf_counter() - start
+
+        same = (naive[['short_window', 'long_window']].values == folds[['short_window', 'long_window']].values).all()
+        print(f"Một lần grid search: {single_pass:.3f}s")
+        print(f"Walk-forward tái sử dụng trạng thái: {elapsed:.3f}s ({elapsed / single_pass:.2f}x một lần grid search)")
+        print(f"Walk-forward tính lại từng fold: {naive_elapsed:.3f}s ({naive_elapsed / single_pass:.2f}x một lần grid search)")
+        print(f"Cùng bộ tham số ở mọi fold: {same}")
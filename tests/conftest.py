@@ -0,0 +1,127 @@
+import os
+import sys
+import pytest
+
+# Cho phép chạy pytest từ bất kỳ thư mục nào: các module được import theo dạng src.*
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """Chạy test tại thư mục gốc của repo, nơi có data/ (load_data(..., 'local') đọc đường dẫn tương đối)."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+class StooqStandIn:
+    """
+    Server HTTP cục bộ thay cho Stooq: trả CSV của symbol theo /q/d/l/?s=&i=&d1=&d2= (lọc theo d1/d2 như Stooq),
+    ghi lại mọi truy vấn và có thể chèn lỗi cho từng yêu cầu theo thứ tự trong faults:
+    ("status", mã HTTP), ("delay", giây) hoặc ("truncate",) (khai báo Content-Length dài hơn nội dung rồi ngắt kết nối).
+    """
+    def __init__(self, frames):
+        self.frames = frames
+        self.faults = []
+        self.requests = []
+        self.url = None
+
+    def body(self, query):
+        data = self.frames.get(query["s"])
+        if data is None:
+            return b"No data"
+        dates = data["Date"].str.replace("-", "")
+        if "d1" in query:
+            data = data[(dates >= query["d1"]) & (dates <= query["d2"])]
+        return data.to_csv(index=False).encode()
+
+@pytest.fixture
+def stooq_server():
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qsl, urlparse
+
+    stand_in = StooqStandIn({})
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            query = dict(parse_qsl(urlparse(self.path).query))
+            stand_in.requests.append(query)
+            fault = stand_in.faults.pop(0) if stand_in.faults else None
+            try:
+                if fault and fault[0] == "delay":
+                    threading.Event().wait(fault[1])
+                if fault and fault[0] == "status":
+                    self.send_response(fault[1])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = stand_in.body(query)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                if fault and fault[0] == "truncate":
+                    self.send_header("Content-Length", str(len(body) + 1000))
+                    self.end_headers()
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client đã bỏ yêu cầu (timeout)
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stand_in.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stand_in
+    server.shutdown()
+    server.server_close()
+
+def daily_prices(start="2020-01-01", periods=30):
+    """Khung giá ngày như Stooq trả về (Date dạng chuỗi)."""
+    import numpy as np
+    import pandas as pd
+    dates = pd.bdate_range(start, periods=periods)
+    close = 100 + np.arange(periods, dtype=float)
+    return pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Open": close - 0.5, "High": close + 1,
+                         "Low": close - 1, "Close": close, "Volume": np.arange(periods) * 1000 + 1000})
+
+def hourly_prices(start="2020-01-02", days=2, bars=4):
+    """Khung nến giờ như Stooq trả về với interval trong ngày (Date và Time dạng chuỗi)."""
+    import pandas as pd
+    times = pd.date_range(f"{start} 10:00", periods=bars, freq="h").strftime("%H:%M:%S")
+    rows = [(day, time) for day in pd.bdate_range(start, periods=days).strftime("%Y-%m-%d") for time in times]
+    close = 100 + 0.5 * pd.RangeIndex(len(rows))
+    return pd.DataFrame({"Date": [d for d, _ in rows], "Time": [t for _, t in rows], "Open": close, "High": close + 1,
+                         "Low": close - 1, "Close": close, "Volume": 1000.5 + pd.RangeIndex(len(rows))})
+
+@pytest.fixture
+def pipeline_dir(tmp_path):
+    """
+    Thư mục làm việc riêng cho các lệnh chạy bằng tiến trình con: config dùng đường dẫn '../stock-prediction/...',
+    nên chạy tại tmp/stock-prediction (data/ trỏ tới dữ liệu của repo) để model/, pic/, cache/ không đụng vào repo.
+    """
+    work = tmp_path / "stock-prediction"
+    work.mkdir()
+    (work / "data").symlink_to(os.path.join(ROOT, "data"))
+    return work
+
+def run_module(module, *args, cwd=ROOT):
+    """Chạy python -m module trong tiến trình mới với src.* import được từ repo."""
+    import subprocess
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    return subprocess.run([sys.executable, "-m", module, *args], cwd=cwd, env=env, capture_output=True, text=True)
+
+@pytest.fixture
+def bundled_data(repo_root):
+    """Dữ liệu đi kèm repo (data/*.csv) theo ticker, nạp như load_data(..., 'local')."""
+    import glob
+    from src.batch_backtest import ticker_from_path
+    from src.data_loader import load_data
+    return {ticker_from_path(path): load_data(ticker_from_path(path), "local") for path in sorted(glob.glob("data/*.csv"))}
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import src.config as config
+from src.backtest import backtest_metrics, grid_backtest
+from src.strategy import grid_search_sma
+
+def test_zero_cost_final_return_matches_grid_search(bundled_data):
+    for ticker, data in bundled_data.items():
+        # Khối nhỏ để lưới được tính qua nhiều khối
+        table = grid_backtest(data, config.short_range, config.long_range, commission=0, slippage=0,
+                              rank_by="final_return", max_mem_mb=0.5)
+        expected = grid_search_sma(data, config.short_range, config.long_range, method="vectorized")
+        merged = table.merge(expected, on=["short_window", "long_window"], suffixes=("", "_grid"))
+        assert len(merged) == len(expected) == len(table), ticker
+        np.testing.assert_array_equal(merged["final_return"], merged["final_return_grid"], err_msg=ticker)
+        np.testing.assert_array_equal(merged["net_return"], merged["final_return"], err_msg=ticker)
+
+@pytest.mark.parametrize("commission, slippage", [(1e-5, 0.0), (5e-6, 5e-6)])
+def test_cost_lowers_returns_in_proportion_to_turnover(bundled_data, commission, slippage):
+    data = bundled_data["MSFT"]
+    cost = commission + slippage
+    table = grid_backtest(data, config.short_range, config.long_range, commission=commission, slippage=slippage)
+    periods = len(data) - table["long_window"].to_numpy()
+    changes = np.rint(table["turnover"].to_numpy() * periods / config.periods_per_year)
+    # Mỗi lần đổi vị thế nhân đường vốn với (1 + r - cost) thay vì (1 + r): log giảm khoảng cost cho mỗi lần đổi
+    log_gap = np.log(table["final_return"].to_numpy()) - np.log(table["net_return"].to_numpy())
+    traded = changes > 0
+    assert traded.any()
+    np.testing.assert_allclose(log_gap[traded] / cost, changes[traded], rtol=0.05)
+    assert (log_gap[~traded] == 0).all()
+
+    # Phí gấp đôi làm khoảng cách (dạng log) gấp đôi
+    doubled = backtest_metrics(data, 20, 100, commission=2 * commission, slippage=2 * slippage)
+    single = backtest_metrics(data, 20, 100, commission=commission, slippage=slippage)
+    assert single["final_return"] == doubled["final_return"]
+    assert np.log(doubled["final_return"] / doubled["net_return"]) == \
+        pytest.approx(2 * np.log(single["final_return"] / single["net_return"]), rel=1e-3)
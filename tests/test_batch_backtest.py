@@ -0,0 +1,22 @@
+from src.batch_backtest import batch_grid_search
+from src.data_loader import load_data
+from src.strategy import grid_search_sma
+
+SHORT_RANGE = range(10, 40, 10)
+LONG_RANGE = range(50, 150, 50)
+
+def test_batch_matches_single_ticker_search(repo_root):
+    summary = batch_grid_search(["AAPL", "GOOG"], "local", SHORT_RANGE, LONG_RANGE, workers=2)
+    for ticker in ("AAPL", "GOOG"):
+        best = grid_search_sma(load_data(ticker, "local"), SHORT_RANGE, LONG_RANGE).iloc[0]
+        row = summary.set_index("ticker").loc[ticker]
+        assert (row["short_window"], row["long_window"]) == (best["short_window"], best["long_window"])
+        assert row["final_return"] == best["final_return"]
+
+def test_batch_reports_insufficient_data_and_missing_ticker(repo_root):
+    summary = batch_grid_search(["AAPL", "NOPE"], "local", SHORT_RANGE, range(10**6, 10**6 + 1), workers=2)
+    errors = summary.set_index("ticker")["error"]
+    assert errors["AAPL"].startswith("Không đủ dữ liệu")
+    assert "NOPE".lower() in errors["NOPE"]
+    assert summary["final_return"].isna().all()
+    assert batch_grid_search([], "local", SHORT_RANGE, LONG_RANGE).empty
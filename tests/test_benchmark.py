@@ -0,0 +1,35 @@
+import numpy as np
+import torch
+from src.benchmark import measure, synthetic_prices
+from src.model import RNN_LSTMModel
+from src.train import train_model
+
+def test_measure_calls_setup_before_every_run():
+    created, used = [], []
+
+    def setup():
+        created.append(object())
+        return (created[-1],)
+
+    measure(used.append, repeats=3, setup=setup)
+    # 3 lần đo thời gian và 1 lần đo bộ nhớ, mỗi lần một đối tượng mới
+    assert len(created) == len(used) == 4 and used == created
+
+def test_measure_peak_excludes_setup_allocations():
+    result = measure(lambda block: block.sum(), repeats=1, setup=lambda: (np.ones(4 * 2**20 // 8),))
+    assert result["peak_mem_mb"] < 1
+
+def test_train_epoch_repeats_start_from_same_initial_model():
+    data = synthetic_prices(400, seed=3, volatility=0.01)
+    X = torch.tensor(np.lib.stride_tricks.sliding_window_view(data["Close"].to_numpy(), 20)[:-1, :, None] / 100,
+                     dtype=torch.float32)
+    y = torch.tensor(data["Close"].to_numpy()[20:, None] / 100, dtype=torch.float32)
+    losses = []
+
+    def fresh_model():
+        torch.manual_seed(0)
+        return (RNN_LSTMModel(),)
+
+    measure(lambda model: losses.append(train_model(model, X, y, num_epochs=1, verbose=False)[0]["loss"]),
+            repeats=2, setup=fresh_model)
+    assert losses[0] == losses[1] == losses[2]
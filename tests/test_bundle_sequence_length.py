@@ -0,0 +1,26 @@
+import pytest
+import src.predict as predict
+from src.artifact_cache import ArtifactCache
+from src.config import model_file_for, sequence_length
+from src.data_loader import load_data
+from src.features import load_model_sequence_length
+from src.forecast import forecast_tickers
+from src.inference_service import InferenceService, ModelRegistry
+from src.train_farm import train_ticker
+
+def test_readers_window_with_the_trained_sequence_length(tmp_path, monkeypatch, repo_root):
+    assert sequence_length != 20
+    train_ticker("MSFT", num_epochs=1, seq_length=20, model_dir=str(tmp_path), checkpoint_dir=str(tmp_path))
+    model_file = model_file_for("MSFT", str(tmp_path))
+    assert load_model_sequence_length(model_file) == 20
+    monkeypatch.setattr(predict, "model_path", str(tmp_path))
+
+    data = load_data("MSFT", "local")
+    cache = ArtifactCache(persist=False)
+    predicted = predict.predict_future("MSFT", data=data, cache=cache)
+    served = InferenceService(ModelRegistry(model_dir=str(tmp_path)), data_source="local").predict(["MSFT"])
+    forecast = forecast_tickers(["MSFT"], horizon=1, model_dir=str(tmp_path))["forecasts"]["MSFT"]["forecast"][0]
+    assert served["predictions"]["MSFT"]["predicted_price"] == pytest.approx(predicted, rel=1e-6)
+    assert forecast == pytest.approx(predicted, rel=1e-5)
+    assert predicted == cache.predictions(data, "MSFT", model_file, 20, last_only=True)[-1]
+    assert predicted != cache.predictions(data, "MSFT", model_file, sequence_length, last_only=True)[-1]
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import pytest
+import src.config as config
+import src.train_farm as train_farm
+from src.backtest import RANK_METRICS
+from src.cli import IMPORT_BUDGET, build_parser, main
+from conftest import ROOT
+
+def _imported_modules(stderr):
+    """Tên module nạp trong tiến trình, đọc từ báo cáo của python -X importtime."""
+    return {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in stderr.splitlines() if line.startswith("import time:")}
+
+def test_backtest_command_does_not_import_torch_or_matplotlib():
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-m", "src.cli", "backtest",
+                                "--tickers", "AAPL", "--data_source", "N"],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert "AAPL: SMA" in completed.stdout
+    modules = _imported_modules(completed.stderr)
+    assert "pandas" in modules
+    assert not modules & set(IMPORT_BUDGET["backtest"])
+
+def test_rank_by_choices_follow_backtest_metrics():
+    parser = build_parser()
+    for metric in RANK_METRICS:
+        assert parser.parse_args(["backtest", "--rank_by", metric]).rank_by == metric
+    with pytest.raises(SystemExit):
+        parser.parse_args(["backtest", "--rank_by", "sortino"])
+
+def test_train_passes_early_stopping_and_checkpoint_flags(monkeypatch, repo_root):
+    calls = []
+    monkeypatch.setattr(train_farm, "train_universe", lambda tickers, **kwargs: calls.append(kwargs) or [{"ticker": t} for t in tickers])
+    assert main(["train", "--tickers", "AAPL", "--patience", "3", "--val_fraction", "0.2", "--checkpoint_every", "5"]) == 0
+    assert calls[0]["patience"] == 3
+    assert calls[0]["val_fraction"] == 0.2
+    assert calls[0]["checkpoint_every"] == 5
+
+    main(["train", "--tickers", "AAPL"])
+    assert (calls[1]["patience"], calls[1]["val_fraction"], calls[1]["checkpoint_every"]) == \
+        (config.patience, config.val_fraction, config.checkpoint_every)
@@ -0,0 +1,130 @@
+import os
+import pandas as pd
+import pytest
+import src.data_loader as data_loader
+from conftest import daily_prices, hourly_prices
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "cache_path", str(tmp_path))
+    return tmp_path
+
+def _stats():
+    return dict(data_loader.cache_stats)
+
+def test_cache_miss_hit_and_incremental_refresh(stooq_server, cache_dir):
+    prices = daily_prices(periods=30)
+    stooq_server.frames["aapl.us"] = prices
+    cache_file = cache_dir / "aapl.us_d.csv"
+
+    # Lần đầu: chưa có cache, tải toàn bộ lịch sử (không có d1/d2)
+    before = _stats()
+    data = data_loader.load_realtime_data("AAPL", stooq_server.url)
+    assert _stats()["misses"] == before["misses"] + 1
+    assert stooq_server.requests[-1] == {"s": "aapl.us", "i": "d"}
+    assert len(data) == 30 and cache_file.exists()
+
+    # Cache còn mới: không gọi server
+    before, calls = _stats(), len(stooq_server.requests)
+    assert data_loader.load_realtime_data("AAPL", stooq_server.url)["Close"].tolist() == prices["Close"].tolist()
+    assert _stats()["hits"] == before["hits"] + 1 and len(stooq_server.requests) == calls
+
+    # Cache cũ và thiếu 5 phiên cuối: chỉ tải phần mới từ ngày sau phiên cuối trong cache
+    prices.iloc[:25].to_csv(cache_file, index=False)
+    old = os.path.getmtime(cache_file) - (data_loader.cache_max_age_hours + 1) * 3600
+    os.utime(cache_file, (old, old))
+    before = _stats()
+    data = data_loader.load_realtime_data("AAPL", stooq_server.url)
+    assert _stats()["refreshes"] == before["refreshes"] + 1
+    query = stooq_server.requests[-1]
+    assert query["d1"] == (pd.Timestamp(prices["Date"].iloc[24]) + pd.Timedelta(days=1)).strftime("%Y%m%d")
+    assert query["d2"] == pd.Timestamp.now().strftime("%Y%m%d")
+    assert data["Date"].tolist() == prices["Date"].tolist()
+    assert pd.read_csv(cache_file)["Date"].tolist() == prices["Date"].tolist()
+
+def test_refresh_without_new_rows_keeps_cache(stooq_server, cache_dir):
+    prices = daily_prices(periods=10)
+    stooq_server.frames["msft.us"] = prices
+    cache_file = cache_dir / "msft.us_d.csv"
+    prices.to_csv(cache_file, index=False)
+    old = os.path.getmtime(cache_file) - (data_loader.cache_max_age_hours + 1) * 3600
+    os.utime(cache_file, (old, old))
+
+    data = data_loader.load_realtime_data("MSFT", stooq_server.url)
+    assert "d1" in stooq_server.requests[-1]
+    assert data["Date"].tolist() == prices["Date"].tolist()
+
+def test_unknown_ticker_raises_without_writing_cache(stooq_server, cache_dir):
+    with pytest.raises(Exception, match="không có dữ liệu"):
+        data_loader.load_realtime_data("NOPE", stooq_server.url)
+    assert not list(cache_dir.iterdir())
+
+def test_intraday_refresh_keeps_bars_of_the_last_cached_day(stooq_server, cache_dir):
+    prices = hourly_prices()
+    stooq_server.frames["aapl.us"] = prices
+    cache_file = cache_dir / "aapl.us_60.csv"
+    # Cache dừng giữa ngày thứ hai; nến cuối trong cache còn đang hình thành nên giá khác bản mới
+    cached = prices.iloc[:6].copy()
+    cached.loc[5, "Close"] = 0.0
+    cached.to_csv(cache_file, index=False)
+    old = os.path.getmtime(cache_file) - (data_loader.cache_max_age_hours + 1) * 3600
+    os.utime(cache_file, (old, old))
+
+    data = data_loader.load_realtime_data("AAPL", stooq_server.url, interval="60")
+    query = stooq_server.requests[-1]
+    assert query["i"] == "60"
+    assert query["d1"] == prices["Date"].iloc[5].replace("-", "")
+    assert list(zip(data["Date"], data["Time"])) == list(zip(prices["Date"], prices["Time"]))
+    assert data["Close"].tolist() == prices["Close"].tolist()
+
+def test_load_data_passes_interval_to_stooq(monkeypatch):
+    calls = []
+    monkeypatch.setattr(data_loader, "load_realtime_data", lambda *args, **kwargs: calls.append(kwargs) or hourly_prices())
+    data_loader.load_data("AAPL", "https://stooq.com", interval="60")
+    assert calls[0]["interval"] == "60"
+
+def test_local_intraday_csv_combines_date_and_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    prices = hourly_prices()
+    prices.to_csv("data/aapl_us.csv", index=False)
+
+    data = data_loader.load_data("AAPL", "local")
+    assert "Time" not in data.columns
+    assert data.index.is_unique and data.index.is_monotonic_increasing
+    assert data.index[1] - data.index[0] == pd.Timedelta(hours=1)
+
+    # Khối lượng có phần lẻ không bị cắt khi chuyển sang dạng gọn
+    compact = data_loader.load_data("AAPL", "local", compact=True)
+    assert compact["Volume"].tolist() == prices["Volume"].tolist()
+    assert compact["Timestamp"].is_unique
+
+def test_charts_read_dates_from_compact_frames(repo_root):
+    from src.visualization import chart_dates
+    local = data_loader.load_data("AAPL", "local")
+    compact = data_loader.load_data("AAPL", "local", compact=True)
+    assert compact["Volume"].dtype == "int64"
+    assert (chart_dates(compact) == chart_dates(local)).all()
+
+def test_failed_refresh_falls_back_to_stale_cache(stooq_server, cache_dir, monkeypatch):
+    monkeypatch.setattr(data_loader.time, "sleep", lambda seconds: None)
+    prices = daily_prices(periods=30)
+    stooq_server.frames["aapl.us"] = prices
+    cache_file = cache_dir / "aapl.us_d.csv"
+    prices.iloc[:25].to_csv(cache_file, index=False)
+    old = os.path.getmtime(cache_file) - (data_loader.cache_max_age_hours + 1) * 3600
+    os.utime(cache_file, (old, old))
+    stooq_server.faults = [("status", 503)] * (data_loader.download_retries + 1)
+
+    before = _stats()
+    with pytest.warns(UserWarning, match="cache cũ"):
+        data = data_loader.load_realtime_data("AAPL", stooq_server.url)
+    assert len(stooq_server.requests) == data_loader.download_retries + 1
+    assert _stats()["stale"] == before["stale"] + 1
+    assert data["Date"].tolist() == prices["Date"].iloc[:25].tolist()
+    assert os.path.getmtime(cache_file) == old
+
+    # Lỗi không tạm thời (ví dụ 404) vẫn được báo lên
+    stooq_server.faults = [("status", 404)]
+    with pytest.raises(Exception, match="Lỗi tải dữ liệu"):
+        data_loader.load_realtime_data("AAPL", stooq_server.url)
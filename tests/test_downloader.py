@@ -0,0 +1,93 @@
+import os
+import time
+import pandas as pd
+import pytest
+import src.data_loader as data_loader
+import src.downloader as downloader
+from conftest import daily_prices, hourly_prices
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Ghi lại thời gian chờ giữa các lần thử thay vì chờ thật."""
+    recorded = []
+    monkeypatch.setattr(data_loader.time, "sleep", recorded.append)
+    return recorded
+
+@pytest.fixture
+def replaces(monkeypatch):
+    """Ghi lại các lần đổi tên file tạm -> file đích (và kiểm tra file tạm đã ghi xong trước khi đổi tên)."""
+    recorded, real_replace = [], os.replace
+
+    def replace(src, dst):
+        recorded.append((src, dst, len(pd.read_csv(src))))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(downloader.os, "replace", replace)
+    return recorded
+
+def _download(server, tmp_path, ticker="AAPL"):
+    return downloader.download_to_store(ticker, server.url, data_dir=str(tmp_path))
+
+def test_retries_on_429_and_5xx_with_backoff(stooq_server, tmp_path, sleeps, replaces):
+    stooq_server.frames["aapl.us"] = daily_prices(periods=50)
+    stooq_server.faults = [("status", 503), ("status", 429), ("status", 500)]
+    result = _download(stooq_server, tmp_path)
+    assert result["rows"] == 50
+    assert len(stooq_server.requests) == 4
+    backoff = data_loader.download_backoff
+    assert sleeps == [backoff, backoff * 2, backoff * 4]
+    assert pd.read_csv(tmp_path / "aapl_us.csv")["Date"].tolist() == daily_prices(periods=50)["Date"].tolist()
+
+def test_retries_on_timeout_and_truncated_stream(stooq_server, tmp_path, sleeps, replaces, monkeypatch):
+    monkeypatch.setattr(data_loader, "download_timeout", 0.2)
+    stooq_server.frames["aapl.us"] = daily_prices(periods=2000)
+    stooq_server.faults = [("delay", 1.0), ("truncate",)]
+    result = _download(stooq_server, tmp_path)
+    assert len(stooq_server.requests) == 3 and len(sleeps) == 2
+    assert result["rows"] == 2000 == len(pd.read_csv(tmp_path / "aapl_us.csv"))
+
+def test_failed_download_keeps_previous_file(stooq_server, tmp_path, sleeps, replaces):
+    previous = daily_prices(periods=5)
+    previous.to_csv(tmp_path / "aapl_us.csv", index=False)
+    stooq_server.frames["aapl.us"] = daily_prices(periods=50)
+    stooq_server.faults = [("status", 503)] * (data_loader.download_retries + 1)
+
+    summary = downloader.download_tickers(["AAPL"], stooq_server.url, data_dir=str(tmp_path))
+    assert "503" in summary.loc[0, "error"]
+    assert len(stooq_server.requests) == data_loader.download_retries + 1
+    assert replaces == []
+    assert sorted(os.listdir(tmp_path)) == ["aapl_us.csv"]
+    assert pd.read_csv(tmp_path / "aapl_us.csv").equals(previous)
+
+def test_writes_go_through_tmp_file_and_replace(stooq_server, tmp_path, sleeps, replaces):
+    stooq_server.frames["aapl.us"] = daily_prices(periods=20)
+    stooq_server.frames["msft.us"] = daily_prices(periods=30)
+    summary = downloader.download_tickers(["AAPL", "MSFT", "NOPE"], stooq_server.url, data_dir=str(tmp_path))
+
+    assert summary["ticker"].tolist() == ["AAPL", "MSFT", "NOPE"]
+    assert summary["rows"].tolist() == [20, 30, 0] and summary["error"].iloc[:2].isna().all()
+    assert sorted((os.path.basename(dst), rows) for src, dst, rows in replaces) == [("aapl_us.csv", 20), ("msft_us.csv", 30)]
+    assert all(src == f"{dst}.tmp" for src, dst, _ in replaces)
+    assert sorted(os.listdir(tmp_path)) == ["aapl_us.csv", "msft_us.csv"]
+
+def test_downloads_run_concurrently(stooq_server, tmp_path, sleeps, replaces):
+    tickers = ["AAPL", "MSFT", "GOOG", "TSLA"]
+    for ticker in tickers:
+        stooq_server.frames[f"{ticker.lower()}.us"] = daily_prices(periods=10)
+    delay = 0.5
+    stooq_server.faults = [("delay", delay)] * len(tickers)
+
+    start = time.perf_counter()
+    summary = downloader.download_tickers(tickers, stooq_server.url, data_dir=str(tmp_path), concurrency=len(tickers))
+    elapsed = time.perf_counter() - start
+    assert summary["error"].isna().all()
+    assert elapsed < delay * len(tickers) / 2
+
+def test_intraday_bars_sorted_by_date_and_time(stooq_server, tmp_path, replaces):
+    prices = hourly_prices(days=3)
+    # Server trả các nến trong cùng một ngày theo thứ tự đảo ngược
+    stooq_server.frames["aapl.us"] = prices.sort_values(by=["Date", "Time"], ascending=[True, False])
+    downloader.download_to_store("AAPL", stooq_server.url, interval="60", data_dir=str(tmp_path))
+    assert stooq_server.requests[-1]["i"] == "60"
+    saved = pd.read_csv(tmp_path / "aapl_us.csv")
+    assert list(zip(saved["Date"], saved["Time"])) == list(zip(prices["Date"], prices["Time"]))
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import torch
+from src.forecast import next_feature_rows, rollout, rollout_sliding
+from src.model import RNN_LSTMModel
+from src.scaling_data import MinMaxState
+
+@pytest.fixture(params=[["Close"], ["Close", "Return", "Volatility", "SMA_Spread"]], ids=["close", "derived"])
+def inputs(request):
+    """Cửa sổ đã chuẩn hóa của 3 chuỗi giá giả lập và mô hình ngẫu nhiên có cùng số đặc trưng."""
+    columns = request.param
+    rng = np.random.default_rng(0)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, (3, 200)), axis=1)
+    history = closes.shape[1] - 60
+    rows = np.stack([next_feature_rows(closes[:, :t + 1], columns) for t in range(history, closes.shape[1])], axis=1)
+    scaler = MinMaxState().fit(rows.reshape(-1, len(columns)))
+    torch.manual_seed(0)
+    model = RNN_LSTMModel(input_size=len(columns)).eval()
+    scale, offset = np.repeat(scaler.scale_[None], 3, axis=0), np.repeat(scaler.min_[None], 3, axis=0)
+    return model, scaler.transform(rows.reshape(-1, len(columns))).reshape(rows.shape), closes[:, -history:], scale, offset, columns
+
+def test_first_step_matches_sliding_window(inputs):
+    carried, _ = rollout(*inputs, horizon=5)
+    sliding = rollout_sliding(*inputs, horizon=5)
+    np.testing.assert_allclose(carried[:, 0], sliding[:, 0], rtol=1e-6)
+    assert np.isfinite(carried).all()
+
+def test_monte_carlo_paths_without_noise_collapse_to_deterministic(inputs):
+    model, windows, closes, scale, offset, columns = inputs
+    deterministic, _ = rollout(model, windows, closes, scale, offset, columns, horizon=5)
+
+    # 4 đường cho mỗi chuỗi như forecast_tickers(paths=4), nhưng không cộng nhiễu
+    paths = [np.repeat(array, 4, axis=0) for array in (windows, closes, scale, offset)]
+    simulated, _ = rollout(model, *paths, columns, horizon=5, noise=None)
+    np.testing.assert_allclose(simulated, np.repeat(deterministic, 4, axis=0), rtol=1e-6)
+    zero_noise, _ = rollout(model, *paths, columns, horizon=5, noise=np.zeros((12, 5)))
+    np.testing.assert_array_equal(zero_noise, simulated)
@@ -0,0 +1,80 @@
+import warnings
+import pytest
+import torch
+import src.export_model as export_model_module
+import src.predict as predict
+from src.artifact_cache import ArtifactCache
+from src.data_loader import load_data
+from src.forecast import forecast_tickers
+from src.inference_service import InferenceService, ModelRegistry
+from src.model import RNN_LSTMModel
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch, repo_root):
+    torch.manual_seed(0)
+    torch.save(RNN_LSTMModel().state_dict(), tmp_path / "model_aapl.pth")
+    monkeypatch.setattr(predict, "model_path", str(tmp_path))
+    return tmp_path
+
+def test_next_bar_prediction_agrees_across_paths(model_dir):
+    data = load_data("aapl", "local")
+    cache = ArtifactCache(persist=False)
+    predicted = predict.predict_future("aapl", data=data, cache=cache)
+
+    service = InferenceService(ModelRegistry(model_dir=str(model_dir)), data_source="local")
+    served = service.predict(["aapl"])["predictions"]["aapl"]["predicted_price"]
+    forecast = forecast_tickers(["aapl"], horizon=1, model_dir=str(model_dir))["forecasts"]["aapl"]["forecast"][0]
+
+    assert predicted == pytest.approx(served, rel=1e-6)
+    assert predicted == pytest.approx(forecast, rel=1e-5)
+
+def test_last_only_is_memoized_and_independent_of_full_history(model_dir):
+    data = load_data("aapl", "local")
+    model_file = f"{model_dir}/model_aapl.pth"
+    cache = ArtifactCache(persist=False)
+    first = cache.predictions(data, "aapl", model_file, 60, last_only=True)
+    misses = cache.stats["misses"]
+    assert cache.stats["misses"] >= 1
+    assert cache.predictions(data, "aapl", model_file, 60, last_only=True) is first
+    assert cache.stats["misses"] == misses
+
+    # Dự báo toàn lịch sử (cho biểu đồ) dừng ở cửa sổ dự báo nến cuối, không thay thế dự báo phiên kế tiếp
+    full = cache.predictions(data, "aapl", model_file, 60)
+    assert len(full) == len(data) - 60
+    assert cache.predictions(data, "aapl", model_file, 60, last_only=True) is first
+
+def test_memory_is_bounded_lru(model_dir):
+    data = load_data("aapl", "local")
+    model_file = f"{model_dir}/model_aapl.pth"
+    cache = ArtifactCache(persist=False, capacity=4)
+    # Mỗi phiên mới (dữ liệu khác) tạo thêm mục đặc trưng và dự báo, mô hình dùng chung
+    for end in range(len(data) - 5, len(data) + 1):
+        cache.predictions(data.iloc[:end], "aapl", model_file, 60, last_only=True)
+        assert len(cache.memory) <= 4
+    assert cache.stats["evictions"] > 0
+
+    # Mục dùng gần nhất còn trong cache; mục cũ nhất đã bị loại và được tính lại
+    misses = cache.stats["misses"]
+    cache.predictions(data, "aapl", model_file, 60, last_only=True)
+    assert cache.stats["misses"] == misses
+    cache.predictions(data.iloc[:len(data) - 5], "aapl", model_file, 60, last_only=True)
+    assert cache.stats["misses"] > misses
+
+@pytest.mark.parametrize("mode", ["script", "int8"])
+def test_export_emits_no_known_torch_warnings(model_dir, mode):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        export_model_module.export_model(str(model_dir / "model_aapl.pth"), mode)
+        export_model_module.load_inference_model(str(model_dir / "model_aapl.pth"), mode)
+    assert [str(w.message) for w in caught] == []
+
+def test_export_keeps_unrelated_warnings(model_dir, monkeypatch):
+    original_quantize = export_model_module.quantize_dynamic
+
+    def noisy_quantize(*args, **kwargs):
+        warnings.warn("cảnh báo thật từ lượng tử hoá", UserWarning)
+        return original_quantize(*args, **kwargs)
+
+    monkeypatch.setattr(export_model_module, "quantize_dynamic", noisy_quantize)
+    with pytest.warns(UserWarning, match="cảnh báo thật từ lượng tử hoá"):
+        export_model_module.export_model(str(model_dir / "model_aapl.pth"), "int8")
\ No newline at end of file
@@ -0,0 +1,37 @@
+import os
+import pytest
+import torch
+import src.inference_service as inference_service
+from src.inference_service import InferenceService, ModelRegistry
+from src.model import RNN_LSTMModel
+
+@pytest.fixture
+def batch_sizes(monkeypatch):
+    """Ghi lại kích thước batch của mỗi lần forward qua mô hình do registry nạp."""
+    sizes = []
+    load = inference_service.load_inference_model
+
+    def counting(model_file):
+        model = load(model_file)
+        return lambda batch: sizes.append(len(batch)) or model(batch)
+
+    monkeypatch.setattr(inference_service, "load_inference_model", counting)
+    return sizes
+
+def test_tickers_sharing_a_model_run_in_one_forward_pass(tmp_path, batch_sizes, repo_root):
+    torch.manual_seed(0)
+    torch.save(RNN_LSTMModel().state_dict(), tmp_path / "model_aapl.pth")
+    os.symlink(tmp_path / "model_aapl.pth", tmp_path / "model_msft.pth")
+    torch.save(RNN_LSTMModel().state_dict(), tmp_path / "model_goog.pth")
+    registry = ModelRegistry(model_dir=str(tmp_path))
+    service = InferenceService(registry, data_source="local")
+
+    batched = service.predict(["AAPL", "MSFT", "GOOG"])["predictions"]
+    assert sorted(batch_sizes) == [1, 2]
+    assert len(registry.models) == 2 and registry.stats["misses"] == 2
+
+    # Kết quả trong batch chung giống hệt khi dự báo riêng từng ticker
+    for ticker in ("AAPL", "MSFT"):
+        alone = InferenceService(ModelRegistry(model_dir=str(tmp_path)), data_source="local").predict([ticker])
+        assert alone["predictions"][ticker]["predicted_price"] == pytest.approx(batched[ticker]["predicted_price"], rel=1e-6)
+    assert batched["AAPL"]["predicted_price"] != batched["MSFT"]["predicted_price"]
@@ -0,0 +1,8 @@
+from conftest import run_module
+
+def test_pipeline_without_model_still_draws_sma_charts(pipeline_dir):
+    completed = run_module("src.main", "--ticker", "TSLA", cwd=pipeline_dir)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert "Bỏ qua dự báo" in completed.stdout
+    charts = sorted(path.name for path in (pipeline_dir / "pic" / "TSLA").iterdir())
+    assert charts == ["sma_cumulative_return_TSLA.png", "sma_daily_return_TSLA.png"]
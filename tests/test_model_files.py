@@ -0,0 +1,21 @@
+import math
+import os
+import pytest
+import src.predict as predict
+from src.artifact_cache import ArtifactCache
+from src.config import model_file_for
+from src.data_loader import load_data
+from src.inference_service import ModelRegistry
+from src.train_farm import train_ticker
+
+@pytest.mark.parametrize("ticker", ["TSLA", "tsla"])
+def test_predict_finds_model_trained_for_same_ticker(ticker, tmp_path, monkeypatch, repo_root):
+    entry = train_ticker(ticker, num_epochs=1, model_dir=str(tmp_path), checkpoint_dir=str(tmp_path))
+    assert entry["model_file"] == model_file_for(ticker.upper(), str(tmp_path))
+    assert os.path.exists(entry["model_file"])
+
+    monkeypatch.setattr(predict, "model_path", str(tmp_path))
+    for name in ("TSLA", "tsla"):
+        predicted = predict.predict_future(name, data=load_data(name, "local"), cache=ArtifactCache(persist=False))
+        assert math.isfinite(predicted)
+        assert ModelRegistry(model_dir=str(tmp_path)).model_file(name) == entry["model_file"]
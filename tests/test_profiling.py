@@ -0,0 +1,28 @@
+import numpy as np
+from src.profiling import Profiler
+
+MB = 2**20
+
+def test_stage_peak_excludes_memory_allocated_before_stage(tmp_path):
+    profiler = Profiler("test", enabled=True, output_dir=str(tmp_path))
+    preloaded = np.ones(32 * MB // 8)
+    with profiler.stage("noop"):
+        pass
+    with profiler.stage("outer"):
+        held = np.ones(8 * MB // 8)
+        with profiler.stage("inner"):
+            temporary = np.ones(4 * MB // 8)
+            del temporary
+        del held
+    peaks = {r["stage"]: r["peak_mem_mb"] for r in profiler.records}
+    assert peaks["noop"] < 0.5
+    assert 3.9 < peaks["inner"] < 4.5
+    # Bước ngoài gồm cả phần giữ lại lẫn đỉnh của bước con
+    assert 11.9 < peaks["outer"] < 12.5
+    assert preloaded.nbytes == 32 * MB
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    profiler = Profiler("test", enabled=False, output_dir=str(tmp_path))
+    with profiler.stage("load") as record:
+        record["rows"] = 1
+    assert profiler.records == [] and profiler.save() is None
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_loader import load_data
+from src.features import build_features, feature_timestamps, load_model_scaler
+from src.scaling_data import MinMaxState, scale_data
+from src.train_farm import train_ticker
+
+def _history(n=120):
+    close = np.linspace(10, 20, n)
+    close[100:] += 50  # Nến mới sau dữ liệu huấn luyện vượt đỉnh cũ
+    timestamps = pd.bdate_range("2021-01-01", periods=n).to_numpy(dtype="datetime64[s]").view(np.int64)
+    return close.reshape(-1, 1), timestamps
+
+def test_update_uses_bars_after_last_trained_timestamp():
+    close, timestamps = _history()
+    scaler = MinMaxState.from_dict(MinMaxState().fit(close[:100], timestamps[:100]).to_dict())
+    assert scaler.last_timestamp_ == timestamps[99]
+
+    # Lịch sử lúc dự báo bị cắt đầu (cửa sổ trượt): số dòng không còn khớp với lúc huấn luyện
+    _, updated = scale_data(close[30:], scaler, update=True, timestamps=timestamps[30:])
+    assert updated.data_max_[0] == close.max()
+    assert updated.last_timestamp_ == timestamps[-1]
+    assert updated.n_samples_seen_ == 120
+    assert scaler.data_max_[0] == close[:100].max()
+
+    # Không có nến mới: dùng nguyên scaler đã lưu
+    assert scale_data(close[30:100], scaler, update=True, timestamps=timestamps[30:100])[1] is scaler
+
+def test_bundle_without_timestamp_falls_back_to_row_count():
+    close, _ = _history()
+    state = MinMaxState().fit(close[:100]).to_dict()
+    del state["last_timestamp"]
+    scaler = MinMaxState.from_dict(state)
+    assert scaler.last_timestamp_ is None
+    assert scaler.copy().update(close).data_max_[0] == close.max()
+
+def test_trained_bundle_records_last_fitted_bar(tmp_path, repo_root):
+    train_ticker("MSFT", num_epochs=1, val_fraction=0.1, model_dir=str(tmp_path), checkpoint_dir=str(tmp_path))
+    scaler = load_model_scaler(f"{tmp_path}/model_msft.pth")
+    data = load_data("MSFT", "local")
+    features = build_features(data, ["Close"])
+    timestamps = feature_timestamps(data, features)
+    assert scaler.last_timestamp_ == timestamps[scaler.n_samples_seen_ - 1]
+    assert scaler.last_timestamp_ < timestamps[-1]
+    assert scaler.new_rows(features, timestamps)[0] == pytest.approx(features[scaler.n_samples_seen_:])
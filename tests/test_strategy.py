@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.benchmark import synthetic_prices
+import src.config as config
+import src.strategy as strategy
+from src.strategy import StreamingSMAStrategy, apply_sma_strategy, grid_search_sma
+from src.strategy import grid_search_sma_chunked, grid_search_sma_vectorized
+
+SHORT_RANGE = range(5, 40, 5)
+LONG_RANGE = range(20, 120, 10)
+
+def _ranking(results):
+    # Làm tròn để hai cách cộng dồn số thực khác thứ tự không làm đổi thứ hạng, cặp hoà xếp theo tham số
+    ranked = results.dropna().assign(rounded=lambda df: df["final_return"].round(10))
+    ranked = ranked.sort_values(by=["rounded", "short_window", "long_window"], ascending=[False, True, True])
+    return list(zip(ranked["short_window"].astype(int), ranked["long_window"].astype(int)))
+
+def test_vectorized_and_loop_rank_pairs_identically():
+    data = synthetic_prices(1500, seed=1, volatility=0.01, freq="D")
+    loop = grid_search_sma(data, SHORT_RANGE, LONG_RANGE, method="loop")
+    vectorized = grid_search_sma(data, SHORT_RANGE, LONG_RANGE, method="vectorized")
+
+    assert _ranking(vectorized) == _ranking(loop)
+    merged = loop.merge(vectorized, on=["short_window", "long_window"], suffixes=("_loop", "_vectorized"))
+    assert len(merged) == len(loop)
+    np.testing.assert_allclose(merged["final_return_vectorized"], merged["final_return_loop"], rtol=1e-12)
+
+def test_vectorized_matches_loop_when_series_too_short():
+    data = synthetic_prices(60, seed=2, volatility=0.01, freq="D")
+    vectorized = grid_search_sma(data, SHORT_RANGE, LONG_RANGE, method="vectorized")
+    # Các cặp có kỳ hạn dài không nhỏ hơn độ dài chuỗi không có kết quả
+    assert vectorized.loc[vectorized["long_window"] >= len(data), "final_return"].isna().all()
+    assert _ranking(vectorized) == _ranking(grid_search_sma(data, SHORT_RANGE, LONG_RANGE, method="loop"))
+
+
+@pytest.mark.parametrize("short_window, long_window", [(20, 100), (5, 50)])
+def test_streaming_replay_reproduces_apply_sma_strategy(bundled_data, short_window, long_window):
+    assert len(bundled_data) == 5
+    for ticker, data in bundled_data.items():
+        market, strategy = apply_sma_strategy(data, short_window, long_window)
+        replay_market, replay_strategy = StreamingSMAStrategy(short_window, long_window).replay(data)
+        pd.testing.assert_series_equal(replay_market, market, check_exact=True, check_names=False, obj=ticker)
+        pd.testing.assert_series_equal(replay_strategy, strategy, check_exact=True, check_names=False, obj=ticker)
+
+        # Vị thế từng bar giống Position của apply_sma_strategy (tín hiệu phiên trước, trên SMA của pandas)
+        close = data["Close"].astype(float)
+        sma_short, sma_long = close.rolling(short_window).mean(), close.rolling(long_window).mean()
+        valid = (sma_short.notna() & sma_long.notna()).to_numpy()
+        expected = np.where(sma_short[valid] > sma_long[valid], 1, 0)
+        stream = StreamingSMAStrategy(short_window, long_window)
+        states = [state for state in map(stream.update, close.to_numpy()) if state is not None]
+        assert [state["signal"] for state in states] == expected.tolist(), ticker
+        assert [state["position"] for state in states[1:]] == expected[:-1].tolist(), ticker
+
+
+def test_chunked_top_k_matches_vectorized(bundled_data):
+    for ticker, data in bundled_data.items():
+        # refine_step bằng bước lưới (không nhỏ hơn bước của dải nào): không quét mịn, chỉ chia lưới thành nhiều khối nhỏ
+        step = max(config.short_range.step, config.long_range.step)
+        chunked = grid_search_sma_chunked(data, config.short_range, config.long_range, top_k=10, max_mem_mb=1,
+                                          refine_step=step)
+        vectorized = grid_search_sma_vectorized(data, config.short_range, config.long_range).dropna()
+        assert chunked["final_return"].tolist() == sorted(vectorized["final_return"], reverse=True)[:10], ticker
+        exact = vectorized.set_index(["short_window", "long_window"])["final_return"]
+        assert [exact[pair] for pair in zip(chunked["short_window"], chunked["long_window"])] == \
+            chunked["final_return"].tolist(), ticker
+
+def test_vectorized_falls_back_to_chunks_over_memory_budget(bundled_data, monkeypatch):
+    calls = []
+    chunked = strategy.grid_search_sma_chunked
+    monkeypatch.setattr(strategy, "grid_search_sma_chunked", lambda *args, **kwargs: calls.append(kwargs) or chunked(*args, **kwargs))
+    monkeypatch.setattr(strategy, "grid_memory_mb", 1)
+    for ticker, data in bundled_data.items():
+        fallback = grid_search_sma(data, config.short_range, config.long_range, method="vectorized")
+        full = grid_search_sma_vectorized(data, config.short_range, config.long_range)
+        assert calls and calls[-1]["refine_step"] is None
+        # Cùng cặp tốt nhất (hoặc một cặp hoà với nó, có cùng lợi nhuận)
+        best = fallback.iloc[0]
+        exact = full.set_index(["short_window", "long_window"])["final_return"]
+        assert best["final_return"] == exact[(best["short_window"], best["long_window"])] == full.iloc[0]["final_return"], ticker
+        assert len(fallback) == full["final_return"].notna().sum(), ticker
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+import src.config as config
+from src.walk_forward import walk_forward_sma, walk_forward_sma_naive, walk_forward_splits
+
+def _assert_same_folds(fast, naive, ticker):
+    assert len(fast) == len(naive) > 0, ticker
+    assert fast["short_window"].tolist() == naive["short_window"].tolist(), ticker
+    assert fast["long_window"].tolist() == naive["long_window"].tolist(), ticker
+    np.testing.assert_allclose(fast["in_sample_return"], naive["in_sample_return"], rtol=1e-9, err_msg=ticker)
+    np.testing.assert_allclose(fast["out_of_sample_return"], naive["out_of_sample_return"], rtol=1e-9, err_msg=ticker)
+
+def test_walk_forward_matches_naive_refit_on_bundled_data(bundled_data):
+    for ticker, data in bundled_data.items():
+        args = (config.short_range, config.long_range, config.walk_forward_train_size, config.walk_forward_test_size)
+        _assert_same_folds(walk_forward_sma(data, *args), walk_forward_sma_naive(data, *args), ticker)
+
+@pytest.mark.parametrize("expanding", [False, True])
+def test_walk_forward_folds_follow_splits(bundled_data, expanding):
+    data = bundled_data["AAPL"]
+    args = (config.short_range, config.long_range, 1500, 500, expanding)
+    fast = walk_forward_sma(data, *args)
+    _assert_same_folds(fast, walk_forward_sma_naive(data, *args), "AAPL")
+
+    splits = walk_forward_splits(len(data), 1500, 500, expanding)
+    assert fast["train_start"].tolist() == [data.index[start] for start, _, _ in splits]
+    assert fast["test_end"].tolist() == [data.index[end - 1] for _, _, end in splits]